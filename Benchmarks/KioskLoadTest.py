@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "Headless load generator that replays shift change punch bursts from N kiosk websocket sessions against a local Main.py"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+# pylint: disable=broad-exception-caught
+
+# Standard Python libraries
+import argparse                                 # https://docs.python.org/3/library/argparse.html
+import asyncio
+import json
+import os
+import random
+import re
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from time import perf_counter, sleep
+
+# External libraries
+import httpx                                    # https://www.python-httpx.org
+import websockets                               # https://websockets.readthedocs.io
+
+# Internal modules
+import GlobalConstants as GC
+import ConnectionPool
+import LocalClock
+from Benchmarks import SyntheticHistory
+from Database import Database
+
+MAIN_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Main.py')
+BASE_URL = f'http://127.0.0.1:{GC.LOCAL_HOST_PORT_FOR_GUI}'
+SOCKET_PATH = '/_nicegui_ws/socket.io/'
+
+# Text used to find the kiosk elements in the page NiceGUI renders, so element IDs never need to be hardcoded
+INPUT_LABEL = 'Ingrese su identificación de empleado'
+CLOCK_IN_BUTTON_TEXT = 'RELOJ EN (CLOCK IN)'
+CLOCK_OUT_BUTTON_TEXT = 'RELOJ DE SALIDA (CLOCK OUT)'
+CONFIRMATION_LABEL_TEXTS = ['(CLOCKED IN)', '(CLOCKED OUT)']
+
+LAG_PROBE_INTERVAL = 0.05                       # Seconds between event loop lag probes
+COMMIT_POLL_INTERVAL = 0.005                    # Seconds between PRAGMA data_version polls
+PUNCH_TIMEOUT = 10.0                            # Seconds to wait for the label update confirming a punch
+
+
+def find_elements(html: str) -> tuple:
+    """ Pull the client ID and the kiosk element and listener IDs out of a NiceGUI page
+
+    Args:
+        html (str): Body of GET /
+
+    Returns:
+        Tuple (clientId, elements): elements maps 'input', 'clock_in' and 'clock_out' to (elementId, listenerId) and 'labels' to the clocked IN / OUT label element IDs
+    """
+    clientId = re.search(r'client_id:\s*"([^"]+)"', html).group(1)
+    start = html.index('elements:') + len('elements:')
+    pageElements, _ = json.JSONDecoder().raw_decode(html[start:].lstrip())
+
+    def listener(element: dict, eventType: str) -> tuple:
+        for event in element.get('events', []):
+            if event['type'] == eventType:
+                return int(element['id']), event['listener_id']
+
+        raise LookupError(f'No {eventType} listener on element {element["id"]}')
+
+    def button_containing(text: str) -> dict:
+        for element in pageElements.values():
+            if any(pageElements[str(child)].get('text', '').startswith(text) for child in element.get('children', [])):
+                return element
+
+        raise LookupError(f'No button labeled {text}')
+
+    inputBox = next(element for element in pageElements.values() if element.get('props', {}).get('label') == INPUT_LABEL)
+
+    labels = [elementId for elementId, element in pageElements.items() if any(text in element.get('text', '') for text in CONFIRMATION_LABEL_TEXTS)]
+
+    return clientId, {'input': listener(inputBox, 'update:model-value'),
+                      'clock_in': listener(button_containing(CLOCK_IN_BUTTON_TEXT), 'click'),
+                      'clock_out': listener(button_containing(CLOCK_OUT_BUTTON_TEXT), 'click'),
+                      'labels': labels}
+
+
+class KioskSession:
+    """ One tablet: a NiceGUI page load plus its Engine.IO v4 / Socket.IO v5 websocket
+    """
+
+    def __init__(self, httpClient: httpx.AsyncClient):
+        """ Constructor to initialize a KioskSession object, call connect() before punch()
+
+        Args:
+            httpClient (httpx.AsyncClient): Shared HTTP client used to load the page
+        """
+        self.httpClient = httpClient
+        self.clientId = None
+        self.elements = None
+        self.websocket = None
+        self.waiters = []
+        self.readerTask = None
+
+
+    async def connect(self):
+        """ Load the page, open the websocket, and complete the NiceGUI handshake
+        """
+        response = await self.httpClient.get('/')
+        self.clientId, self.elements = find_elements(response.text)
+
+        self.websocket = await websockets.connect(f'ws://127.0.0.1:{GC.LOCAL_HOST_PORT_FOR_GUI}{SOCKET_PATH}?client_id={self.clientId}&EIO=4&transport=websocket', max_size=None)
+        await self.websocket.recv()                                     # Engine.IO open packet
+        await self.websocket.send('40')                                 # Socket.IO connect to the default namespace
+        await self.websocket.recv()
+        await self.websocket.send('420["handshake"]')
+        self.readerTask = asyncio.create_task(self.read_messages())
+
+
+    async def read_messages(self):
+        """ Answer Engine.IO pings and hand the elements of every "update" message to the punches waiting on it
+        """
+        async for message in self.websocket:
+            if message == '2':
+                await self.websocket.send('3')
+
+            elif message.startswith('42'):
+                eventName, *payload = json.loads(message[2:])
+                if eventName != 'update' or len(payload) == 0:
+                    continue
+
+                for predicate, future in list(self.waiters):
+                    if not future.done() and predicate(payload[0]):
+                        future.set_result(perf_counter())
+
+
+    def is_confirmation(self, updatedElements: dict, employeeId: int) -> bool:
+        """ True if a clocked IN / OUT label is shown with an employee ID in its text, the last GUI change clock_x() makes after the commit
+        """
+        for elementId in self.elements['labels']:
+            label = updatedElements.get(elementId)
+            if label is not None and str(employeeId) in label.get('text', '') and 'hidden' not in label.get('class', []):
+                return True
+
+        return False
+
+
+    async def emit_event(self, elementId: int, listenerId: str, args):
+        """ Send a browser event (e.g. a button click) to the element listener on the server
+        """
+        event = {'id': elementId, 'client_id': self.clientId, 'listener_id': listenerId, 'args': args}
+        await self.websocket.send('42' + json.dumps(['event', event]))
+
+
+    async def punch(self, direction: int, employeeId: int) -> float:
+        """ Type an employee ID and press clock IN or clock OUT, then wait until a label mentioning the ID comes back
+
+        Args:
+            direction (int): GC.CLOCK_IN or GC.CLOCK_OUT
+            employeeId (int): Four digit employee ID
+
+        Returns:
+            float: Seconds from the button press to the label update, None on timeout
+        """
+        confirmation = asyncio.get_running_loop().create_future()
+        waiter = (lambda updatedElements: self.is_confirmation(updatedElements, employeeId), confirmation)
+        self.waiters.append(waiter)
+
+        try:
+            await self.emit_event(*self.elements['input'], employeeId)
+            start = perf_counter()
+            await self.emit_event(*self.elements['clock_in' if direction == GC.CLOCK_IN else 'clock_out'], None)
+            end = await asyncio.wait_for(confirmation, PUNCH_TIMEOUT)
+            return end - start
+
+        except asyncio.TimeoutError:
+            return None
+
+        finally:
+            self.waiters.remove(waiter)
+
+
+    async def close(self):
+        """ Close the websocket
+        """
+        if self.readerTask is not None:
+            self.readerTask.cancel()
+
+        if self.websocket is not None:
+            await self.websocket.close()
+
+
+async def probe_event_loop_lag(httpClient: httpx.AsyncClient, samples: list, stop: asyncio.Event):
+    """ Time a tiny HTTP request served by the same event loop as the kiosk pages, any wait above the idle round trip is loop lag
+
+    Args:
+        httpClient (httpx.AsyncClient): Shared HTTP client
+        samples (list): Round trip seconds are appended here
+        stop (asyncio.Event): Set to end probing
+    """
+    while not stop.is_set():
+        start = perf_counter()
+        await httpClient.get('/favicon.ico')
+        samples.append(perf_counter() - start)
+        await asyncio.sleep(LAG_PROBE_INTERVAL)
+
+
+async def poll_commits(databasePath: str, commitTimes: list, stop: asyncio.Event):
+    """ Record the time of every commit another connection makes to TimeReport.db
+
+        PRAGMA data_version changes once per commit seen, so commits closer together than COMMIT_POLL_INTERVAL count once
+
+    Args:
+        databasePath (str): TimeReport.db written by Main.py
+        commitTimes (list): perf_counter() of each observed commit is appended here
+        stop (asyncio.Event): Set to end polling
+    """
+    conn = sqlite3.connect(f'file:{databasePath}?mode=ro', uri=True)
+    lastVersion = conn.execute('PRAGMA data_version').fetchone()[0]
+    while not stop.is_set():
+        version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if version != lastVersion:
+            commitTimes.append(perf_counter())
+            lastVersion = version
+
+        await asyncio.sleep(COMMIT_POLL_INTERVAL)
+
+    conn.close()
+
+
+def percentile(values: list, fraction: float) -> float:
+    """ Nearest rank percentile, 0.0 for an empty list
+    """
+    if len(values) == 0:
+        return 0.0
+
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def replay_shift_change(sessions: int, punchesPerSession: int, burstSeconds: float, direction: int, databasePath: str, seed: int) -> dict:
+    """ Connect every session, then replay punches with random arrival times spread over a burst window
+
+    Args:
+        sessions (int): Concurrent kiosk websocket sessions
+        punchesPerSession (int): Punches sent by each session one after another
+        burstSeconds (float): Window the first punch of every session lands in
+        direction (int): GC.CLOCK_IN or GC.CLOCK_OUT
+        databasePath (str): TimeReport.db written by Main.py
+        seed (int): Arrival time seed
+
+    Returns:
+        Dict: Latency, event loop lag, and commit statistics
+    """
+    rng = random.Random(seed)
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=PUNCH_TIMEOUT) as httpClient:
+        kiosks = [KioskSession(httpClient) for _ in range(sessions)]
+        await asyncio.gather(*(kiosk.connect() for kiosk in kiosks))
+
+        idleSamples = []
+        for _ in range(10):
+            start = perf_counter()
+            await httpClient.get('/favicon.ico')
+            idleSamples.append(perf_counter() - start)
+
+        idleRoundTrip = min(idleSamples)
+
+        stop = asyncio.Event()
+        lagSamples, commitTimes, latencies = [], [], []
+        monitors = [asyncio.create_task(probe_event_loop_lag(httpClient, lagSamples, stop)), asyncio.create_task(poll_commits(databasePath, commitTimes, stop))]
+
+        async def run_kiosk(index: int, kiosk: KioskSession):
+            await asyncio.sleep(rng.uniform(0, burstSeconds))
+            for punchNumber in range(punchesPerSession):
+                latencies.append(await kiosk.punch(direction, SyntheticHistory.FIRST_EMPLOYEE_ID + index * punchesPerSession + punchNumber))
+
+        start = perf_counter()
+        await asyncio.gather(*(run_kiosk(index, kiosk) for index, kiosk in enumerate(kiosks)))
+        elapsed = perf_counter() - start
+
+        stop.set()
+        await asyncio.gather(*monitors)
+        await asyncio.gather(*(kiosk.close() for kiosk in kiosks))
+
+    confirmed = [latency for latency in latencies if latency is not None]
+    lag = [max(0.0, sample - idleRoundTrip) for sample in lagSamples]
+
+    return {'punches': len(latencies), 'timeouts': len(latencies) - len(confirmed), 'seconds': elapsed,
+            'p50': percentile(confirmed, 0.50), 'p99': percentile(confirmed, 0.99),
+            'lagP50': percentile(lag, 0.50), 'lagP99': percentile(lag, 0.99), 'lagMax': max(lag, default=0.0),
+            'commits': len(commitTimes), 'commitRate': len(commitTimes) / elapsed}
+
+
+def start_main(workingDirectory: str) -> subprocess.Popen:
+    """ Start Main.py in its own process group with TimeReport.db in workingDirectory, and wait until it serves the kiosk page
+
+    Returns:
+        subprocess.Popen: Running Main.py
+    """
+    logFile = open(os.path.join(workingDirectory, 'Main.log'), 'w')
+    process = subprocess.Popen([sys.executable, MAIN_PATH], cwd=workingDirectory, stdout=logFile, stderr=subprocess.STDOUT, start_new_session=True)
+
+    for _ in range(300):
+        try:
+            if httpx.get(BASE_URL + '/', timeout=1.0).status_code == 200:
+                return process
+
+        except httpx.TransportError:
+            pass
+
+        if process.poll() is not None:
+            break
+
+        sleep(0.1)
+
+    stop_main(process)
+    raise RuntimeError(f'Main.py did not start, see {logFile.name}')
+
+
+def stop_main(process: subprocess.Popen):
+    """ Stop Main.py and the uvicorn reload worker it spawns
+    """
+    os.killpg(process.pid, signal.SIGINT)
+    try:
+        process.wait(timeout=10)
+
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f'Replay a shift change against Main.py on port {GC.LOCAL_HOST_PORT_FOR_GUI}, run from the repository root')
+    parser.add_argument('--sessions', type=int, default=26, help='Concurrent kiosk websocket sessions')
+    parser.add_argument('--punches', type=int, default=1, help='Punches sent by each session')
+    parser.add_argument('--burst', type=float, default=2.0, help='Seconds the first punch of every session is spread over')
+    parser.add_argument('--direction', choices=['in', 'out'], default='in')
+    parser.add_argument('--weeks', type=int, default=1, help='Closed work weeks of synthetic history in TimeReport.db')
+    parser.add_argument('--seed', type=int, default=2023)
+    args = parser.parse_args()
+
+    # Employee IDs are four digits, so a single replay can punch at most 9,000 different employees
+    employeeCount = args.sessions * args.punches
+    if SyntheticHistory.FIRST_EMPLOYEE_ID + employeeCount > 10 ** GC.VALID_EMPLOYEE_ID_LENGTH:
+        parser.error(f'--sessions x --punches must be at most {10 ** GC.VALID_EMPLOYEE_ID_LENGTH - SyntheticHistory.FIRST_EMPLOYEE_ID}')
+
+    with tempfile.TemporaryDirectory(prefix='TimeTrackerLoadTest') as directory:
+        databaseFile = os.path.join(directory, GC.DATABASE_FILENAME)
+        ConnectionPool.configure(databaseFile)
+        SyntheticHistory.fill_database(employeeCount, args.weeks, args.seed)
+        LocalClock.set_clock()
+
+        # fill_database() ends on the fixed SyntheticHistory clock, roll over to the real current week before Main.py starts
+        # so the first punch of the measured burst does not pay for the rollover and the archive of every week in between
+        db = Database()
+        db.rollover_weekly_report_table()
+        db.close_database()
+        ConnectionPool.get_pool().close()
+
+        main = start_main(directory)
+        try:
+            results = asyncio.run(replay_shift_change(args.sessions, args.punches, args.burst, GC.CLOCK_IN if args.direction == 'in' else GC.CLOCK_OUT, databaseFile, args.seed))
+
+        finally:
+            stop_main(main)
+
+    print(f'{args.sessions} sessions, {results["punches"]} punches in {results["seconds"]:.2f} s, {results["timeouts"]} timed out')
+    print(f'Punch latency     p50 {results["p50"] * 1000:8.1f} ms   p99 {results["p99"] * 1000:8.1f} ms')
+    print(f'Event loop lag    p50 {results["lagP50"] * 1000:8.1f} ms   p99 {results["lagP99"] * 1000:8.1f} ms   max {results["lagMax"] * 1000:.1f} ms')
+    print(f'DB commits        {results["commits"]} observed, {results["commitRate"]:.1f} per second')
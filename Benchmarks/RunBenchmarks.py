@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "Time the kiosk and report code paths against synthetic TimeReport.db files and print a comparison table"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+
+# Standard Python libraries
+import argparse                                 # https://docs.python.org/3/library/argparse.html
+import json
+import os
+import tempfile
+from contextlib import redirect_stdout
+from datetime import timedelta
+from time import perf_counter
+
+# Internal modules
+import GlobalConstants as GC
+import ConnectionPool
+import LocalClock
+import ManualTimeCalculations
+from Database import Database, employeeDirectory
+from Benchmarks import SyntheticHistory
+
+DEFAULT_SIZES = [26, 1000, 50000]
+
+# Operation name and True if it is timed per call on a sample of employees, False if it is timed as one whole report
+OPERATIONS = [("insert_check_in_table", True), ("calculate_time_delta", True), ("labor_report", False), ("check_x_report", False), ("export_table_to_csv", False)]
+
+
+def time_per_call(function, arguments: list) -> float:
+    """ Mean wall clock time of calling a function once per argument
+
+    Args:
+        function (callable): Function taking a single argument
+        arguments (list): One entry per call
+
+    Returns:
+        float: Seconds per call
+    """
+    start = perf_counter()
+    for argument in arguments:
+        function(argument)
+
+    return (perf_counter() - start) / len(arguments)
+
+
+def time_best_of(function, repeat: int) -> float:
+    """ Fastest of several runs of a report, so one cold cache run does not hide a regression
+
+    Args:
+        function (callable): Function taking no arguments
+        repeat (int): Number of runs
+
+    Returns:
+        float: Seconds of the fastest run
+    """
+    runs = []
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        runs.append(perf_counter() - start)
+
+    return min(runs)
+
+
+def run_size(numberOfEmployees: int, numberOfWeeks: int, seed: int, sampleSize: int, repeat: int) -> dict:
+    """ Generate a synthetic TimeReport.db in a temporary directory and time every operation against it
+
+    Args:
+        numberOfEmployees (int): UsersTable rows
+        numberOfWeeks (int): Closed work weeks of punch history
+        seed (int): SyntheticHistory seed
+        sampleSize (int): Employees used by the per call operations
+        repeat (int): Runs of each report, the fastest is kept
+
+    Returns:
+        Dict: Operation name keys with seconds values, plus "punches" and "generate" entries
+    """
+    startingDirectory = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='TimeTrackerBenchmark') as workingDirectory:
+        os.chdir(workingDirectory)
+        ConnectionPool.configure(os.path.join(workingDirectory, GC.DATABASE_FILENAME))
+        try:
+            start = perf_counter()
+            results = {"punches": SyntheticHistory.fill_database(numberOfEmployees, numberOfWeeks, seed)}
+            results["generate"] = perf_counter() - start
+
+            db = Database()
+            sampleIds = list(employeeDirectory.get_employees())[:sampleSize]
+            lastWeekDate = LocalClock.now() - timedelta(days=3)
+
+            # Kiosk debug prints would swamp the table, the work done to format them is still timed
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                results["insert_check_in_table"] = time_per_call(db.insert_check_in_table, sampleIds)
+                results["calculate_time_delta"] = time_per_call(lambda id: db.calculate_time_delta(id, lastWeekDate), sampleIds)
+                results["labor_report"] = time_best_of(ManualTimeCalculations.labor_report, repeat)
+                results["check_x_report"] = time_best_of(lambda: ManualTimeCalculations.check_x_report(GC.CLOCK_IN), repeat)
+                results["export_table_to_csv"] = time_best_of(lambda: db.export_table_to_csv(["WeeklyReportTable", "CheckInTable", "CheckOutTable"]), repeat)
+
+            db.close_database()
+
+        finally:
+            ConnectionPool.get_pool().close()
+            employeeDirectory.invalidate()
+            LocalClock.set_clock()
+            os.chdir(startingDirectory)
+
+    return results
+
+
+def format_seconds(seconds: float, perCall: bool) -> str:
+    """ Milliseconds for per call operations, seconds for whole reports
+    """
+    return f'{seconds * 1000:.3f} ms' if perCall else f'{seconds:.3f} s'
+
+
+def print_table(results: dict, baseline: dict = None):
+    """ Print one row per operation and one column per employee count, with the change against a saved baseline
+
+    Args:
+        results (dict): Employee count (str) keys with run_size() values
+        baseline (dict): Same shape as results, loaded from a previous --save file
+    """
+    sizes = list(results)
+    header = ["Operation"] + [f'{int(size):,} employees' for size in sizes]
+    rows = [["punches generated"] + [f'{results[size]["punches"]:,}' for size in sizes]]
+    for operation, perCall in OPERATIONS:
+        row = [operation + (" (per call)" if perCall else "")]
+        for size in sizes:
+            cell = format_seconds(results[size][operation], perCall)
+            if baseline is not None and size in baseline and operation in baseline[size]:
+                change = results[size][operation] / baseline[size][operation] - 1
+                cell += f' ({change:+.0%})'
+
+            row.append(cell)
+
+        rows.append(row)
+
+    widths = [max(len(row[column]) for row in [header] + rows) for column in range(len(header))]
+    for row in [header] + rows:
+        print("  ".join(cell.ljust(width) if column == 0 else cell.rjust(width) for column, (cell, width) in enumerate(zip(row, widths))))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark TimeTracker against synthetic punch histories, run from the repository root')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Employee counts to benchmark')
+    parser.add_argument('--weeks', type=int, default=4, help='Closed work weeks of punch history per database')
+    parser.add_argument('--seed', type=int, default=2023, help='Synthetic history seed')
+    parser.add_argument('--sample', type=int, default=200, help='Employees used by the per call operations')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of each report, the fastest is kept')
+    parser.add_argument('--save', help='Write results to a JSON file')
+    parser.add_argument('--baseline', help='JSON file from an earlier --save to compare against')
+    args = parser.parse_args()
+
+    allResults = {}
+    for size in args.sizes:
+        print(f'Benchmarking {size:,} employees x {args.weeks} weeks')
+        allResults[str(size)] = run_size(size, args.weeks, args.seed, args.sample, args.repeat)
+
+    baselineResults = None
+    if args.baseline is not None:
+        with open(args.baseline, encoding='utf-8') as baselineFile:
+            baselineResults = json.load(baselineFile)
+
+    print()
+    print_table(allResults, baselineResults)
+
+    if args.save is not None:
+        with open(args.save, 'w', encoding='utf-8') as saveFile:
+            json.dump(allResults, saveFile, indent=4)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "Deterministic generator that fills a TimeReport.db with N employees x M weeks of realistic clock IN / OUT punches"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+
+# Standard Python libraries
+import random                                   # https://docs.python.org/3/library/random.html
+from datetime import datetime, timezone
+
+# Internal modules
+import GlobalConstants as GC
+import ConnectionPool
+import LocalClock
+import PunchEvents
+from Database import Database, employeeDirectory
+
+# Monday 2024-01-08 at 8:00 am in Marianna, FL, so every run reports on the same Sunday 2023-12-31 to Saturday 2024-01-06 week
+BENCHMARK_NOW = datetime(2024, 1, 8, 14, 0, tzinfo=timezone.utc)
+
+FIRST_EMPLOYEE_ID = 1000
+FIRST_NAMES = ['Erick', 'Dago', 'Cesar', 'Adrian', 'Miguel', 'Edgar', 'German', 'Juan', 'Victor', 'Eric', 'David', 'Omar', 'Nicolas']
+LAST_NAMES = ['Maldonado', 'Reyes', 'Cabrera', 'Cardenas', 'Lopez', 'Maranto', 'Antonio', 'Mata', 'Vazquez', 'Montoya', 'Palomo', 'Gomez']
+
+# Chance an employee works a day, indexed by localDay % 7 (1970-01-01 was a Thursday)
+WORK_PROBABILITY = [0.92, 0.92, 0.30, 0.05, 0.92, 0.92, 0.92]
+
+NIGHT_SHIFT_PROBABILITY = 0.15      # Clock IN around 10 pm and clock OUT the next morning
+ABSENT_PROBABILITY = 0.04
+MISSED_IN_PROBABILITY = 0.03
+MISSED_OUT_PROBABILITY = 0.04
+
+INSERT_BATCH_SIZE = 50000
+
+
+def generate_employees(rng: random.Random, numberOfEmployees: int) -> list:
+    """ Employee IDs and names, with a day or night shift assigned to each employee
+
+    Args:
+        rng (random.Random): Seeded random number generator
+        numberOfEmployees (int): Number of UsersTable rows
+
+    Returns:
+        List: Of (employeeId, firstName, lastName, isNightShift) tuples ordered by employee ID
+    """
+    return [(FIRST_EMPLOYEE_ID + i, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), rng.random() < NIGHT_SHIFT_PROBABILITY) for i in range(numberOfEmployees)]
+
+
+def generate_shift(rng: random.Random, localDay: int, isNightShift: bool) -> list:
+    """ Punches for one employee starting a shift on one day, rounded to the minute like the kiosk
+
+    Args:
+        rng (random.Random): Seeded random number generator
+        localDay (int): Day the shift starts
+        isNightShift (bool): True if the clock OUT lands on the next localDay
+
+    Returns:
+        List: Of (direction, epochLocal) tuples, empty if the employee did not work
+    """
+    if rng.random() >= WORK_PROBABILITY[localDay % 7] or rng.random() < ABSENT_PROBABILITY:
+        return []
+
+    dayStart = localDay * PunchEvents.SECONDS_PER_DAY
+    if isNightShift:
+        checkIn = dayStart + 60 * rng.randint(21 * 60 + 30, 22 * 60 + 30)
+        checkOut = dayStart + PunchEvents.SECONDS_PER_DAY + 60 * rng.randint(5 * 60 + 45, 7 * 60)
+    else:
+        checkIn = dayStart + 60 * rng.randint(6 * 60, 7 * 60 + 30)
+        checkOut = dayStart + 60 * rng.randint(15 * 60, 17 * 60 + 30)
+
+    punches = []
+    if rng.random() >= MISSED_IN_PROBABILITY:
+        punches.append((GC.CLOCK_IN, checkIn))
+
+    if rng.random() >= MISSED_OUT_PROBABILITY:
+        punches.append((GC.CLOCK_OUT, checkOut))
+
+    return punches
+
+
+def generate_punches(rng: random.Random, employees: list, firstDay: int, lastDay: int):
+    """ Yield PunchEventsTable rows one day at a time, in the order the kiosk would have received them
+
+    Args:
+        rng (random.Random): Seeded random number generator
+        employees (list): Output of generate_employees()
+        firstDay (int): First localDay with shifts
+        lastDay (int): Last localDay with punches (inclusive), night shifts starting on it are dropped
+
+    Yields:
+        Tuple (employeeId, direction, epochLocal, localDay): One punch
+    """
+    overnight = []
+    for localDay in range(firstDay, lastDay + 1):
+        punches, overnight = overnight, []
+        for employeeId, _, _, isNightShift in employees:
+            for direction, epochLocal in generate_shift(rng, localDay, isNightShift):
+                if epochLocal // PunchEvents.SECONDS_PER_DAY == localDay:
+                    punches.append((epochLocal, employeeId, direction))
+                else:
+                    overnight.append((epochLocal, employeeId, direction))
+
+        punches.sort()
+        for epochLocal, employeeId, direction in punches:
+            yield employeeId, direction, epochLocal, localDay
+
+
+def fill_database(numberOfEmployees: int, numberOfWeeks: int, seed: int = 2023, now: datetime = BENCHMARK_NOW) -> int:
+    """ Fill the ConnectionPool database with a synthetic history, the way weeks of kiosk use would have left it
+
+        Punches cover numberOfWeeks closed work weeks plus the open week up to now, then the week rollover
+        snapshots last week into WeeklyReportHistoryTable and archives every closed week
+
+    Args:
+        numberOfEmployees (int): Number of UsersTable rows
+        numberOfWeeks (int): Number of closed work weeks before the week containing now
+        seed (int): Same seed, same database
+        now (datetime): Timezone aware UTC instant the history ends at, also installed as the LocalClock time source
+
+    Returns:
+        int: Number of punches inserted
+    """
+    LocalClock.set_clock(lambda: now)
+    rng = random.Random(seed)
+
+    db = Database()
+    employees = generate_employees(rng, numberOfEmployees)
+    db.cursor.executemany("INSERT INTO UsersTable (employeeId, firstName, lastName) VALUES (?, ?, ?)", [employee[:3] for employee in employees])
+    db.commit_changes()
+    employeeDirectory.invalidate()
+
+    currentWeekId = PunchEvents.to_week_id(LocalClock.local_day())
+    firstDay = currentWeekId - 7 * numberOfWeeks
+    punchCount = 0
+    batch = []
+    for punch in generate_punches(rng, employees, firstDay, LocalClock.local_day() - 1):
+        batch.append(punch)
+        if len(batch) == INSERT_BATCH_SIZE:
+            db.cursor.executemany("INSERT INTO PunchEventsTable (employeeId, direction, epochLocal, localDay) VALUES (?, ?, ?, ?)", batch)
+            punchCount += len(batch)
+            batch = []
+
+    db.cursor.executemany("INSERT INTO PunchEventsTable (employeeId, direction, epochLocal, localDay) VALUES (?, ?, ?, ?)", batch)
+    punchCount += len(batch)
+    db.cursor.execute(PunchEvents.DAILY_HOURS_UPSERT.format(where="1"))
+    db.commit_changes()
+
+    db.rollover_weekly_report_table(currentWeekId)
+    db.close_database()
+    ConnectionPool.get_pool().checkpoint()
+
+    return punchCount
+
+
+if __name__ == "__main__":
+    ConnectionPool.configure('SyntheticTimeReport.db')
+    print(f'Inserted {fill_database(26, 4)} punches into SyntheticTimeReport.db')
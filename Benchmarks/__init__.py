@@ -0,0 +1,10 @@
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "Synthetic TimeReport.db generator and timing harness, run from the repository root with python3 -m Benchmarks.RunBenchmarks"
+"""
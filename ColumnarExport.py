@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "Typed, compressed Parquet or Arrow IPC export of closed work weeks, partitioned by week for payroll analytics"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+# pylint: disable=import-outside-toplevel
+
+# Standard Python libraries
+import argparse                                 # https://docs.python.org/3/library/argparse.html
+import os
+from datetime import date
+
+# Internal modules
+import GlobalConstants as GC
+import ConnectionPool
+import LocalClock
+import PunchEvents
+import ReportWriter
+from Database import Database
+
+# pyarrow is optional and only imported when an export runs, install it with 'pip install pyarrow' https://arrow.apache.org/docs/python/
+COMPRESSION = 'zstd'
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+# Dataset name: (SQL statement selecting one closed week, column names and pyarrow type names in SELECT order)
+DATASETS = {
+    "PunchEvents":   ("SELECT id, employeeId, direction, epochLocal, localDay FROM PunchEventsArchiveTable WHERE weekId = ? ORDER BY id",
+                      [("id", "int64"), ("employeeId", "int32"), ("direction", "int8"), ("timestamp", "timestamp"), ("localDate", "date32")]),
+    "WeeklyReports": ("SELECT employeeId, fullname, totalHours, day6, day0, day1, day2, day3, day4, day5, inComments, outComments FROM WeeklyReportHistoryTable WHERE weekId = ? ORDER BY employeeId",
+                      [("employeeId", "int32"), ("fullname", "string"), ("totalHours", "float64"), ("sunday", "float64"), ("monday", "float64"), ("tuesday", "float64"),
+                       ("wednesday", "float64"), ("thursday", "float64"), ("friday", "float64"), ("saturday", "float64"), ("inComments", "string"), ("outComments", "string")])
+}
+
+
+def import_pyarrow():
+    """ Import pyarrow on first use, so the kiosk and .csv reports never depend on it
+
+    Returns:
+        Module: pyarrow
+    """
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+
+    except ImportError as error:
+        raise ImportError("Columnar export requires pyarrow, install it with 'pip install pyarrow'") from error
+
+    return pyarrow
+
+
+def is_available() -> bool:
+    """ Check whether pyarrow is installed without importing it
+
+    Returns:
+        bool: True if export_closed_weeks() can run
+    """
+    import importlib.util
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def arrow_type(pa, typeName: str):
+    """ pyarrow DataType for a DATASETS type name
+
+        Timestamps stay Marianna, FL wall time with no timezone, like epochLocal, and localDay is already days since 1970-01-01 so it maps onto date32 unchanged
+    """
+    if typeName == "timestamp":
+        return pa.timestamp('s')
+
+    return getattr(pa, typeName)()
+
+
+def partition_path(directory: str, dataset: str, weekId: int, fileFormat: str) -> str:
+    """ Hive style partition file, so pyarrow.dataset, DuckDB and Spark read weekId as a column
+
+    Args:
+        directory (str): Root export directory
+        dataset (str): DATASETS key
+        weekId (int): localDay of the Sunday starting the week
+        fileFormat (str): FORMATS key
+
+    Returns:
+        str: Path such as "Columnar/PunchEvents/weekId=2023-08-20/part-0.parquet"
+    """
+    weekStart = date.fromordinal(PunchEvents.EPOCH_ORDINAL + weekId).isoformat()
+    return os.path.join(directory, dataset, f'weekId={weekStart}', 'part-0' + FORMATS[fileFormat])
+
+
+def closed_weeks(conn) -> list:
+    """ Weeks the Sunday night rollover has archived or snapshotted, their rows never change again
+
+    Args:
+        conn (sqlite3.Connection): TimeReport.db connection
+
+    Returns:
+        List: Of weekId integers in ascending order
+    """
+    openWeekId = PunchEvents.to_week_id(LocalClock.local_day())
+    cursor = conn.execute('''SELECT weekId FROM PunchEventsArchiveTable WHERE weekId < ? GROUP BY weekId
+                             UNION SELECT weekId FROM WeeklyReportHistoryTable WHERE weekId < ? GROUP BY weekId ORDER BY weekId''', (openWeekId, openWeekId))
+
+    return [weekId for (weekId,) in cursor.fetchall()]
+
+
+def write_table(pa, table, path: str, fileFormat: str):
+    """ Write one partition file atomically and fsync'd, so analytics tools never read a half written week
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporaryPath = os.path.join(os.path.dirname(path), '.' + os.path.basename(path) + '.tmp')
+    try:
+        with open(temporaryPath, 'wb') as file:
+            if fileFormat == 'parquet':
+                pa.parquet.write_table(table, file, compression=COMPRESSION)
+            else:
+                pa.feather.write_feather(table, file, compression=COMPRESSION)
+
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temporaryPath, path)
+
+    except BaseException:
+        if os.path.exists(temporaryPath):
+            os.unlink(temporaryPath)
+        raise
+
+    ReportWriter.fsync_directory(os.path.dirname(path))
+
+
+def export_week(pa, conn, directory: str, dataset: str, weekId: int, fileFormat: str) -> int:
+    """ Copy one closed week of a dataset from TimeReport.db into a typed columnar file
+
+    Returns:
+        int: Rows written, 0 if the week has no rows and no file was written
+    """
+    sqlStatement, columns = DATASETS[dataset]
+    rows = conn.execute(sqlStatement, (weekId,)).fetchall()
+    if len(rows) == 0:
+        return 0
+
+    schema = pa.schema([(name, arrow_type(pa, typeName)) for name, typeName in columns])
+    arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+    write_table(pa, pa.Table.from_arrays(arrays, schema=schema), partition_path(directory, dataset, weekId, fileFormat), fileFormat)
+
+    return len(rows)
+
+
+def export_closed_weeks(directory: str, fileFormat: str = 'parquet', rebuild: bool = False) -> dict:
+    """ Append every closed week that has no partition file yet to the PunchEvents and WeeklyReports datasets
+
+    Args:
+        directory (str): Root export directory, created if needed
+        fileFormat (str): 'parquet' or 'arrow' (Arrow IPC / Feather V2)
+        rebuild (bool): True to rewrite every closed week instead of only the new ones
+
+    Returns:
+        Dict: Dataset name keys with the number of rows written
+    """
+    if fileFormat not in FORMATS:
+        raise ValueError(f'Columnar export format must be one of {list(FORMATS)}, not {fileFormat}')
+
+    pa = import_pyarrow()
+    rowsWritten = {dataset: 0 for dataset in DATASETS}
+    with ConnectionPool.get_pool().reader() as conn:
+        for weekId in closed_weeks(conn):
+            for dataset in DATASETS:
+                if rebuild or not os.path.exists(partition_path(directory, dataset, weekId, fileFormat)):
+                    rowsWritten[dataset] += export_week(pa, conn, directory, dataset, weekId, fileFormat)
+
+    return rowsWritten
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export closed work weeks from TimeReport.db to Parquet or Arrow IPC files partitioned by week')
+    parser.add_argument('--directory', default=os.path.join('TimeCardReports', 'Columnar'), help='Root export directory')
+    parser.add_argument('--format', choices=list(FORMATS), default='parquet', help='Columnar file format')
+    parser.add_argument('--rebuild', action='store_true', help='Rewrite every closed week instead of only the new ones')
+    args = parser.parse_args()
+
+    ConnectionPool.configure(GC.DATABASE_FILENAME)
+    Database().close_database()
+
+    for datasetName, rowCount in export_closed_weeks(args.directory, args.format, args.rebuild).items():
+        print(f'Exported {rowCount:,} {datasetName} rows to {os.path.join(args.directory, datasetName)}')
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "Shared WAL mode SQLite connection manager for TimeReport.db used by every entry point"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+# pylint: disable=global-statement
+
+# Standard Python libraries
+import os
+import queue                                    # https://docs.python.org/3/library/queue.html
+import sqlite3                                  # https://docs.python.org/3/library/sqlite3.html
+import threading
+from contextlib import contextmanager
+
+# Internal modules
+import GlobalConstants as GC
+
+
+class ConnectionPool:
+    """ Hand out one writer connection per Database object and pooled read-only connections
+
+        TimeReport.db is switched to write-ahead logging, so report generation on a reader connection
+        never blocks the kiosk writer and the kiosk writer never blocks a report
+    """
+
+    def __init__(self, filename: str = GC.DATABASE_FILENAME, readerPoolSize: int = GC.READER_POOL_SIZE):
+        """ Constructor to initialize a ConnectionPool object
+
+        Args:
+            filename (str): Path to the SQLite database file
+            readerPoolSize (int): Maximum number of idle read-only connections kept open
+        """
+        self.filename = filename
+        self.readerPoolSize = readerPoolSize
+        self.idleReaders = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.walEnabled = False
+
+
+    def configure_connection(self, conn: sqlite3.Connection):
+        """ Apply the per-connection PRAGMAs from GlobalConstants
+
+        Args:
+            conn (sqlite3.Connection): Newly opened connection
+        """
+        conn.execute(f'PRAGMA busy_timeout = {GC.SQLITE_BUSY_TIMEOUT}')
+        conn.execute(f'PRAGMA synchronous = {GC.SQLITE_SYNCHRONOUS}')
+        conn.execute(f'PRAGMA mmap_size = {GC.SQLITE_MMAP_SIZE}')
+        conn.execute(f'PRAGMA cache_size = {GC.SQLITE_CACHE_SIZE}')
+
+
+    def connect(self) -> sqlite3.Connection:
+        """ Open a read-write connection, the first one also switches the database file to WAL mode (persistent)
+
+        Returns:
+            sqlite3.Connection: Configured writer connection, caller is responsible for closing it
+        """
+        conn = sqlite3.connect(self.filename, timeout=GC.SQLITE_BUSY_TIMEOUT / 1000)
+        self.configure_connection(conn)
+
+        with self.lock:
+            if not self.walEnabled:
+                conn.execute('PRAGMA journal_mode = WAL')
+                self.walEnabled = True
+
+        return conn
+
+
+    @contextmanager
+    def reader(self):
+        """ Borrow a read-only connection for the duration of a with block
+
+            with pool.reader() as conn:
+                conn.execute("SELECT * FROM DailyHoursTable")
+
+        Yields:
+            sqlite3.Connection: Connection opened with mode=ro and PRAGMA query_only
+        """
+        try:
+            conn = self.idleReaders.get_nowait()
+        except queue.Empty:
+            conn = self.open_reader()
+
+        try:
+            yield conn
+
+        finally:
+            # Never return a connection with an open read transaction, it would pin the WAL and stop checkpoints
+            conn.rollback()
+            if self.idleReaders.qsize() < self.readerPoolSize:
+                self.idleReaders.put(conn)
+            else:
+                conn.close()
+
+
+    def open_reader(self) -> sqlite3.Connection:
+        """ Open a new read-only connection, readers may be borrowed and returned from different threads
+
+        Returns:
+            sqlite3.Connection: Configured read-only connection
+        """
+        uri = f'file:{os.path.abspath(self.filename)}?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, timeout=GC.SQLITE_BUSY_TIMEOUT / 1000, check_same_thread=False)
+        self.configure_connection(conn)
+        conn.execute('PRAGMA query_only = 1')
+
+        return conn
+
+
+    def checkpoint(self):
+        """ Copy committed WAL pages back into TimeReport.db without waiting on active readers or writers
+        """
+        conn = self.connect()
+        conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+        conn.close()
+
+
+    def close(self):
+        """ Close every idle read-only connection
+        """
+        while True:
+            try:
+                self.idleReaders.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+pool = None
+
+def get_pool() -> ConnectionPool:
+    """ Get the process wide ConnectionPool, creating it for GC.DATABASE_FILENAME on first use
+
+    Returns:
+        ConnectionPool: Shared connection manager
+    """
+    global pool
+
+    if pool is None:
+        pool = ConnectionPool()
+
+    return pool
+
+
+def configure(filename: str = GC.DATABASE_FILENAME, readerPoolSize: int = GC.READER_POOL_SIZE) -> ConnectionPool:
+    """ Replace the process wide ConnectionPool, call before the first Database object is created
+
+    Args:
+        filename (str): Path to the SQLite database file
+        readerPoolSize (int): Maximum number of idle read-only connections kept open
+
+    Returns:
+        ConnectionPool: Shared connection manager
+    """
+    global pool
+
+    if pool is not None:
+        pool.close()
+
+    pool = ConnectionPool(filename, readerPoolSize)
+
+    return pool
+
+
+def create_snapshot(snapshotPath: str):
+    """ Copy a consistent point in time image of the process wide ConnectionPool's database with the SQLite online backup API
+
+    Args:
+        snapshotPath (str): Path of the snapshot file to create
+    """
+    with get_pool().reader() as conn:
+        snapshot = sqlite3.connect(snapshotPath)
+        conn.backup(snapshot)
+        snapshot.execute('PRAGMA journal_mode = DELETE')
+        snapshot.close()
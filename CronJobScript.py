@@ -1,57 +1,80 @@
 import ManualTimeCalculations
+import ColumnarExport
 import GlobalConstants as GC
-import subprocess
-from time import sleep
+import ConnectionPool
+import LocalClock
+import PunchEvents
+from Scheduler import Scheduler
+from Database import Database
 
-import schedule
+import os
 
 print("Testing CronJob Script")
 
-def is_sunday_pass_2330(testing=False):
-    if testing:
-        return True
-    
-    # Get the current date and time
-    now = ManualTimeCalculations.get_date_time()
+#REPORT_DIRECTORY = '/Users/venus/Excel Time Card Reports'    # Used when run on Blaze's Mac Book Pro
+REPORT_DIRECTORY = '/TimeCardReports'                          # Used when run on Linodes/TimeTracker-Debian-US-Southeast instance
 
-    # Check if today is Sunday (6 corresponds to Sunday)
-    if now.weekday() == GC.SUNDAY:
-        # Check if the current time is past 11:30 PM (23:30)
-        if now.hour > 23 and now.minute >= 30:
-            return True
+REPORT_CHECK_INTERVAL = 20 * 60 * GC.ONE_SECOND
+
+
+def last_reported_week() -> int:
+    """ Read the persisted marker of the last work week whose reports were published
+
+    Returns:
+        int: localDay of the Sunday starting the week, 0 if no reports were ever published
+    """
+    with ConnectionPool.get_pool().reader() as conn:
+        return PunchEvents.get_state(conn.cursor(), 'WeeklyReportsPublishedWeekId')
+
+
+def mark_week_reported(weekId: int):
+    """ Persist the last published work week in StateTable, so a restart never publishes the same week twice
+    """
+    conn = ConnectionPool.get_pool().connect()
+    PunchEvents.set_state(conn.cursor(), 'WeeklyReportsPublishedWeekId', weekId)
+    conn.commit()
+    conn.close()
 
-    return False
 
 def job():
-    if is_sunday_pass_2330():
-        print("Running your script on a Sunday past 11:30 PM.")
-        command = ['python3', 'ManualTimeCalculations.py']
-        calcProcess = subprocess.Popen(command).pid
-        print(f'PID = {calcProcess}')
-        
-        sleep(3)  # Pause to give ManualTimeCalculations.py to write and close the three .csv files below
-            
-        dates = ManualTimeCalculations.create_dates()
-        filenames = ['', '', '']
-        filenames[0] = dates[0] + '_' + dates[6] + '_LaborerTimeReport.csv'
-        filenames[1] = dates[0] + '_' + dates[6] + '_CheckOutTimes.csv'
-        filenames[2] = dates[0] + '_' + dates[6] + '_CheckInTimes.csv'
-        
-        for file in filenames:
-            #command = ['mv', file, '/Users/venus/Excel Time Card Reports'] # Used when run on Blaze's Mac Book Pro
-            command = ['mv', file, '/TimeCardReports']                            # Used when run on Linodes/TimeTracker-Debian-US-Southeast instance
-
-            moveProcess = subprocess.Popen(command).pid
-            print(f'PID = {moveProcess}')
-        
-    else:
-        print("Not running the script at this time.")
-    
-    
-schedule.every(20).minutes.do(job)
-schedule.every().day.at("23:31").do(job)
-schedule.every().sunday.at("23:31", "America/Chicago").do(job)
-
-while True:
-    schedule.run_pending()
-    sleep(1)
\ No newline at end of file
+    """ Generate and publish last work week's .csv reports and manifest exactly once, in process
+
+        ReportWriter renames each fsync'd file into REPORT_DIRECTORY, so anything watching it only ever sees complete files
+    """
+    lastSunday, _ = LocalClock.last_week_bounds()
+    weekId = PunchEvents.to_local_day(lastSunday)
+    if last_reported_week() >= weekId:
+        print(f'Reports for the week of {lastSunday} were already published')
+        return
+
+    for publishedFile in ManualTimeCalculations.weekly_reports(ManualTimeCalculations.week_dates(lastSunday), REPORT_DIRECTORY):
+        print(f'Published {os.path.basename(publishedFile)}')
+
+    # Append the newly closed week to the Parquet datasets the payroll team queries, when the optional pyarrow package is installed
+    if ColumnarExport.is_available():
+        for datasetName, rowCount in ColumnarExport.export_closed_weeks(os.path.join(REPORT_DIRECTORY, 'Columnar')).items():
+            print(f'Exported {rowCount:,} {datasetName} rows')
+
+    mark_week_reported(weekId)
+
+    # Fold the write-ahead log back into TimeReport.db once a week without blocking the kiosk
+    ConnectionPool.get_pool().checkpoint()
+
+
+if __name__ == "__main__":
+    ConnectionPool.configure(GC.DATABASE_FILENAME)
+
+    # Create or migrate the TimeReport.db tables, including the StateTable holding the last published week
+    Database().close_database()
+
+    # Check every 20 minutes, the persisted marker makes the first check after a work week ends the only one that does any work
+    # and a failed run is retried on the next check
+    scheduler = Scheduler('CronJobScheduler')
+    scheduler.add_job(job, REPORT_CHECK_INTERVAL)
+    scheduler.start()
+
+    try:
+        scheduler.thread.join()
+
+    except KeyboardInterrupt:
+        scheduler.stop()
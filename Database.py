@@ -17,18 +17,96 @@ __version__    = "0.1.0"
 # Standard Python libraries
 import sqlite3
 	
-from datetime import datetime, time, timedelta 	# Manipulate calendar dates & time objects https://docs.python.org/3/library/datetime.html
+from datetime import datetime, time 	# Manipulate calendar dates & time objects https://docs.python.org/3/library/datetime.html
 from time import sleep
-import pytz 					                # World Timezone Definitions  https://pypi.org/project/pytz/
 
 import os
 import csv
+import threading
 
 # Internal modules
 import GlobalConstants as GC
+import ConnectionPool                           # Shared WAL mode connection manager for TimeReport.db
+import LocalClock                               # Shared Marianna, FL clock and timezone service
+import PunchEvents                              # Unified PunchEventsTable with integer epoch timestamps
+import ReportEngine                             # Missed clock IN / OUT comment lookup table
+import ReportWriter                             # Atomic, fsync safe .csv files and their checksum manifest
+import EventLog                                 # Structured, batch flushed replacement for DebugLoggingTable
+from EventLog import eventLog
+import MailOutbox                               # Persistent outbound mail queue
+import KioskJournal                             # Replay of punches journaled by offline kiosk browsers
 
 ELEVEN_PM = time(23, 0, 0)
 THREE_AM  = time(3, 0, 0)
+WEEKLY_REPORT_DAY_COLUMNS = ['day6', 'day0', 'day1', 'day2', 'day3', 'day4', 'day5']
+
+# Direction spellings accepted by Database.import_punches(), from badge readers, offline kiosks, and hand typed time cards
+PUNCH_DIRECTIONS = {str(GC.CLOCK_IN): GC.CLOCK_IN, 'IN': GC.CLOCK_IN, 'CLOCK IN': GC.CLOCK_IN,
+                    str(GC.CLOCK_OUT): GC.CLOCK_OUT, 'OUT': GC.CLOCK_OUT, 'CLOCK OUT': GC.CLOCK_OUT}
+
+class EmployeeDirectory:
+    """ In-memory copy of UsersTable keyed by integer employee ID, loaded once and shared by every Database object in a process
+    """
+
+    def __init__(self):
+        """ Constructor to initialize an empty EmployeeDirectory object, UsersTable is read on first use
+        """
+        self.employees = None
+        self.lock = threading.Lock()
+
+
+    def get_employees(self) -> dict:
+        """ Load UsersTable through a pooled read-only connection if the cache is empty
+
+        Returns:
+            Dict: Employee ID keys with (firstName, lastName) values, ordered by employee ID
+        """
+        with self.lock:
+            if self.employees is None:
+                with ConnectionPool.get_pool().reader() as conn:
+                    rows = conn.execute("SELECT employeeId, firstName, lastName FROM UsersTable ORDER BY employeeId").fetchall()
+
+                self.employees = {int(row[0]): (row[1], row[2]) for row in rows}
+
+            return self.employees
+
+
+    def invalidate(self):
+        """ Drop the cache so the next lookup reloads UsersTable, call after every committed UsersTable write
+        """
+        with self.lock:
+            self.employees = None
+
+
+    def get_name(self, id: int) -> tuple:
+        """ O(1) exact match lookup of an employee ID
+
+        Args:
+            id (int): Employee ID
+
+        Returns:
+            Tuple (firstName, lastName): None if the employee ID is not in UsersTable
+        """
+        return self.get_employees().get(int(id))
+
+
+    def get_full_name(self, id: int) -> str:
+        """ Full name as displayed in reports (e.g. "Dago Reyes Astello")
+
+        Args:
+            id (int): Employee ID
+
+        Returns:
+            str: First name, a space, and last name, or an empty string if the employee ID is not in UsersTable
+        """
+        name = self.get_name(id)
+        if name is None:
+            return ''
+
+        return name[0] + " " + name[1]
+
+
+employeeDirectory = EmployeeDirectory()
 
 class Database:
     
@@ -40,21 +118,40 @@ class Database:
     def __init__(self):
         """ Constructor to initialize an Database object
         """
-        # Connect to the database (create if it doesn't exist)
-        self.conn = sqlite3.connect('TimeReport.db')
+        # Connect to the database (create if it doesn't exist) in WAL mode so report readers never block clock IN / OUT
+        self.conn = ConnectionPool.get_pool().connect()
         self.cursor = self.conn.cursor()
 
-        # Create four tables in TimeReport.db for user name and time logging data storage
+        # Create tables in TimeReport.db for user name and time logging data storage
         self.cursor.execute('''CREATE TABLE IF NOT EXISTS UsersTable (id INTEGER PRIMARY KEY, employeeId INTEGER, firstName TEXT, lastName TEXT)''')
-        self.cursor.execute('''CREATE TABLE IF NOT EXISTS CheckInTable (id INTEGER PRIMARY KEY, employeeId INTEGER, timestamp TEXT)''')
-        self.cursor.execute('''CREATE TABLE IF NOT EXISTS CheckOutTable (id INTEGER PRIMARY KEY, employeeId INTEGER, timestamp TEXT)''')
+        self.cursor.execute('''CREATE INDEX IF NOT EXISTS UsersEmployeeIdIndex ON UsersTable (employeeId)''')
         self.cursor.execute('''CREATE TABLE IF NOT EXISTS WeeklyReportTable (id INTEGER PRIMARY KEY, fullname TEXT, employeeId INTEGER, totalHours INTEGER, day6 INTEGER, day0 INTEGER, day1 INTEGER, day2 INTEGER, day3 INTEGER, day4 INTEGER, day5 INTEGER, inComments TEXT, outComments TEXT)''')
+        self.cursor.execute('''CREATE INDEX IF NOT EXISTS WeeklyReportEmployeeIdIndex ON WeeklyReportTable (employeeId)''')
+
+        # Finished work weeks, weekId is the localDay of the Sunday starting the week
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS WeeklyReportHistoryTable (id INTEGER PRIMARY KEY, weekId INTEGER, fullname TEXT, employeeId INTEGER, totalHours INTEGER, day6 INTEGER, day0 INTEGER, day1 INTEGER, day2 INTEGER, day3 INTEGER, day4 INTEGER, day5 INTEGER, inComments TEXT, outComments TEXT)''')
+        if PunchEvents.object_type(self.cursor, 'WeeklyReportHistoryUniqueIndex') is None:
+            # One snapshot per employee per week, keep the first of any duplicates concurrent rollovers wrote before the index existed
+            self.cursor.execute('''DELETE FROM WeeklyReportHistoryTable WHERE id NOT IN (SELECT MIN(id) FROM WeeklyReportHistoryTable GROUP BY weekId, employeeId)''')
+            self.cursor.execute('''CREATE UNIQUE INDEX WeeklyReportHistoryUniqueIndex ON WeeklyReportHistoryTable (weekId, employeeId)''')
+            self.cursor.execute('''DROP INDEX IF EXISTS WeeklyReportHistoryWeekIndex''')
         
-        # Create debuging logg
-        self.cursor.execute('''CREATE TABLE IF NOT EXISTS DebugLoggingTable (id INTEGER PRIMARY KEY, logMessage TEXT)''')
+        # Create structured event log, DebugLoggingTable in older databases is left as is
+        EventLog.create_tables(self.cursor)
+
+        # Create outbound mail queue, drained by the MailOutbox worker in Main.py
+        MailOutbox.create_tables(self.cursor)
+
+        # Create the per kiosk high water mark that makes journal replays idempotent
+        KioskJournal.create_tables(self.cursor)
         
-        # Commit the five tables to database
+        # Commit the tables to database
         self.conn.commit()
+
+        # Clock IN and clock OUT punches live in PunchEventsTable (open week) and PunchEventsArchiveTable (closed weeks)
+        # CheckInTable and CheckOutTable are read-compatibility views over both
+        PunchEvents.migrate(self.conn, weekId=PunchEvents.to_week_id(LocalClock.local_day()))
+        PunchEvents.build_daily_hours(self.conn)
         
     
     def setup_users(self):
@@ -90,14 +187,12 @@ class Database:
         self.insert_users_table("1025", "Derrick",  "Lohner") 
     
     def setup_weekly_report(self):
-        
+        """ Add an empty WeeklyReportTable row for every employee in UsersTable that does not have one yet
+        """
         zero = 0
-        users = db.query_table("UsersTable")
-        
-        for data in users:
-            employeeID = data[GC.EMPLOYEE_ID_COLUMN_NUMBER]
-            name = data[GC.FIRST_NAME_COLUMN_NUMBER] + " " + data[GC.LAST_NAME_COLUMN_NUMBER]
-            self.cursor.execute("INSERT INTO WeeklyReportTable (fullname, employeeId, totalHours, day6, day0, day1, day2, day3, day4, day5, inComments, outComments) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (name, employeeID, zero, zero, zero, zero, zero, zero, zero, zero, "Missed: ", "Missed:"))
+        for employeeID in employeeDirectory.get_employees():
+            name = employeeDirectory.get_full_name(employeeID)
+            self.cursor.execute("INSERT INTO WeeklyReportTable (fullname, employeeId, totalHours, day6, day0, day1, day2, day3, day4, day5, inComments, outComments) SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM WeeklyReportTable WHERE employeeId = ?)", (name, employeeID, zero, zero, zero, zero, zero, zero, zero, zero, "Missed: ", "Missed: ", employeeID))
         
     def commit_changes(self):
         """ Commit data inserted into a table to the *.db database file 
@@ -117,18 +212,7 @@ class Database:
         Returns:
             Datetime: 
         """
-        tz = pytz.timezone('America/Chicago')
-        zulu = pytz.timezone('UTC')
-        now = datetime.now(tz)
-        if now.dst() == timedelta(0):
-            now = datetime.now(zulu) - timedelta(hours=6)
-            #print('Standard Time')
-
-        else:
-            now = datetime.now(zulu) - timedelta(hours=5)
-            #print('Daylight Savings')   
-            
-        return now 
+        return LocalClock.now()
 
 
     def query_table(self, tableName: str):
@@ -156,7 +240,8 @@ class Database:
             first (str): Full first name (or nickname) of employee
             last (str): The first initial of employee last name to make data less Personally Identifiable Information 
         """
-        results = self.search_users_table(id)
+        self.cursor.execute("SELECT * FROM UsersTable WHERE employeeId = ?", (int(id),))
+        results = self.cursor.fetchall()
 
         if len(results) > 0:
             idPrimaryKeyToUpdate = results[0][0]
@@ -165,87 +250,236 @@ class Database:
             self.cursor.execute("INSERT INTO UsersTable (employeeId, firstName, lastName) VALUES (?, ?, ?)", (id, first, last))
 
         self.commit_changes()
+        employeeDirectory.invalidate()
 
     
-    def insert_check_in_table(self, id: int) -> tuple:
-        """ Insert date and time (to current mintue) into CheckInTable of database
+    def insert_check_in_table(self, id: int, commit: bool = True) -> tuple:
+        """ Insert date and time (to current mintue) into PunchEventsTable (read back through the CheckInTable view)
             https://en.wikipedia.org/wiki/ISO_8601
 
         Args:
             id (int): Employee ID (from 1 to 9999) linked to internal email (e.g. 9000@mammothfactory.co)
+            commit (bool): False to leave the insert in the open transaction so PunchWriter can group commit a batch
+
+        Returns:
+            Tuple (englishError, spanishError): Empty strings if the punch was inserted, "already clocked in" messages otherwise
         """
-        data = self.query_table("CheckInTable")
-        result = list(filter(lambda t: t[GC.EMPLOYEE_ID_COLUMN_NUMBER] == id, data))
+        now = self.get_date_time()
+        result = self.search_check_in_table(id, now)
         if GC.DEBUG_STATEMENTS_ON:  print(f'EMPLOYEE ID FILTER: {result}')
 
-        isoString = '?'
-        currentDateTime = self.get_date_time().isoformat(timespec="minutes")
+        currentDateTime = now.isoformat(timespec="minutes")
         
-        try:
-            storedIsoString = result[0][GC.TIMESTAMP_COLUMN_NUMBER]
-            if GC.DEBUG_STATEMENTS_ON:  print(f'ISO DateTime: {storedIsoString}')
-        
-        except IndexError:
+        if len(result) == 0:
             if GC.DEBUG_STATEMENTS_ON: print(f'INSERTING {id} since this employee ID has NOT clocked IN TODAY')
-            self.cursor.execute("INSERT INTO CheckInTable (employeeId, timestamp) VALUES (?, ?)", (id, currentDateTime))
-            self.commit_changes()
+            self.insert_punch_events_table(id, GC.CLOCK_IN, currentDateTime)
+            if commit: self.commit_changes()
             return '',''
 
-        finally:
-            nameResults= []
-            nameResults = self.search_users_table(str(id))
-            if len(nameResults) > 0:
-                englishError = f'{nameResults[0][GC.FIRST_NAME_COLUMN_NUMBER]} {nameResults[0][GC.LAST_NAME_COLUMN_NUMBER]} you already clocked in today'
-                spanishError = f'{nameResults[0][GC.FIRST_NAME_COLUMN_NUMBER]} {nameResults[0][GC.LAST_NAME_COLUMN_NUMBER]} ya has fichado hoy'
-                return englishError, spanishError
-            else:
-                return '',''
+        storedIsoString = result[0][GC.TIMESTAMP_COLUMN_NUMBER]
+        if GC.DEBUG_STATEMENTS_ON:  print(f'ISO DateTime: {storedIsoString}')
 
+        fullName = employeeDirectory.get_full_name(id)
+        if fullName != '':
+            englishError = f'{fullName} you already clocked in today'
+            spanishError = f'{fullName} ya has fichado hoy'
+            return englishError, spanishError
+        else:
+            return '',''
 
-    def insert_check_out_table(self, id: int) -> tuple:
-        """ Insert date and time (to current mintue) into CheckOutTable of database
+
+    def insert_check_out_table(self, id: int, commit: bool = True) -> tuple:
+        """ Insert date and time (to current mintue) into PunchEventsTable (read back through the CheckOutTable view)
             https://en.wikipedia.org/wiki/ISO_8601
 
         Args:
             id (int): Employee ID (from 1 to 9999) linked to internal email (e.g. 9000@mammothfactory.co)
+            commit (bool): False to leave the insert in the open transaction so PunchWriter can group commit a batch
+
+        Returns:
+            Tuple (englishError, spanishError): Empty strings if the punch was inserted, "already clocked out" messages otherwise
         """
-        data = self.query_table("CheckOutTable")
-        result = list(filter(lambda t: t[GC.EMPLOYEE_ID_COLUMN_NUMBER] == id, data))
+        now = self.get_date_time()
+        result = self.search_check_out_table(id, now)
         if GC.DEBUG_STATEMENTS_ON:  print(f'EMPLOYEE ID FILTER: {result}')
 
-        isoString = '?'
-        currentDateTime = self.get_date_time().isoformat(timespec="minutes")
+        currentDateTime = now.isoformat(timespec="minutes")
         
-        try:
-            storedIsoString = result[0][GC.TIMESTAMP_COLUMN_NUMBER]
-            if GC.DEBUG_STATEMENTS_ON:  print(f'ISO DateTime: {storedIsoString}')
-            
-        except IndexError:
+        if len(result) == 0:
             if GC.DEBUG_STATEMENTS_ON: print(f'INSERTING {id} since this employee ID has NOT clocked OUT TODAY')
-            self.cursor.execute("INSERT INTO CheckOutTable (employeeId, timestamp) VALUES (?, ?)", (id, currentDateTime))
-            self.commit_changes()
+            self.insert_punch_events_table(id, GC.CLOCK_OUT, currentDateTime)
+            if commit: self.commit_changes()
             return '',''
 
-        finally:
-            nameResults = []
-            nameResult = self.search_users_table(str(id))
-            if len(nameResults) > 0:
-                englishError = f'{nameResults[0][GC.FIRST_NAME_COLUMN_NUMBER]} {nameResults[0][GC.LAST_NAME_COLUMN_NUMBER]}  you already clocked out today'
-                spanishError = f'{nameResults[0][GC.FIRST_NAME_COLUMN_NUMBER]} {nameResults[0][GC.LAST_NAME_COLUMN_NUMBER]}  ya saliste hoy'
-                return englishError, spanishError
-            else:
-                return '',''
+        storedIsoString = result[0][GC.TIMESTAMP_COLUMN_NUMBER]
+        if GC.DEBUG_STATEMENTS_ON:  print(f'ISO DateTime: {storedIsoString}')
+
+        fullName = employeeDirectory.get_full_name(id)
+        if fullName != '':
+            englishError = f'{fullName}  you already clocked out today'
+            spanishError = f'{fullName}  ya saliste hoy'
+            return englishError, spanishError
+        else:
+            return '',''
 
 
-    def insert_debug_logging_table(self, debugText: str):
-        """ 
+    def insert_punch_events_table(self, id: int, direction: int, isoString: str):
+        """ Insert a clock IN or clock OUT punch into PunchEventsTable and update its DailyHoursTable and WeeklyReportTable rows, caller is responsible for the commit
 
         Args:
-            debugText (str): ERROR: or WARNING: text message to log 
+            id (int): Employee ID (from 1 to 9999) linked to internal email (e.g. 9000@mammothfactory.co)
+            direction (int): GC.CLOCK_IN or GC.CLOCK_OUT
+            isoString (str): ISO-8601 timestamp to the current minute (e.g. "2023-08-21T17:39+00:00")
         """
-        self.cursor.execute("INSERT INTO DebugLoggingTable (logMessage) VALUES (?)", (debugText,))
-        self.commit_changes()
-        
+        epochLocal = PunchEvents.to_epoch(isoString)
+        localDay = epochLocal // PunchEvents.SECONDS_PER_DAY
+        self.cursor.execute("INSERT INTO PunchEventsTable (employeeId, direction, epochLocal, localDay) VALUES (?, ?, ?, ?)", (int(id), direction, epochLocal, localDay))
+        PunchEvents.refresh_daily_hours(self.cursor, id, localDay)
+        self.update_weekly_report_table(id, localDay)
+
+
+    def parse_punch(self, punch, latestEpoch: int, earliestEpoch: int = None) -> tuple:
+        """ Validate one (employeeId, direction, timestamp) punch from outside the kiosk
+
+        Args:
+            punch (tuple): Employee ID, direction and timestamp as ints, strings, or a datetime
+            latestEpoch (int): Punches after this epochLocal are in the future and rejected
+            earliestEpoch (int): Punches before this epochLocal are too old and rejected, None to accept any age
+
+        Raises:
+            ValueError: With a message saying what is wrong with the punch
+
+        Returns:
+            Tuple (employeeId, direction, epochLocal, localDay): PunchEventsTable column values, timestamp rounded down to the minute like the kiosk
+        """
+        if len(punch) != 3:
+            raise ValueError(f'Expected employee ID, direction, and timestamp but got {len(punch)} values')
+
+        employeeIdText, directionText, timestamp = punch
+        try:
+            employeeId = int(employeeIdText)
+
+        except (TypeError, ValueError):
+            raise ValueError(f'Employee ID {employeeIdText!r} is not a number') from None
+
+        if employeeDirectory.get_name(employeeId) is None:
+            raise ValueError(f'Employee ID {employeeId} is not in UsersTable')
+
+        direction = PUNCH_DIRECTIONS.get(str(directionText).strip().upper())
+        if direction is None:
+            raise ValueError(f'Direction {directionText!r} is not IN or OUT')
+
+        if isinstance(timestamp, str):
+            try:
+                timestamp = datetime.fromisoformat(timestamp.strip())
+
+            except ValueError:
+                raise ValueError(f'Timestamp {timestamp!r} is not ISO-8601') from None
+
+        if not isinstance(timestamp, datetime):
+            raise ValueError(f'Timestamp {timestamp!r} is not ISO-8601')
+
+        epochLocal = int(LocalClock.wall_time(timestamp).timestamp()) // 60 * 60
+        if epochLocal > latestEpoch:
+            raise ValueError(f'Timestamp {PunchEvents.to_iso_string(epochLocal)} is in the future')
+
+        if earliestEpoch is not None and epochLocal < earliestEpoch:
+            raise ValueError(f'Timestamp {PunchEvents.to_iso_string(epochLocal)} is older than {PunchEvents.to_iso_string(earliestEpoch)}')
+
+        return employeeId, direction, epochLocal, epochLocal // PunchEvents.SECONDS_PER_DAY
+
+
+    def import_punches(self, punches, commit: bool = True, maxAge: int = None) -> tuple:
+        """ Bulk insert clock IN / OUT punches from a badge reader, an offline kiosk, or paper time cards in one transaction
+
+            Punches are de-duplicated with the kiosk rule, only the first clock IN and the first clock OUT of an employee ID
+            on a day count, using one PunchEventsDayIndex range read instead of a lookup per punch. Rows are inserted with
+            executemany(), then DailyHoursTable, WeeklyReportTable, PunchEventsArchiveTable and the WeeklyReportHistoryTable rows
+            of closed weeks are brought up to date in the same transaction
+
+        Args:
+            punches (iterable): Of (employeeId, direction, timestamp) tuples, direction is GC.CLOCK_IN, GC.CLOCK_OUT, "IN" or "OUT",
+                                timestamp is an ISO-8601 string or datetime, naive values are Marianna, FL wall clock time
+            commit (bool): False to leave the import in the open transaction
+            maxAge (int): Seconds, older punches are invalid, None to accept any age
+
+        Returns:
+            Tuple (inserted, duplicates, errors): Punches inserted, punches skipped as duplicates, and (punchNumber, message) tuples for invalid punches
+        """
+        latestEpoch = int(LocalClock.now().timestamp()) + 60
+        earliestEpoch = None if maxAge is None else latestEpoch - 60 - maxAge
+        validPunches = []
+        errors = []
+        for punchNumber, punch in enumerate(punches, start=1):
+            try:
+                validPunches.append(self.parse_punch(punch, latestEpoch, earliestEpoch))
+
+            except ValueError as error:
+                errors.append((punchNumber, str(error)))
+
+        if len(validPunches) == 0:
+            return 0, 0, errors
+
+        # The earliest punch wins, like the kiosk which only ever sees punches in time order
+        validPunches.sort(key=lambda punch: punch[2])
+        firstDay = validPunches[0][3]
+        lastDay = validPunches[-1][3]
+        seen = set(self.cursor.execute("SELECT DISTINCT employeeId, localDay, direction FROM PunchEventsAllView WHERE localDay BETWEEN ? AND ?", (firstDay, lastDay)).fetchall())
+
+        rows = []
+        for employeeId, direction, epochLocal, localDay in validPunches:
+            if (employeeId, localDay, direction) not in seen:
+                seen.add((employeeId, localDay, direction))
+                rows.append((employeeId, direction, epochLocal, localDay))
+
+        try:
+            self.cursor.executemany("INSERT INTO PunchEventsTable (employeeId, direction, epochLocal, localDay) VALUES (?, ?, ?, ?)", rows)
+
+            employeeDays = sorted({(localDay, employeeId) for employeeId, _, _, localDay in rows})
+            self.cursor.executemany(PunchEvents.DAILY_HOURS_UPSERT.format(where="localDay = ? AND employeeId = ?"), employeeDays)
+
+            # Ids come from the PunchEventsTable AUTOINCREMENT sequence, so punches for closed weeks are inserted there and moved like a rollover would
+            openWeekId = PunchEvents.get_state(self.cursor, 'WeeklyReportWeekId', None)
+            if openWeekId is not None:
+                PunchEvents.archive_closed_weeks(self.cursor, openWeekId)
+
+            closedWeeks = {}
+            for localDay, employeeId in employeeDays:
+                if openWeekId is None or localDay >= openWeekId:
+                    self.update_weekly_report_table(employeeId, localDay)
+                else:
+                    closedWeeks.setdefault(PunchEvents.to_week_id(localDay), set()).add(employeeId)
+
+            for weekId, employeeIds in sorted(closedWeeks.items()):
+                self.refresh_weekly_report_history(weekId, employeeIds)
+
+            if commit: self.commit_changes()
+
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+
+        return len(rows), len(validPunches) - len(rows), errors
+
+
+    def import_punches_csv(self, csvPath: str, commit: bool = True) -> tuple:
+        """ Bulk import a .csv file of employee ID, direction, timestamp rows, see import_punches()
+
+        Args:
+            csvPath (str): File with an optional header row, blank lines are ignored
+            commit (bool): False to leave the import in the open transaction
+
+        Returns:
+            Tuple (inserted, duplicates, errors): As import_punches(), punch numbers count data rows from 1
+        """
+        with open(csvPath, newline='', encoding='utf-8-sig') as file:
+            rows = [row for row in csv.reader(file) if len(row) > 0]
+
+        if len(rows) > 0 and not rows[0][0].strip().isdigit():
+            rows = rows[1:]
+
+        return self.import_punches(rows, commit)
+
 
     def search_users_table(self, searchTerm: str):
         """ Search UsersTable table for every occurrence of a string
@@ -261,85 +495,227 @@ class Database:
 
         return results
 
-    # NO CURRENTLY USED!!! See ManualTImeCalculations.py to see now .csv report are generated
-    def insert_weekly_report_table(self, id: int, date: datetime):
-        """ Build a table using the following rules:
-        
+    def search_check_in_table(self, id: int, date: datetime):
+        """ Search for every clock IN of one employee ID on one date using the PunchEventsTable (employeeId, localDay) index
+
+        Args:
+            id (int): Employee ID
+            date (datetime): Date to search, only the ISO-8601 date (e.g. "2023-08-22") is used
+
+        Returns:
+            List: Of Tuples (id, employeeId, timestamp), ordered by insertion, for a single employee ID on a single date
+        """
+        return self.search_punch_events_table(GC.CLOCK_IN, id, date)
+
+
+    def search_check_out_table(self, id: int, date: datetime):
+        """ Search for every clock OUT of one employee ID on one date using the PunchEventsTable (employeeId, localDay) index
 
         Args:
             id (int): Employee ID
-            dateToCalulate (datetime): _description_
+            date (datetime): Date to search, only the ISO-8601 date (e.g. "2023-08-22") is used
+
+        Returns:
+            List: Of Tuples (id, employeeId, timestamp), ordered by insertion, for a single employee ID on a single date
         """
-        
+        return self.search_punch_events_table(GC.CLOCK_OUT, id, date)
+
+
+    def search_punch_events_table(self, direction: int, id: int, date: datetime):
+        """ Integer equality lookup on PunchEventsTable, rows keep the legacy (id, employeeId, timestamp) shape
+
+        Args:
+            direction (int): GC.CLOCK_IN or GC.CLOCK_OUT
+            id (int): Employee ID
+            date (datetime): Date to search
+
+        Returns:
+            List: Of Tuples (id, employeeId, ISO-8601 timestamp) for a single employee ID on a single date
+        """
+        self.cursor.execute(f"SELECT id, employeeId, {PunchEvents.ISO_TIMESTAMP_SQL} FROM PunchEventsTable WHERE employeeId = ? AND localDay = ? AND direction = ? ORDER BY id", (int(id), PunchEvents.to_local_day(date), direction))
+
+        return self.cursor.fetchall()
+
+    def search_daily_hours_table(self, id: int, date: datetime) -> tuple:
+        """ Read the hours an employee ID worked on a specific date from the DailyHoursTable materialization
+
+        Args:
+            id (int): Employee ID
+            date (datetime): Date to search
+
+        Returns:
+            Tuple (elaspedHours, clockedIn, clockedOut): (0.0, False, False) if the employee never punched on date
+        """
+        self.cursor.execute("SELECT hours, checkInEpoch IS NOT NULL, checkOutEpoch IS NOT NULL FROM DailyHoursTable WHERE employeeId = ? AND localDay = ?", (int(id), PunchEvents.to_local_day(date)))
+        row = self.cursor.fetchone()
+        if row is None:
+            return 0.0, False, False
+
+        return row[0], bool(row[1]), bool(row[2])
+
+    def update_weekly_report_table(self, id: int, localDay: int):
+        """ Copy one DailyHoursTable row into its WeeklyReportTable day column, caller is responsible for the commit
+
+            totalHours is recalculated from the other six day columns in the same UPDATE, so a punch costs
+            one indexed row read and one row write instead of a sweep of every employee
+
+        Args:
+            id (int): Employee ID
+            localDay (int): Day the punch landed on
+        """
+        weekId = PunchEvents.to_week_id(localDay)
+        currentWeekId = PunchEvents.get_state(self.cursor, 'WeeklyReportWeekId', None)
+        if currentWeekId is None or currentWeekId < weekId:
+            self.rollover_weekly_report_table(weekId, commit=False)
+
+        elif weekId < currentWeekId:
+            # Week already snapshotted into WeeklyReportHistoryTable, DailyHoursTable still has the correction
+            return
+
+        self.cursor.execute("INSERT INTO WeeklyReportTable (fullname, employeeId, totalHours, day6, day0, day1, day2, day3, day4, day5, inComments, outComments) SELECT ?, ?, 0, 0, 0, 0, 0, 0, 0, 0, 'Missed: ', 'Missed: ' WHERE NOT EXISTS (SELECT 1 FROM WeeklyReportTable WHERE employeeId = ?)", (employeeDirectory.get_full_name(id), int(id), int(id)))
+
+        dayColumn = PunchEvents.weekday_column(localDay)
+        otherDays = ' + '.join(column for column in WEEKLY_REPORT_DAY_COLUMNS if column != dayColumn)
+        self.cursor.execute(f"UPDATE WeeklyReportTable SET {dayColumn} = (SELECT hours FROM DailyHoursTable WHERE employeeId = ? AND localDay = ?), totalHours = {otherDays} + (SELECT hours FROM DailyHoursTable WHERE employeeId = ? AND localDay = ?) WHERE employeeId = ?", (int(id), localDay, int(id), localDay, int(id)))
+
+
+    def rollover_weekly_report_table(self, weekId: int = None, commit: bool = True) -> bool:
+        """ Snapshot the finished work week into WeeklyReportHistoryTable, archive its punches, and start an empty WeeklyReportTable for a new week
+
+            Missed clock IN and clock OUT comments are filled in from DailyHoursTable once the week is over.
+            Calling it again for the same (or an older) week is a no-op, so it is safe to run from a timer.
+            WeeklyReportWeekId is read under the write lock, so the Scheduler and the PunchWriter can never both roll over a week.
+
+        Args:
+            weekId (int): localDay of the Sunday starting the new week, defaults to the current week
+            commit (bool): False when called from inside a punch transaction
+
+        Returns:
+            bool: True if a week was rolled over
+        """
+        if weekId is None:
+            weekId = PunchEvents.to_week_id(LocalClock.local_day())
+
+        # A punch transaction already holds the write lock from its INSERT, anything else takes it before reading the state
+        startedTransaction = not self.conn.in_transaction
+        if startedTransaction:
+            self.cursor.execute("BEGIN IMMEDIATE")
+
         try:
-            # Get the day of the week (0=Monday, 1=Tuesday, ..., 6=Sunday)
-            dayOfWeek = date.weekday()
-            if Database.DEBUGGING: 
-                dayOfWeek = GC.SUNDAY
-                #currentTime = time(22, 45, 0)
-                #currentTime = time(23, 22, 0)
-                #currentTime = time(23, 59, 0)
-                #currentTime = time(24, 0, 0)
-                #currentTime = time(1, 2, 0)
-                #currentTime = time(2, 59, 0)
-                #currentTime = time(3, 11, 0)
-            
-            dailyHours = self.calculate_time_delta(id, date) 
-            
-            results = self.search_users_table(id)
-            if len(results) > 0:
-                idPrimaryKeyToUpdate = results[0][0]
-                
-                if dayOfWeek == GC.SUNDAY: 
-                    self.cursor.execute("UPDATE WeeklyReportTable SET day6 = ? WHERE id = ?", (dailyHours, idPrimaryKeyToUpdate))
-                elif dayOfWeek == GC.MONDAY:
-                    self.cursor.execute("UPDATE WeeklyReportTable SET day0 = ? WHERE id = ?", (dailyHours, idPrimaryKeyToUpdate))
-                elif dayOfWeek == GC.TUESDAY:
-                    self.cursor.execute("UPDATE WeeklyReportTable SET day1 = ? WHERE id = ?", (dailyHours, idPrimaryKeyToUpdate))
-                elif dayOfWeek == GC.WEDNESDAY:
-                    self.cursor.execute("UPDATE WeeklyReportTable SET day2 = ? WHERE id = ?", (dailyHours, idPrimaryKeyToUpdate))
-                elif dayOfWeek == GC.THURSDAY:
-                    self.cursor.execute("UPDATE WeeklyReportTable SET day3 = ? WHERE id = ?", (dailyHours, idPrimaryKeyToUpdate))
-                elif dayOfWeek == GC.FRIDAY:
-                    self.cursor.execute("UPDATE WeeklyReportTable SET day4 = ? WHERE id = ?", (dailyHours, idPrimaryKeyToUpdate))
-                elif dayOfWeek == GC.SATURDAY:
-                    self.cursor.execute("UPDATE WeeklyReportTable SET day5 = ? WHERE id = ?", (dailyHours, idPrimaryKeyToUpdate))
-
-                data = self.query_table("WeeklyReportTable")
-                if data ==  None:
-                    pass
-                else:
-                    totalHours = sum(data[idPrimaryKeyToUpdate-1][GC.SUNDAY_COLUMN_NUMBERS:GC.SATURDAY_COLUMN_NUMBERS+1])
-                    xComments = data[idPrimaryKeyToUpdate-1][GC.IN_COMMENTS_COLUMN_NUMBERS:GC.OUT_COMMENTS_COLUMN_NUMBERS+1]
-                    self.cursor.execute("UPDATE WeeklyReportTable SET totalHours = ? WHERE id = ?", (round(totalHours, 2), idPrimaryKeyToUpdate))
-                    
-                    data = self.query_table("DebugLoggingTable")
-                    finalResult = [item for item in data if str(id) in item[1]]
-                    dateToCalulate = date.isoformat(timespec="minutes")[0:10]
-                    dayOfWeek = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+            rolledOver = self.rollover_locked_weekly_report_table(weekId)
+            if commit or startedTransaction:
+                self.commit_changes()
 
-                
-                if finalResult[0][GC.LOG_MESSAGE_COLUMN_NUMBER].endswith(dateToCalulate):
-                    newInText = xComments[0][0:] + " " + dayOfWeek[date.weekday()]
-                    newOutText = xComments[1][0:] + " " + dayOfWeek[date.weekday()]
-                    print(f'Found ID {id} with {dateToCalulate} date')
-                    
-                    self.cursor.execute("UPDATE WeeklyReportTable SET inComments = ? WHERE id = ?", (newInText, idPrimaryKeyToUpdate))
-                    self.cursor.execute("UPDATE WeeklyReportTable SET outComments = ? WHERE id = ?", (newOutText, idPrimaryKeyToUpdate))
+        except sqlite3.Error:
+            if startedTransaction: self.conn.rollback()
+            raise
+
+        return rolledOver
+
+
+    def rollover_locked_weekly_report_table(self, weekId: int) -> bool:
+        """ Body of rollover_weekly_report_table(), call with the write lock held
+
+        Args:
+            weekId (int): localDay of the Sunday starting the new week
+
+        Returns:
+            bool: True if a week was rolled over
+        """
+        currentWeekId = PunchEvents.get_state(self.cursor, 'WeeklyReportWeekId', None)
+        if currentWeekId is not None and weekId <= currentWeekId:
+            return False
+
+        if currentWeekId is None:
+            # First rollover on this database, open last week from DailyHoursTable so it gets a history snapshot too
+            currentWeekId = weekId - 7
+            self.open_weekly_report_week(currentWeekId)
+
+        dailyHours = PunchEvents.read_daily_hours(self.cursor, currentWeekId, currentWeekId + 6)
+        comments = []
+        for employeeId, totalHours in self.cursor.execute("SELECT employeeId, totalHours FROM WeeklyReportTable").fetchall():
+            comments.append(self.missed_comments(dailyHours, employeeId, currentWeekId, totalHours) + (employeeId,))
+
+        self.cursor.executemany("UPDATE WeeklyReportTable SET inComments = ?, outComments = ? WHERE employeeId = ?", comments)
+        self.cursor.execute("INSERT INTO WeeklyReportHistoryTable (weekId, fullname, employeeId, totalHours, day6, day0, day1, day2, day3, day4, day5, inComments, outComments) SELECT ?, fullname, employeeId, ROUND(totalHours, 2), day6, day0, day1, day2, day3, day4, day5, inComments, outComments FROM WeeklyReportTable ORDER BY employeeId", (currentWeekId,))
+        self.cursor.execute("UPDATE WeeklyReportTable SET totalHours = 0, day6 = 0, day0 = 0, day1 = 0, day2 = 0, day3 = 0, day4 = 0, day5 = 0, inComments = 'Missed: ', outComments = 'Missed: '")
+
+        self.open_weekly_report_week(weekId)
+
+        return True
+
+
+    def missed_comments(self, dailyHours: dict, employeeId: int, weekId: int, totalHours: float) -> tuple:
+        """ Missed clock IN and clock OUT comments of one employee for a finished work week
+
+        Args:
+            dailyHours (dict): read_daily_hours() of the week
+            employeeId (int): Employee ID
+            weekId (int): localDay of the Sunday starting the week
+            totalHours (float): Hours worked in the week
+
+        Returns:
+            Tuple (inComments, outComments): 'Missed: All Days' twice if no hours were worked
+        """
+        if totalHours == 0:
+            return 'Missed: All Days', 'Missed: All Days'
+
+        missedIn = missedOut = 0
+        for day in range(7):
+            _, clockedIn, clockedOut = dailyHours.get((employeeId, weekId + day), (0.0, False, False))
+            missedIn |= (not clockedIn) << day
+            missedOut |= (not clockedOut) << day
+
+        return ReportEngine.MISSED_COMMENTS[missedIn], ReportEngine.MISSED_COMMENTS[missedOut]
+
+
+    def refresh_weekly_report_history(self, weekId: int, employeeIds: set):
+        """ Recalculate WeeklyReportHistoryTable rows of a closed week from DailyHoursTable, caller is responsible for the commit
+
+            Used when punches are imported into a week that was already snapshotted. Employees without a row get one,
+            weeks that were never snapshotted are left alone, the week's LaborerTimeReport comes from DailyHoursTable instead
+
+        Args:
+            weekId (int): localDay of the Sunday starting the closed week
+            employeeIds (set): Employee IDs whose punches changed
+        """
+        if self.cursor.execute("SELECT 1 FROM WeeklyReportHistoryTable WHERE weekId = ? LIMIT 1", (weekId,)).fetchone() is None:
+            return
+
+        dailyHours = PunchEvents.read_daily_hours(self.cursor, weekId, weekId + 6)
+        rows = []
+        for employeeId in sorted(employeeIds):
+            hours = [dailyHours.get((employeeId, weekId + day), (0.0, False, False))[0] for day in range(7)]
+            inComments, outComments = self.missed_comments(dailyHours, employeeId, weekId, sum(hours))
+            rows.append((weekId, employeeDirectory.get_full_name(employeeId), employeeId, sum(hours), *hours, inComments, outComments))
+
+        # ROUND() in SQL like the rollover snapshot, WeeklyReportHistoryUniqueIndex makes it an upsert
+        self.cursor.executemany(f'''INSERT INTO WeeklyReportHistoryTable (weekId, fullname, employeeId, totalHours, {', '.join(WEEKLY_REPORT_DAY_COLUMNS)}, inComments, outComments)
+                                    VALUES (?, ?, ?, ROUND(?, 2), ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                    ON CONFLICT (weekId, employeeId) DO UPDATE SET totalHours = excluded.totalHours, {', '.join(f'{column} = excluded.{column}' for column in WEEKLY_REPORT_DAY_COLUMNS)},
+                                    inComments = excluded.inComments, outComments = excluded.outComments''', rows)
+
+
+    def open_weekly_report_week(self, weekId: int):
+        """ Archive punches from before a work week and load the week's DailyHoursTable rows into WeeklyReportTable, caller is responsible for the commit
+
+        Args:
+            weekId (int): localDay of the Sunday starting the week
+        """
+        # Closed weeks leave the hot table, so punch lookups and refresh_daily_hours() only touch the open week
+        archivedPunches = PunchEvents.archive_closed_weeks(self.cursor, weekId)
+        if GC.DEBUG_STATEMENTS_ON: print(f'Archived {archivedPunches} punches from before week {weekId}')
+
+        PunchEvents.set_state(self.cursor, 'WeeklyReportWeekId', weekId)
+        self.setup_weekly_report()
+
+        # Pick up punches already in DailyHoursTable for the week, e.g. the first time a database is opened mid-week
+        for day, column in enumerate(WEEKLY_REPORT_DAY_COLUMNS):
+            self.cursor.execute(f"UPDATE WeeklyReportTable SET {column} = COALESCE((SELECT hours FROM DailyHoursTable WHERE DailyHoursTable.employeeId = WeeklyReportTable.employeeId AND localDay = ?), 0)", (weekId + day,))
+
+        self.cursor.execute(f"UPDATE WeeklyReportTable SET totalHours = {' + '.join(WEEKLY_REPORT_DAY_COLUMNS)}")
 
-            else:
-                print("INVALID USER ID ???")
-                    
-        except ValueError:
-            self.insert_debug_logging_table(f'Invalid date format when generating weekly report on {date}')
-            
-        except IndexError:
-            print("INVALID USER ID")
-            
-        finally:
-            self.commit_changes()
 
-    
     def calculate_time_delta(self, id: int, date: datetime) -> float:
         """ Calculate hours an employee ID worked on a specific date
 
@@ -352,122 +728,78 @@ class Database:
         Returns:
             float: Decimals hours between check in and check out time for a specific employee ID on a specific date
         """
-        clockedIn = True
-        clockedOut = True
-        
-        data = self.query_table("CheckInTable")
-        result = list(filter(lambda t: t[GC.EMPLOYEE_ID_COLUMN_NUMBER] == id, data))
-        dateToCalulate = date.isoformat(timespec="minutes")[0:10]
-        finalResult = list(filter(lambda t: t[GC.TIMESTAMP_COLUMN_NUMBER].startswith(dateToCalulate), result))
-        try:
-            checkInIsoString = finalResult[0][GC.TIMESTAMP_COLUMN_NUMBER]
-            datetimeCheckInObject = datetime.fromisoformat(checkInIsoString)     # Convert the ISO strings to datetime objects
-            
-        except IndexError:
-            self.insert_debug_logging_table(f'Employee ID #{id} never clocked in on {dateToCalulate}')
-            clockedIn = False
-            datetimeCheckInObject = None
-
-        data = self.query_table("CheckOutTable")
-        result = list(filter(lambda t: t[GC.EMPLOYEE_ID_COLUMN_NUMBER] == id, data))
-        finalResult = list(filter(lambda t: t[GC.TIMESTAMP_COLUMN_NUMBER].startswith(dateToCalulate), result))
-        try:
-            checkOutIsoString = finalResult[0][GC.TIMESTAMP_COLUMN_NUMBER]
-            datetimeCheckOutObject = datetime.fromisoformat(checkOutIsoString)   # Convert the ISO strings to datetime objects
-            
-        except IndexError:
-            self.insert_debug_logging_table(f'Employee ID #{id} never clocked out on {dateToCalulate}')
-            clockedOut = False
-            datetimeCheckOutObject = None
-
-        elaspedHours = 0
-        if(not clockedIn and not clockedOut):
-            elaspedHours = 0.0
-        elif(clockedIn and not clockedOut):
-            elaspedHours = 12.0
-        elif(not clockedIn and not clockedOut):
-            elaspedHours = 12.0
-        else:              
-            if datetimeCheckInObject and datetimeCheckOutObject:
-                # Perform the absolute value subtraction (timeDeltaObject is NEVER negative)
-                timeDeltaObject = datetimeCheckOutObject - datetimeCheckInObject
-                elaspedSeconds = timeDeltaObject.seconds
-                elaspedHours = elaspedSeconds / 3600.0
+        elaspedHours, clockedIn, clockedOut = self.search_daily_hours_table(id, date)
+
+        # Buffered, so a report full of absences costs one commit per EVENT_LOG_FLUSH_SIZE events instead of one per missed punch
+        if not clockedIn:
+            eventLog.log(EventLog.WARNING, EventLog.MISSED_CLOCK_IN, id, PunchEvents.to_local_day(date))
+
+        if not clockedOut:
+            eventLog.log(EventLog.WARNING, EventLog.MISSED_CLOCK_OUT, id, PunchEvents.to_local_day(date))
 
         return elaspedHours
     
     
     def export_table_to_csv(self, tableNames: list):
-        """ Creates a filename assuming that the date that this code runs is a Monday
+        """ Export last work week (Sunday to Saturday before the current week) to .csv files in TimeCardReports
+
+            Each file atomically replaces any earlier export and is listed with its row count and checksum in the week's manifest
 
         Args:
             tableNames (list): List of string table names in the database to convert
+
+        Returns:
+            List: Path of every .csv file published
         """
+        # Create a .csv filename base on last Sunday to last Saturday to create for example 2023-08-20_2023-08-26_LaborerTimeReport
+        lastSundayDate, lastSaturdayDate = LocalClock.last_week_bounds()
+        lastSunday = lastSundayDate.isoformat()
+        lastSaturday = lastSaturdayDate.isoformat()
+        firstDay = PunchEvents.to_local_day(lastSundayDate)
+
+        # Table name: (column names, filename suffix, SQL statement that streams the rows to export)
+        exports = {
+            "WeeklyReportTable": (["Full Name", "Employee ID", "Total Hours", "Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Check In Comments", "Check Out Comments"],
+                                  "_LaborerTimeReport.csv", ("SELECT fullname, employeeId, totalHours, day6, day0, day1, day2, day3, day4, day5, inComments, outComments FROM WeeklyReportHistoryTable WHERE weekId = ? ORDER BY employeeId", (firstDay,))),
+            "CheckInTable":      (["Full Name", "Employee ID", "Clock IN Timestamp"], "_ClockInTimes.csv",
+                                  (f"SELECT employeeId, {PunchEvents.ISO_TIMESTAMP_SQL} FROM PunchEventsAllView WHERE localDay BETWEEN ? AND ? AND direction = ? ORDER BY id", (firstDay, firstDay + 6, GC.CLOCK_IN))),
+            "CheckOutTable":     (["Full Name", "Employee ID", "Clock OUT Timestamp"], "_ClockOutTimes.csv",
+                                  (f"SELECT employeeId, {PunchEvents.ISO_TIMESTAMP_SQL} FROM PunchEventsAllView WHERE localDay BETWEEN ? AND ? AND direction = ? ORDER BY id", (firstDay, firstDay + 6, GC.CLOCK_OUT)))
+        }
+
+        filenamePrefix = os.path.join(os.getcwd(), 'TimeCardReports', lastSunday + "_" + lastSaturday)
+        reports = []
         for table in tableNames:
+            if table not in exports:
+                print(f'Table Name {table} conversion not implemented')
+                continue
 
-            # Fetch data from the table
-            data = self.query_table(table)
+            columnNames, filenameSuffix, (sqlStatement, parameters) = exports[table]
+
+            # Stream rows with fetchmany() so memory use is bounded by GC.EXPORT_BATCH_SIZE instead of the table size
+            cursor = self.conn.execute(sqlStatement, parameters)
+            data = cursor.fetchmany(GC.EXPORT_BATCH_SIZE)
             
             if len(data) == 0:
-                self.insert_debug_logging_table(f'No table named {table} when converting table to CSV in Database.export_table_to_csv() function at {self.get_date_time()}')
+                eventLog.log(EventLog.WARNING, EventLog.EMPTY_EXPORT, day=firstDay, detail=table)
                 
             else:
-                # Create a .csv filename base on (Monday - 8 days) to (Monday - 2 days) to create for example 2023-08-01_2023-08-07_LaborerTimeReport
-                lastSunday = (self.get_date_time() - timedelta(days=8)).isoformat(timespec="minutes")[0:10]
-                lastSaturday = (self.get_date_time() - timedelta(days=2)).isoformat(timespec="minutes")[0:10]
-                
-                currentDirectory = os.getcwd()
-                nextDirectory = os.path.join(currentDirectory, 'TimeCardReports')
-                if not os.path.exists(nextDirectory):
-                    os.makedirs(nextDirectory)
-                
-                if table == "WeeklyReportTable":
-                    columnNames = ["Full Name", "Employee ID", "Total Hours", "Sunday", "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Check In Comments", "Check Out Comments"]
-                    outputFilename = lastSunday + "_" + lastSaturday  + "_LaborerTimeReport.csv"  
-                    filePath = os.path.join(nextDirectory, outputFilename)
-                    
-                    with open(filePath, 'w', newline='') as csvfile:
-                        csv_writer = csv.writer(csvfile)
-                        csv_writer.writerow(columnNames[0:12])
-                        for row in data:
-                            csv_writer.writerow(row[1:])
-                            
-                    csvfile.close()
-                    
-                elif table == "CheckInTable":
-                    columnNames = ["Full Name", "Employee ID", "Clock IN Timestamp"]
-                    outputFilename = lastSunday + "_" + lastSaturday  + "_ClockInTimes.csv"
-                    filePath = os.path.join(nextDirectory, outputFilename)
-
-                    with open(filePath, 'w', newline='') as csvfile:
-                        csv_writer = csv.writer(csvfile)
-                        csv_writer.writerow(columnNames[0:4])
-                        for row in data:
-                            csv_writer.writerow(row[1:])
-                            
-                    csvfile.close()
-                        
-                elif table == "CheckOutTable":
-                    columnNames = ["Full Name", "Employee ID", "Clock OUT Timestamp"]
-                    outputFilename = lastSunday + "_" + lastSaturday  + "_ClockOutTimes.csv" 
-                    filePath = os.path.join(nextDirectory, outputFilename)
-                    
-                    with open(filePath, 'w', newline='') as csvfile:
-                        csv_writer = csv.writer(csvfile)
-                        csv_writer.writerow(columnNames[0:4])
-                        for row in data:
-                            csv_writer.writerow(row[1:])
-                            
-                    csvfile.close()
+                with ReportWriter.ReportFile(filenamePrefix + filenameSuffix, columnNames) as report:
+                    while len(data) > 0:
+                        report.writerows(data)
+                        data = cursor.fetchmany(GC.EXPORT_BATCH_SIZE)
                 
-                else:
-                    print(f'Table Name {table} conversion not implemented')
-                 
+                reports.append(report)
+        
+        if len(reports) > 0:
+            ReportWriter.publish_manifest(filenamePrefix, reports)
+
+        return [report.path for report in reports]
+
     def is_date_between(startDatetimeObj, endDatetimeObj, dateToCheck) -> bool:
         return startDatetimeObj <= dateToCheck <= endDatetimeObj
 
 if __name__ == "__main__":
-    canUpdateweeklyReportTable = True   #TODO REMOVE AFTER Main.generate_report() and Main.update_weekly_report_table() is tested
     print("Testing Database.py")
 
     db = Database()
@@ -482,20 +814,8 @@ if __name__ == "__main__":
     print(checkOutErrors)
     """
     
-    users = db.query_table("UsersTable")
-    for data in users:
-        employeeID = data[GC.EMPLOYEE_ID_COLUMN_NUMBER]
-        
-        currentDateObj = datetime(2023, 8, 27, 5, 0, 0) #db.get_date_time()
-        dayOfWeek = currentDateObj.weekday()
-        currentTime = currentDateObj.time()
-        if dayOfWeek == GC.SUNDAY and (ELEVEN_PM < currentTime and currentTime < THREE_AM):
-            canUpdateweeklyReportTable = False
-            
-        if canUpdateweeklyReportTable:
-            #print(f'Updating weekly report for ID {employeeID} on {currentDateObj}')
-            db.insert_weekly_report_table(employeeID, currentDateObj)
-
+    if db.rollover_weekly_report_table():
+        print("Snapshotted last week into WeeklyReportHistoryTable")
     
     #db.export_table_to_csv(["WeeklyReportTable", "CheckInTable", "CheckOutTable"])
     
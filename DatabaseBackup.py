@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "Compressed full and page level incremental TimeReport.db backups built from SQLite online backup API snapshots"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+
+# Standard Python libraries
+import argparse                                 # https://docs.python.org/3/library/argparse.html
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3                                  # https://docs.python.org/3/library/sqlite3.html
+import struct
+
+# Internal modules
+import GlobalConstants as GC
+import LocalClock
+import ConnectionPool
+import ReportWriter
+
+# Delta file layout, gzip compressed: header, then (page number, page bytes) records, then END_OF_PAGES
+DELTA_MAGIC = b'TTDELTA1'
+DELTA_HEADER = struct.Struct('>8sII32s32s')     # Magic, page size, page count of the new snapshot, SHA-256 of the base and of the new snapshot
+PAGE_NUMBER = struct.Struct('>I')
+END_OF_PAGES = 0xFFFFFFFF
+
+LAST_SHIPPED_FILENAME = 'LastShipped.db'
+STATE_FILENAME = 'BackupState.json'
+
+
+def file_sha256(path: str) -> bytes:
+    """ SHA-256 of a file read in GC.EXPORT_BUFFER_SIZE blocks
+
+    Returns:
+        bytes: 32 byte digest
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        block = file.read(GC.EXPORT_BUFFER_SIZE)
+        while len(block) > 0:
+            digest.update(block)
+            block = file.read(GC.EXPORT_BUFFER_SIZE)
+
+    return digest.digest()
+
+
+def page_size(path: str) -> int:
+    """ Page size of an SQLite database file
+
+    Returns:
+        int: Bytes per page, the unit incremental backups are built from
+    """
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('PRAGMA page_size').fetchone()[0]
+
+    finally:
+        conn.close()
+
+
+def compress_file(sourcePath: str, compressedPath: str):
+    """ gzip a file block by block, memory use stays at one block whatever the file size
+    """
+    with open(sourcePath, 'rb') as source, gzip.GzipFile(compressedPath, 'wb', mtime=0) as target:
+        shutil.copyfileobj(source, target, GC.EXPORT_BUFFER_SIZE)
+
+
+def decompress_file(compressedPath: str, outputPath: str):
+    """ Inverse of compress_file()
+    """
+    with gzip.open(compressedPath, 'rb') as source, open(outputPath, 'wb') as target:
+        shutil.copyfileobj(source, target, GC.EXPORT_BUFFER_SIZE)
+
+
+def write_delta(basePath: str, newPath: str, deltaPath: str) -> int:
+    """ Write the pages of a new snapshot that differ from the base snapshot as a gzip compressed delta file
+
+        The backup API copies pages without renumbering them, and PunchEventsTable only ever appends, so a day of
+        punches changes a handful of pages no matter how large TimeReport.db has grown
+
+    Args:
+        basePath (str): Last shipped snapshot
+        newPath (str): Snapshot to ship
+        deltaPath (str): Delta file to create
+
+    Returns:
+        int: Number of changed pages written
+    """
+    pageSize = page_size(newPath)
+    if page_size(basePath) != pageSize:
+        raise ValueError(f'Page size changed from {page_size(basePath)} to {pageSize} bytes, ship a full backup instead')
+
+    pageCount = os.path.getsize(newPath) // pageSize
+    changedPages = 0
+    with open(basePath, 'rb') as base, open(newPath, 'rb') as new, gzip.GzipFile(deltaPath, 'wb', mtime=0) as delta:
+        delta.write(DELTA_HEADER.pack(DELTA_MAGIC, pageSize, pageCount, file_sha256(basePath), file_sha256(newPath)))
+        for pageNumber in range(pageCount):
+            page = new.read(pageSize)
+            if base.read(pageSize) != page:
+                delta.write(PAGE_NUMBER.pack(pageNumber))
+                delta.write(page)
+                changedPages += 1
+
+        delta.write(PAGE_NUMBER.pack(END_OF_PAGES))
+
+    return changedPages
+
+
+def apply_delta(databasePath: str, deltaPath: str):
+    """ Bring a restored snapshot forward by one delta file in place
+
+    Args:
+        databasePath (str): Snapshot the delta was built against, modified in place
+        deltaPath (str): File from write_delta()
+
+    Raises:
+        ValueError: If the delta belongs to a different base snapshot or the result does not match the shipped snapshot
+    """
+    with gzip.open(deltaPath, 'rb') as delta:
+        magic, pageSize, pageCount, baseSha, newSha = DELTA_HEADER.unpack(delta.read(DELTA_HEADER.size))
+        if magic != DELTA_MAGIC:
+            raise ValueError(f'{deltaPath} is not a TimeReport.db delta file')
+
+        if file_sha256(databasePath) != baseSha:
+            raise ValueError(f'{deltaPath} was built against a different snapshot, apply the backups in sequence order')
+
+        with open(databasePath, 'r+b') as database:
+            database.truncate(pageCount * pageSize)
+            pageNumber = PAGE_NUMBER.unpack(delta.read(PAGE_NUMBER.size))[0]
+            while pageNumber != END_OF_PAGES:
+                database.seek(pageNumber * pageSize)
+                database.write(delta.read(pageSize))
+                pageNumber = PAGE_NUMBER.unpack(delta.read(PAGE_NUMBER.size))[0]
+
+    if file_sha256(databasePath) != newSha:
+        raise ValueError(f'Applying {deltaPath} did not reproduce the shipped snapshot')
+
+
+def restore(backupPaths: list, outputPath: str):
+    """ Rebuild TimeReport.db from a full backup followed by the incremental backups shipped after it
+
+    Args:
+        backupPaths (list): A .db.gz full backup, then .delta.gz files in sequence order
+        outputPath (str): Database file to create
+    """
+    decompress_file(backupPaths[0], outputPath)
+    for deltaPath in backupPaths[1:]:
+        apply_delta(outputPath, deltaPath)
+
+
+def read_state(directory: str) -> dict:
+    """ Sequence number and checksum of the last shipped backup
+
+    Returns:
+        Dict: With "sequence", "fullSequence" and "sha256" keys, empty if nothing was shipped yet
+    """
+    path = os.path.join(directory, STATE_FILENAME)
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+def ship_backup(mailer, senderEmail: str, receiverEmail: str, directory: str = GC.BACKUP_DIRECTORY, forceFull: bool = False) -> str:
+    """ Email a gzip compressed backup of TimeReport.db, only the pages changed since the last shipped backup when possible
+
+        A full backup is shipped the first time, every GC.BACKUP_FULL_INTERVAL backups, and whenever the last shipped
+        snapshot is missing or does not match its recorded checksum. The snapshot only becomes the base of the next delta
+        after the mail server accepts the message, so a failed send is simply retried from the same base
+
+    Args:
+        mailer (Email): Configured SMTP client
+        senderEmail (str): From address
+        receiverEmail (str): To address
+        directory (str): Holds the last shipped snapshot and BackupState.json
+        forceFull (bool): True to ship a full backup
+
+    Returns:
+        str: Filename of the attachment sent (e.g. "TimeReport-000012.delta.gz")
+    """
+    os.makedirs(directory, exist_ok=True)
+    state = read_state(directory)
+    basePath = os.path.join(directory, LAST_SHIPPED_FILENAME)
+    snapshotPath = os.path.join(directory, '.Snapshot.db')
+    sequence = state.get("sequence", 0) + 1
+
+    isFull = forceFull or sequence - state.get("fullSequence", 0) > GC.BACKUP_FULL_INTERVAL or not os.path.exists(basePath) \
+             or file_sha256(basePath).hex() != state.get("sha256")
+
+    if os.path.exists(snapshotPath):
+        os.unlink(snapshotPath)
+
+    ConnectionPool.create_snapshot(snapshotPath)
+    attachmentPath = os.path.join(directory, f'TimeReport-{sequence:06d}' + ('.db.gz' if isFull else '.delta.gz'))
+    try:
+        if isFull:
+            compress_file(snapshotPath, attachmentPath)
+            body = f'Full TimeReport.db backup #{sequence}, restore with "python3 DatabaseBackup.py --restore TimeReport.db {os.path.basename(attachmentPath)}"'
+        else:
+            changedPages = write_delta(basePath, snapshotPath, attachmentPath)
+            body = f'Incremental TimeReport.db backup #{sequence} with {changedPages} changed pages since backup #{sequence - 1}\n' \
+                   f'Restore by listing the last full backup and every incremental backup after it in order, ending with {os.path.basename(attachmentPath)}'
+
+        mailer.send_email(senderEmail, receiverEmail, f'TimeReport.db backup #{sequence} {LocalClock.now().date().isoformat()}', body, [attachmentPath])
+
+        os.replace(snapshotPath, basePath)
+        state = {"sequence": sequence, "fullSequence": sequence if isFull else state["fullSequence"], "sha256": file_sha256(basePath).hex()}
+        ReportWriter.write_atomically(os.path.join(directory, STATE_FILENAME), (json.dumps(state, indent=4) + '\n').encode('utf-8'))
+
+    finally:
+        for path in (snapshotPath, attachmentPath):
+            if os.path.exists(path):
+                os.unlink(path)
+
+    return os.path.basename(attachmentPath)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Restore TimeReport.db from emailed backups')
+    parser.add_argument('--restore', nargs='+', metavar=('OUTPUT', 'BACKUP'), required=True, help='Database file to create, then a .db.gz full backup and the .delta.gz files shipped after it in order')
+    args = parser.parse_args()
+
+    restore(args.restore[1:], args.restore[0])
+    print(f'Restored {args.restore[0]} from {len(args.restore) - 1} backups')
@@ -1,50 +1,155 @@
+import argparse                             # https://docs.python.org/3/library/argparse.html
+import base64
+import os
 import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email import encoders
-# THIS DOES NTO WORK ON GMAIL 
+import uuid
+from email.utils import formatdate, make_msgid
+
+import GlobalConstants as GC
+
+# THIS DOES NTO WORK ON GMAIL
 # https://support.google.com/accounts/answer/6010255?sjid=13720257961439252325-NA#zippy=%2Cif-less-secure-app-access-is-on-for-your-account
 # https://myaccount.google.com/lesssecureapps?pli=1&rapt=AEjHL4MWcwLHSAVnfE9svUWDfcLFvMtpgWsxFpbCQXV1mXoGSxOG_2HG-ldIKEoG80u5mTzPmio7DE-A3XalEn_bjw0L5jxm8Q
 
+# Bytes of attachment read per base64 encode, a multiple of 57 so every encoded line is a full 76 characters
+ATTACHMENT_CHUNK_SIZE = 57 * 1024
+
+def configured_email():
+    """ Email client for the SMTP server set by the TIMETRACKER_SMTP_* environment variables, GlobalConstants otherwise
+
+    Returns:
+        Email: Logs in only if TIMETRACKER_SMTP_PASSWORD is set
+    """
+    password = os.environ.get('TIMETRACKER_SMTP_PASSWORD')
+
+    return Email(os.environ.get('TIMETRACKER_SMTP_HOST', GC.SMTP_HOST), int(os.environ.get('TIMETRACKER_SMTP_PORT', GC.SMTP_PORT)),
+                 os.environ.get('TIMETRACKER_SMTP_TLS', '1' if GC.SMTP_USE_TLS else '0') == '1',
+                 os.environ.get('TIMETRACKER_SMTP_USERNAME', GC.MAIL_SENDER) if password is not None else None, password)
+
+
 class Email:
-    
-    def send_email(sender_email, sender_password, receiver_email, subject, body, file_path):
-        # Create the email message
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = receiver_email
-        msg['Subject'] = subject
-
-        # Add body to the email
-        msg.attach(MIMEBase('text', 'plain'))
-        msg.attach(MIMEBase('text', 'plain').set_payload(body))
-
-        # Attach the .db file
-        with open(file_path, 'rb') as file:
-            part = MIMEBase('application', 'octet-stream')
-            part.set_payload(file.read())
-        encoders.encode_base64(part)
-        part.add_header('Content-Disposition', f'attachment; filename="{file_path}"')
-        msg.attach(part)
-
-        # Send the email
+    """ SMTP client that streams file attachments, so memory use does not grow with the attachment size
+    """
+
+    def __init__(self, host: str = GC.SMTP_HOST, port: int = GC.SMTP_PORT, useTls: bool = GC.SMTP_USE_TLS, username: str = None, password: str = None):
+        """ Constructor to initialize an Email object, no connection is opened until a message is sent
+
+        Args:
+            host (str): SMTP server (e.g. "smtp.gmail.com", or "localhost" for an aiosmtpd stand-in)
+            port (int): SMTP server port
+            useTls (bool): True to upgrade the connection with STARTTLS
+            username (str): SMTP login, None to send without authenticating
+            password (str): SMTP password
+        """
+        self.host = host
+        self.port = port
+        self.useTls = useTls
+        self.username = username
+        self.password = password
+
+
+    def connect(self) -> smtplib.SMTP:
+        """ Open, secure and log in to an SMTP session
+
+        Returns:
+            smtplib.SMTP: Connected session, use it as a context manager so it is closed with QUIT
+        """
+        server = smtplib.SMTP(self.host, self.port, timeout=GC.SMTP_TIMEOUT)
         try:
-            server = smtplib.SMTP('smtp.gmail.com', 587)
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.sendmail(sender_email, receiver_email, msg.as_string())
-            server.quit()
-            print("Email sent successfully!")
-        except Exception as e:
-            print(f"Error sending email: {e}")
-            
+            if self.useTls:
+                server.starttls()
+                server.ehlo()
+
+            if self.username is not None:
+                server.login(self.username, self.password)
+
+        except BaseException:
+            server.close()
+            raise
+
+        return server
+
+
+    def send_email(self, senderEmail: str, receiverEmail: str, subject: str, body: str, filePaths: list, server: smtplib.SMTP = None):
+        """ Send a text message with file attachments, base64 encoding each file while it is written to the socket
+
+        Args:
+            senderEmail (str): From address
+            receiverEmail (str): To address
+            subject (str): ASCII subject line
+            body (str): Plain text message
+            filePaths (list): Files to attach
+            server (smtplib.SMTP): Session from connect() to reuse, None to open and close one for this message
+
+        Raises:
+            smtplib.SMTPException: If the server refuses the message
+        """
+        if server is None:
+            with self.connect() as newServer:
+                self.send_email(senderEmail, receiverEmail, subject, body, filePaths, newServer)
+
+            return
+
+        boundary = uuid.uuid4().hex
+        headers = [f'From: {senderEmail}', f'To: {receiverEmail}', f'Subject: {subject}', f'Date: {formatdate(localtime=True)}', f'Message-ID: {make_msgid()}',
+                   'MIME-Version: 1.0', f'Content-Type: multipart/mixed; boundary="{boundary}"', '',
+                   f'--{boundary}', 'Content-Type: text/plain; charset="utf-8"', 'Content-Transfer-Encoding: 8bit', '']
+
+        # SMTP ends the message at a line holding a single '.', so body lines starting with '.' are dot-stuffed (RFC 5321 section 4.5.2)
+        bodyLines = ['.' + line if line.startswith('.') else line for line in body.splitlines()]
+
+        server.ehlo_or_helo_if_needed()
+        code, response = server.mail(senderEmail)
+        if code != 250:
+            server.rset()
+            raise smtplib.SMTPSenderRefused(code, response, senderEmail)
+
+        code, response = server.rcpt(receiverEmail)
+        if code not in (250, 251):
+            server.rset()
+            raise smtplib.SMTPRecipientsRefused({receiverEmail: (code, response)})
+
+        code, response = server.docmd('DATA')
+        if code != 354:
+            server.rset()
+            raise smtplib.SMTPDataError(code, response)
+
+        server.send(('\r\n'.join(headers + bodyLines) + '\r\n').encode('utf-8'))
+        for filePath in filePaths:
+            attachmentHeaders = ['', f'--{boundary}', 'Content-Type: application/octet-stream', 'Content-Transfer-Encoding: base64',
+                                 f'Content-Disposition: attachment; filename="{os.path.basename(filePath)}"', '']
+            server.send(('\r\n'.join(attachmentHeaders) + '\r\n').encode('utf-8'))
+            with open(filePath, 'rb') as file:
+                chunk = file.read(ATTACHMENT_CHUNK_SIZE)
+                while len(chunk) > 0:
+                    server.send(base64.encodebytes(chunk).replace(b'\n', b'\r\n'))
+                    chunk = file.read(ATTACHMENT_CHUNK_SIZE)
+
+        server.send(f'\r\n--{boundary}--\r\n.\r\n'.encode('ascii'))
+        code, response = server.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, response)
+
+        print(f'Email to {receiverEmail} with {len(filePaths)} attachments sent successfully!')
+
+
 if __name__ == "__main__":
-    
-    senderEmail = 'blaze.mfc.us@gmail.com'
-    senderPassword = 'MammothTusk@42'
-    receiverEmail = 'blazes@mfc.us'
-    subject = 'Daily TimeReport.db file'
-    body = 'Please see attached TimeReport.db file'
-    filepath = 'C:/Users/Framecad/TimeTracker/TimeReport.db'
-  
-    Email.send_email(senderEmail, senderPassword, receiverEmail, subject, body, filepath)
+    import ConnectionPool
+    import DatabaseBackup
+
+    parser = argparse.ArgumentParser(description='Email a compressed full or incremental TimeReport.db backup')
+    parser.add_argument('--host', default=GC.SMTP_HOST, help='SMTP server, e.g. localhost for "python3 -m aiosmtpd -n -l localhost:8025"')
+    parser.add_argument('--port', type=int, default=GC.SMTP_PORT, help='SMTP server port')
+    parser.add_argument('--no-tls', action='store_true', help='Do not upgrade the connection with STARTTLS')
+    parser.add_argument('--username', default=os.environ.get('TIMETRACKER_SMTP_USERNAME'), help='SMTP login, defaults to $TIMETRACKER_SMTP_USERNAME or the sender if $TIMETRACKER_SMTP_PASSWORD is set')
+    parser.add_argument('--sender', default=GC.MAIL_SENDER, help='From address')
+    parser.add_argument('--receiver', default='blazes@mfc.us', help='To address')
+    parser.add_argument('--full', action='store_true', help='Ship a full backup even if an incremental one is possible')
+    args = parser.parse_args()
+
+    ConnectionPool.configure(GC.DATABASE_FILENAME)
+    # Log in as the sender unless a different SMTP login is given, send without logging in if no password is set
+    password = os.environ.get('TIMETRACKER_SMTP_PASSWORD')
+    username = args.username if args.username is not None else (args.sender if password is not None else None)
+    mailer = Email(args.host, args.port, not args.no_tls, username, password)
+    DatabaseBackup.ship_backup(mailer, args.sender, args.receiver, forceFull=args.full)
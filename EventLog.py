@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "Structured event log with an in-memory ring buffer that is flushed to EventLogTable in batches"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+
+# Standard Python libraries
+import atexit
+import sqlite3                                  # https://docs.python.org/3/library/sqlite3.html
+import threading
+from collections import deque                   # https://docs.python.org/3/library/collections.html#collections.deque
+
+# Internal modules
+import GlobalConstants as GC
+import ConnectionPool
+import LocalClock
+
+# Levels
+ERROR = 'ERROR'
+WARNING = 'WARNING'
+INFO = 'INFO'
+
+# Codes
+MISSED_CLOCK_IN = 'MISSED_CLOCK_IN'
+MISSED_CLOCK_OUT = 'MISSED_CLOCK_OUT'
+EMPTY_EXPORT = 'EMPTY_EXPORT'
+MAIL_RETRY = 'MAIL_RETRY'
+MAIL_FAILED = 'MAIL_FAILED'
+KIOSK_PUNCH_REJECTED = 'KIOSK_PUNCH_REJECTED'
+PUNCH_FAILED = 'PUNCH_FAILED'
+
+INSERT_EVENT = "INSERT INTO EventLogTable (ts, level, employeeId, day, code, detail) VALUES (?, ?, ?, ?, ?, ?)"
+
+
+def create_tables(cursor: sqlite3.Cursor):
+    """ Create EventLogTable and the (employeeId, day, code) index that answers "missed punches for employee X on day D"
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor on a read-write connection, caller is responsible for the commit
+    """
+    cursor.execute('''CREATE TABLE IF NOT EXISTS EventLogTable (id INTEGER PRIMARY KEY, ts INTEGER, level TEXT, employeeId INTEGER, day INTEGER, code TEXT, detail TEXT)''')
+    cursor.execute('''CREATE INDEX IF NOT EXISTS EventLogEmployeeDayIndex ON EventLogTable (employeeId, day, code)''')
+
+
+class EventLog:
+    """ Buffer events in memory and write them to EventLogTable in one transaction per batch, instead of one commit per message
+
+        The buffer is a ring, if TimeReport.db can not be written for long enough to fill it the oldest events are dropped and counted
+    """
+
+    def __init__(self, capacity: int = GC.EVENT_LOG_CAPACITY, flushSize: int = GC.EVENT_LOG_FLUSH_SIZE):
+        """ Constructor to initialize an empty EventLog object
+
+        Args:
+            capacity (int): Maximum events held in memory
+            flushSize (int): Buffered events that trigger a flush from log()
+        """
+        self.events = deque(maxlen=capacity)
+        self.flushSize = flushSize
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+
+    def log(self, level: str, code: str, employeeId: int = None, day: int = None, detail: str = None):
+        """ Buffer one event, flushing the buffer once it holds flushSize events
+
+        Args:
+            level (str): ERROR, WARNING or INFO
+            code (str): Event code (e.g. MISSED_CLOCK_IN)
+            employeeId (int): Employee ID the event is about, if any
+            day (int): localDay the event is about, if any
+            detail (str): Free text context such as a table name
+        """
+        event = (int(LocalClock.now().timestamp()), level, None if employeeId is None else int(employeeId), day, code, detail)
+        with self.lock:
+            if len(self.events) == self.events.maxlen:
+                self.dropped += 1
+
+            self.events.append(event)
+            isFull = len(self.events) >= self.flushSize
+
+        # A locked or full TimeReport.db must never fail the caller, the events stay buffered for the next flush
+        if isFull:
+            try:
+                self.flush()
+
+            except sqlite3.Error as error:
+                print(f'EventLog flush failed, {len(self.events)} events kept in memory: {error}')
+
+
+    def flush(self) -> int:
+        """ Write every buffered event to EventLogTable in one transaction on a short-lived writer connection
+
+        Returns:
+            int: Number of events written
+        """
+        with self.lock:
+            events = list(self.events)
+            self.events.clear()
+
+        if len(events) == 0:
+            return 0
+
+        try:
+            conn = ConnectionPool.get_pool().connect()
+            try:
+                conn.executemany(INSERT_EVENT, events)
+                conn.commit()
+
+            finally:
+                conn.close()
+
+        except sqlite3.Error:
+            # Put the batch back in front of anything logged since, keeping the newest events if the ring overflows
+            with self.lock:
+                pending = events + list(self.events)
+                self.dropped += max(0, len(pending) - self.events.maxlen)
+                self.events = deque(pending, maxlen=self.events.maxlen)
+            raise
+
+        return len(events)
+
+
+    def find(self, employeeId: int, firstDay: int, lastDay: int, code: str = None) -> list:
+        """ Indexed lookup of the events about one employee ID in a range of days, after flushing the buffer
+
+        Args:
+            employeeId (int): Employee ID
+            firstDay (int): First localDay
+            lastDay (int): Last localDay (inclusive)
+            code (str): Only return events with this code, None for every code
+
+        Returns:
+            List: Of (ts, level, employeeId, day, code, detail) tuples in the order they were logged
+        """
+        self.flush()
+
+        sqlStatement = "SELECT ts, level, employeeId, day, code, detail FROM EventLogTable WHERE employeeId = ? AND day BETWEEN ? AND ?"
+        parameters = [int(employeeId), firstDay, lastDay]
+        if code is not None:
+            sqlStatement += " AND code = ?"
+            parameters.append(code)
+
+        with ConnectionPool.get_pool().reader() as conn:
+            return conn.execute(sqlStatement + " ORDER BY id", parameters).fetchall()
+
+
+    def missed_punches(self, employeeId: int, day: int) -> list:
+        """ Missed clock IN / OUT events logged for one employee ID on one day
+
+        Args:
+            employeeId (int): Employee ID
+            day (int): localDay
+
+        Returns:
+            List: Of MISSED_CLOCK_IN and MISSED_CLOCK_OUT codes, without duplicates
+        """
+        codes = [event[4] for event in self.find(employeeId, day, day)]
+
+        return [code for code in (MISSED_CLOCK_IN, MISSED_CLOCK_OUT) if code in codes]
+
+
+eventLog = EventLog()
+
+# Scripts such as CronJobScript.py and ManualTimeCalculations.py never call flush() themselves
+atexit.register(eventLog.flush)
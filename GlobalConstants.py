@@ -21,6 +21,27 @@ SATURDAY_COLUMN_NUMBERS = 10
 IN_COMMENTS_COLUMN_NUMBERS = 11
 OUT_COMMENTS_COLUMN_NUMBERS = 12
 
+# SQLite Connection CONSTANTS
+DATABASE_FILENAME = 'TimeReport.db'
+SQLITE_SYNCHRONOUS = 'NORMAL'                   # Safe with WAL, only the last transactions can roll back on power loss
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024            # Bytes of TimeReport.db memory mapped by each connection
+SQLITE_CACHE_SIZE = -64000                      # Negative values are KiB of page cache per connection
+SQLITE_BUSY_TIMEOUT = 5000                      # Milliseconds a connection waits on a lock before raising sqlite3.OperationalError
+READER_POOL_SIZE = 4                            # Idle read-only connections kept open for report generation
+
+# Report export CONSTANTS
+EXPORT_BATCH_SIZE = 5000                        # Rows fetched from SQLite per cursor.fetchmany() call when streaming a report
+EXPORT_BUFFER_SIZE = 1024 * 1024                # Bytes buffered by each CSV file writer between disk writes
+
+# PunchWriter CONSTANTS
+PUNCH_QUEUE_SIZE = 1000                         # Punches waiting to be written before the kiosk asks employees to try again
+PUNCH_BATCH_SIZE = 100                          # Maximum punches group committed in one transaction
+PUNCH_BATCH_WINDOW = 0.005                      # Seconds to wait for more punches after the first one of a batch arrives
+
+# EventLog CONSTANTS
+EVENT_LOG_CAPACITY = 10000                      # Events held in memory before the oldest unwritten ones are dropped
+EVENT_LOG_FLUSH_SIZE = 500                      # Buffered events written to EventLogTable in one transaction
+
 # GUI Display CONSTANTS
 DEBUG_STATEMENTS_ON = True
 RUN_ON_NATIVE_OS = False
@@ -32,12 +53,39 @@ VALID_EMPLOYEE_ID_LENGTH = 4
 # NiceGUI ui.timer() CONSTANTS
 ONE_SECOND = 1
 ONE_HOUR = ONE_SECOND * 60 * 60
-CLOCK_UPDATE_TIME = 60 * ONE_SECOND
+CLOCK_SYNC_TIME = 1 * ONE_HOUR                  # Browsers draw the clock hands, the server only resends its time this often
 LABEL_UPDATE_TIME = 4 * ONE_SECOND
 DATABASE_DAILY_REPORT_UPDATE_TIME  = 12 * ONE_HOUR
 DATABASE_WEEKLY_REPORT_UPDATE_TIME =  4 * ONE_HOUR
+SCHEDULER_JITTER = 5 * 60 * ONE_SECOND           # Maximum random delay added to every Scheduler job check
+EVENT_LOG_FLUSH_TIME = 60 * ONE_SECOND          # Longest a logged event waits in memory before it is written to EventLogTable
+
+# Email CONSTANTS
+SMTP_HOST = 'smtp.gmail.com'
+SMTP_PORT = 587
+SMTP_USE_TLS = True
+SMTP_TIMEOUT = 60                               # Seconds an SMTP command waits for the server
+MAIL_SENDER = 'blaze.mfc.us@gmail.com'
+REPORT_RECIPIENTS = []                          # Supervisor addresses the weekly .csv reports are emailed to, all in one SMTP session
+MAIL_RETRY_MIN_TIME = 60 * ONE_SECOND           # Delay before the first retry of a message the SMTP server did not accept, doubled on every retry
+MAIL_RETRY_MAX_TIME = 1 * ONE_HOUR              # Longest delay between retries, messages are retried until a server answers with a permanent 5xx error
+MAIL_BATCH_SIZE = 50                            # Messages sent per SMTP session
+MAIL_SPOOL_DIRECTORY = 'MailOutbox'             # Copies of queued attachments, so reruns that replace a report never change a queued message
+
+# Database backup CONSTANTS
+BACKUP_DIRECTORY = 'Backups'                    # Last shipped TimeReport.db snapshot and the incremental backup chain state
+BACKUP_FULL_INTERVAL = 30                       # Incremental backups shipped before the next full backup, bounds the restore chain length
+
+# Kiosk journal CONSTANTS
+KIOSK_REPLAY_TIME = 15 * ONE_SECOND             # How often a kiosk browser sends the punches its localStorage journal still holds
+KIOSK_REPLAY_DELAY = 30 * ONE_SECOND            # Age at which a punch sent over the websocket without a confirmation is replayed from the journal
+KIOSK_CONFIRM_TIME = 3 * ONE_SECOND             # Wait for the server to confirm a punch before the kiosk tells the employee it was saved offline
+KIOSK_REPLAY_BATCH_SIZE = 500                   # Maximum journaled punches sent in one replay request
+KIOSK_OFFLINE_MAX_TIME = 72 * ONE_HOUR          # Longest outage a kiosk journal is replayed after, older replayed punches need a supervisor
+KIOSK_REPLAY_PATH = '/api/kiosk/replay'
 
 # DateTime Object CONSTANTS
+LOCAL_TIME_ZONE = 'America/Chicago'             # Marianna, FL
 MONDAY = 0
 TUESDAY = 1
 WEDNESDAY = 2
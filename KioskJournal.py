@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "Idempotent replay of the clock IN / OUT punches kiosk browsers journal while TimeTracker is unreachable"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+
+# Standard Python libraries
+import hashlib
+import hmac                                     # https://docs.python.org/3/library/hmac.html
+import os
+import secrets
+import sqlite3                                  # https://docs.python.org/3/library/sqlite3.html
+
+# Internal modules
+import GlobalConstants as GC
+import ConnectionPool
+import LocalClock
+import EventLog
+from EventLog import eventLog
+
+# Longest kiosk ID accepted, issue_kiosk() generates 32 hex characters
+MAX_KIOSK_ID_LENGTH = 64
+
+# Overrides the key stored in KioskSecretTable, so several servers behind one hostname accept each other's kiosk tokens
+SECRET_ENVIRONMENT_VARIABLE = 'TIMETRACKER_KIOSK_SECRET'
+
+# Key a supervisor opens the kiosk page with once per tablet (e.g. "/?provision=..."), kiosk tokens are only issued to that page
+PROVISIONING_ENVIRONMENT_VARIABLE = 'TIMETRACKER_KIOSK_PROVISIONING_KEY'
+
+serverSecret = None
+
+
+def create_tables(cursor: sqlite3.Cursor):
+    """ Create KioskJournalTable, the highest journal sequence number already applied for every kiosk browser
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor on a read-write connection, caller is responsible for the commit
+    """
+    cursor.execute('''CREATE TABLE IF NOT EXISTS KioskJournalTable (kioskId TEXT PRIMARY KEY, lastSequence INTEGER, lastReplayTs INTEGER)''')
+
+    # Key the kiosk tokens are signed with, generated once per database so tokens survive a restart
+    cursor.execute('''CREATE TABLE IF NOT EXISTS KioskSecretTable (id INTEGER PRIMARY KEY CHECK (id = 1), secret TEXT)''')
+    cursor.execute("INSERT OR IGNORE INTO KioskSecretTable (id, secret) VALUES (1, ?)", (secrets.token_hex(32),))
+
+
+def server_secret() -> bytes:
+    """ Key the kiosk tokens are signed with, from $TIMETRACKER_KIOSK_SECRET or KioskSecretTable
+
+    Returns:
+        bytes: HMAC key, read once per process
+    """
+    global serverSecret
+
+    if serverSecret is None:
+        secret = os.environ.get(SECRET_ENVIRONMENT_VARIABLE)
+        if secret is None:
+            with ConnectionPool.get_pool().reader() as conn:
+                secret = conn.execute("SELECT secret FROM KioskSecretTable WHERE id = 1").fetchone()[0]
+
+        serverSecret = secret.encode('utf-8')
+
+    return serverSecret
+
+
+def kiosk_token(kioskId: str) -> str:
+    """ Token a kiosk browser sends with every replay to prove the server issued its kiosk ID
+
+    Args:
+        kioskId (str): Kiosk ID
+
+    Returns:
+        str: Hex HMAC-SHA256 of the kiosk ID
+    """
+    return hmac.new(server_secret(), kioskId.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def is_provisioning_key(provisioningKey) -> bool:
+    """ True if a kiosk page was opened with the $TIMETRACKER_KIOSK_PROVISIONING_KEY value, always False while it is not set
+
+    Args:
+        provisioningKey (str): "provision" query parameter of the kiosk page, None if the URL has none
+    """
+    expectedKey = os.environ.get(PROVISIONING_ENVIRONMENT_VARIABLE, '')
+    return len(expectedKey) > 0 and isinstance(provisioningKey, str) and hmac.compare_digest(provisioningKey.encode('utf-8'), expectedKey.encode('utf-8'))
+
+
+def issue_kiosk(provisioningKey: str = None) -> tuple:
+    """ New kiosk ID and token for the page config of a tablet a supervisor is provisioning, a browser only adopts them if it has no token yet
+
+        Anyone who can load the kiosk page can punch through it, so a token handed to every page would only prove that a page was
+        loaded. Tokens are only issued with the provisioning key, and then only prove the browser was set up by someone who knew it.
+        They identify a kiosk, not an employee
+
+    Args:
+        provisioningKey (str): "provision" query parameter of the kiosk page
+
+    Returns:
+        Tuple (kioskId, token): Random 32 hex character kiosk ID and its kiosk_token(), (None, None) without the provisioning key
+    """
+    if not is_provisioning_key(provisioningKey):
+        return None, None
+
+    kioskId = secrets.token_hex(16)
+
+    return kioskId, kiosk_token(kioskId)
+
+
+def is_authorized(kioskId: str, token) -> bool:
+    """ True if a replay request carries the token issued with its kiosk ID
+
+    Args:
+        kioskId (str): Kiosk ID from parse_batch()
+        token (str): "token" of the request body
+    """
+    return isinstance(token, str) and hmac.compare_digest(token, kiosk_token(kioskId))
+
+
+def parse_batch(batch: dict) -> tuple:
+    """ Check the shape of a replay request body before anything is written
+
+    Args:
+        batch (dict): {"kioskId": "...", "token": "...", "punches": [[sequence, employeeId, direction, timestamp], ...]}
+
+    Raises:
+        ValueError: If the body is not a replay batch, the kiosk keeps its journal and sends it again
+
+    Returns:
+        Tuple (kioskId, punches): Kiosk ID and (sequence, employeeId, direction, timestamp) tuples in sequence order
+    """
+    kioskId = batch.get("kioskId")
+    if not isinstance(kioskId, str) or not 0 < len(kioskId) <= MAX_KIOSK_ID_LENGTH:
+        raise ValueError('kioskId must be a non empty string')
+
+    punches = batch.get("punches")
+    if not isinstance(punches, list) or len(punches) > GC.KIOSK_REPLAY_BATCH_SIZE:
+        raise ValueError(f'punches must be a list of at most {GC.KIOSK_REPLAY_BATCH_SIZE} punches')
+
+    parsedPunches = []
+    for punch in punches:
+        if not isinstance(punch, list) or len(punch) != 4 or not isinstance(punch[0], int):
+            raise ValueError('Every punch must be a [sequence, employeeId, direction, timestamp] list')
+
+        parsedPunches.append(tuple(punch))
+
+    return kioskId, sorted(parsedPunches, key=lambda punch: punch[0])
+
+
+def replay(db, kioskId: str, punches: list) -> dict:
+    """ Apply the journaled punches of one kiosk that are newer than the last replay, and record the new high water mark in the same transaction
+
+        A kiosk numbers its punches in the order they were pressed and always sends its oldest punches first, so a batch
+        retried after a lost response is skipped by sequence number. Punches that reached the server over the websocket
+        before the kiosk lost its confirmation are skipped by the one clock IN and one clock OUT per day rule of import_punches().
+        The high water mark is read under the write lock and only ever moves forward, so overlapping replays of one kiosk never apply a punch twice.
+        Punches older than GC.KIOSK_REPLAY_DELAY + GC.KIOSK_OFFLINE_MAX_TIME are rejected, a kiosk is never offline that long
+
+    Args:
+        db (Database): Database object owned by the calling thread
+        kioskId (str): Random ID the kiosk browser keeps in localStorage
+        punches (list): Of (sequence, employeeId, direction, timestamp) tuples in sequence order
+
+    Returns:
+        Dict: "acknowledged" is the highest sequence number the kiosk can drop from its journal, with "inserted", "duplicates" and "rejected" counts
+    """
+    db.cursor.execute("BEGIN IMMEDIATE")
+    try:
+        row = db.cursor.execute("SELECT lastSequence FROM KioskJournalTable WHERE kioskId = ?", (kioskId,)).fetchone()
+        lastSequence = 0 if row is None else row[0]
+        newPunches = [punch for punch in punches if punch[0] > lastSequence]
+        if len(newPunches) == 0:
+            db.conn.rollback()
+            return {"acknowledged": lastSequence, "inserted": 0, "duplicates": 0, "rejected": 0}
+
+        inserted, duplicates, errors = db.import_punches([punch[1:] for punch in newPunches], commit=False, maxAge=GC.KIOSK_REPLAY_DELAY + GC.KIOSK_OFFLINE_MAX_TIME)
+        acknowledged = newPunches[-1][0]
+        db.cursor.execute('''INSERT INTO KioskJournalTable (kioskId, lastSequence, lastReplayTs) VALUES (?, ?, ?)
+                             ON CONFLICT (kioskId) DO UPDATE SET lastSequence = MAX(lastSequence, excluded.lastSequence), lastReplayTs = excluded.lastReplayTs''',
+                          (kioskId, acknowledged, int(LocalClock.now().timestamp())))
+        db.commit_changes()
+
+    except sqlite3.Error:
+        db.conn.rollback()
+        raise
+
+    # Invalid punches are acknowledged too, resending them can never succeed, so they are kept in EventLogTable for a supervisor instead
+    for punchNumber, message in errors:
+        sequence, employeeId, direction, timestamp = newPunches[punchNumber - 1]
+        eventLog.log(EventLog.WARNING, EventLog.KIOSK_PUNCH_REJECTED, employeeId=employeeId if isinstance(employeeId, int) else None,
+                     detail=f'Kiosk {kioskId} punch #{sequence} {direction} at {timestamp}: {message}')
+
+    return {"acknowledged": acknowledged, "inserted": inserted, "duplicates": duplicates, "rejected": len(errors)}
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "Shared Marianna, FL clock and timezone service with a test injectable time source"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+# pylint: disable=global-statement
+
+# Standard Python libraries
+from datetime import date, datetime, timedelta, timezone   # https://docs.python.org/3/library/datetime.html
+from zoneinfo import ZoneInfo                              # IANA timezone database with DST transitions https://docs.python.org/3/library/zoneinfo.html
+
+# Internal modules
+import GlobalConstants as GC
+import PunchEvents
+
+# Resolved once per process instead of on every get_date_time() call
+LOCAL_TIME_ZONE = ZoneInfo(GC.LOCAL_TIME_ZONE)
+
+
+def system_utc_now() -> datetime:
+    """ Default time source
+
+    Returns:
+        datetime: Current timezone aware UTC date and time
+    """
+    return datetime.now(timezone.utc)
+
+
+utc_now = system_utc_now
+
+def set_clock(timeSource=None):
+    """ Replace the time source, so report windows can be calculated for a fixed instant
+
+        LocalClock.set_clock(lambda: datetime(2023, 8, 27, 5, 0, tzinfo=timezone.utc))
+
+    Args:
+        timeSource (callable): Function returning a timezone aware UTC datetime, None restores the system clock
+    """
+    global utc_now
+
+    utc_now = system_utc_now if timeSource is None else timeSource
+
+
+def now() -> datetime:
+    """ Get date and time in Marianna, FL timezone, independent of location on server running code
+
+        The wall clock time is tagged +00:00, matching every timestamp TimeTracker has stored (e.g. "2023-08-21T17:39+00:00")
+
+    Returns:
+        datetime: Local wall clock date and time with a UTC tzinfo
+    """
+    return utc_now().astimezone(LOCAL_TIME_ZONE).replace(tzinfo=timezone.utc)
+
+
+def wall_time(dateToConvert: datetime) -> datetime:
+    """ Convert a datetime from outside TimeTracker (e.g. an offline kiosk or a paper time card) to the stored wall clock convention
+
+    Args:
+        dateToConvert (datetime): Naive and +00:00 tagged datetimes are already Marianna, FL wall clock time, any other offset is a real instant
+
+    Returns:
+        datetime: Local wall clock date and time with a UTC tzinfo, like now()
+    """
+    if dateToConvert.tzinfo is None or dateToConvert.utcoffset() == timedelta(0):
+        return dateToConvert.replace(tzinfo=timezone.utc)
+
+    return dateToConvert.astimezone(LOCAL_TIME_ZONE).replace(tzinfo=timezone.utc)
+
+
+def local_day(dateToConvert: datetime = None) -> int:
+    """ Days since 1970-01-01 of a local date, the localDay column of PunchEventsTable and DailyHoursTable
+
+    Args:
+        dateToConvert (datetime): Defaults to now()
+
+    Returns:
+        int: localDay integer
+    """
+    return PunchEvents.to_local_day(now() if dateToConvert is None else dateToConvert)
+
+
+def week_bounds(dateInWeek: datetime = None) -> tuple:
+    """ Sunday and Saturday of the work week containing a date
+
+    Args:
+        dateInWeek (datetime): Defaults to now()
+
+    Returns:
+        Tuple (sunday, saturday): date objects, work week starts Sunday at 12:01 am and ends Saturday at 11:59 pm
+    """
+    if dateInWeek is None:
+        dateInWeek = now()
+
+    day = date(dateInWeek.year, dateInWeek.month, dateInWeek.day)
+    sunday = day - timedelta(days=(day.weekday() - GC.SUNDAY) % 7)
+
+    return sunday, sunday + timedelta(days=6)
+
+
+def last_week_bounds(dateInWeek: datetime = None) -> tuple:
+    """ Sunday and Saturday of the work week before the one containing a date
+
+    Args:
+        dateInWeek (datetime): Defaults to now()
+
+    Returns:
+        Tuple (sunday, saturday): date objects
+    """
+    sunday, _ = week_bounds(dateInWeek)
+
+    return sunday - timedelta(days=7), sunday - timedelta(days=1)
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "Persistent outbound mail queue in TimeReport.db drained by an asyncio worker with SMTP session reuse and exponential backoff"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+# pylint: disable=broad-exception-caught
+
+# Standard Python libraries
+import asyncio                                  # https://docs.python.org/3/library/asyncio.html
+import json
+import os
+import random
+import shutil
+import smtplib
+import sqlite3                                  # https://docs.python.org/3/library/sqlite3.html
+import traceback
+import uuid
+from contextlib import suppress
+from time import time
+
+# Internal modules
+import GlobalConstants as GC
+import ConnectionPool
+import PunchEvents
+import EventLog
+from EventLog import eventLog
+
+# Delivery states
+PENDING = 'PENDING'
+SENT = 'SENT'
+FAILED = 'FAILED'
+
+
+def create_tables(cursor: sqlite3.Cursor):
+    """ Create MailOutboxTable and the (state, nextAttemptTs) index the worker polls
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor on a read-write connection, caller is responsible for the commit
+    """
+    cursor.execute('''CREATE TABLE IF NOT EXISTS MailOutboxTable (id INTEGER PRIMARY KEY, createdTs INTEGER, sender TEXT, receiver TEXT, subject TEXT, body TEXT, attachments TEXT, spoolDirectory TEXT,
+                                                                  state TEXT, attempts INTEGER, nextAttemptTs INTEGER, lastError TEXT, sentTs INTEGER)''')
+    cursor.execute('''CREATE INDEX IF NOT EXISTS MailOutboxDueIndex ON MailOutboxTable (state, nextAttemptTs)''')
+
+
+def retry_delay(attempts: int) -> float:
+    """ Exponential backoff with jitter, so a mail server coming back up is not hit by every message at once
+
+    Args:
+        attempts (int): Failed attempts so far, including the one that just failed
+
+    Returns:
+        float: Seconds until the next attempt
+    """
+    return min(GC.MAIL_RETRY_MAX_TIME, GC.MAIL_RETRY_MIN_TIME * 2 ** (attempts - 1)) * random.uniform(0.75, 1.0)
+
+
+def is_permanent(error: Exception) -> bool:
+    """ True if the server rejected the message itself with a 5xx reply, retrying it can never succeed
+
+        Connection, timeout, 4xx and login errors are all retried, a wrong password must not throw away queued reports
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+
+    if isinstance(error, smtplib.SMTPResponseException) and not isinstance(error, smtplib.SMTPAuthenticationError):
+        return error.smtp_code >= 500
+
+    return False
+
+
+class MailOutbox:
+    """ Queue messages in MailOutboxTable and deliver them from an asyncio task on the NiceGUI event loop
+
+        Every SQLite and SMTP call runs in a worker thread through asyncio.to_thread(), so the UI loop never blocks on
+        the mail server, and messages stay PENDING in TimeReport.db until a server accepts them, across restarts
+    """
+
+    def __init__(self, mailer, spoolDirectory: str = GC.MAIL_SPOOL_DIRECTORY, batchSize: int = GC.MAIL_BATCH_SIZE):
+        """ Constructor to initialize a MailOutbox object, call start() from a running event loop to deliver mail
+
+        Args:
+            mailer (Email): Configured SMTP client, one session is opened per batch
+            spoolDirectory (str): Directory queued attachments are copied to
+            batchSize (int): Maximum messages sent per SMTP session
+        """
+        self.mailer = mailer
+        self.spoolDirectory = spoolDirectory
+        self.batchSize = batchSize
+        self.loop = None
+        self.wakeEvent = None
+        self.task = None
+
+
+    def enqueue(self, senderEmail: str, receiverEmails: list, subject: str, body: str, filePaths: list = (), stateName: str = None, stateValue: int = None) -> list:
+        """ Persist one message per receiver and wake the worker, safe to call from any thread
+
+        Args:
+            senderEmail (str): From address
+            receiverEmails (list): To addresses, e.g. every supervisor that gets the weekly reports
+            subject (str): ASCII subject line
+            body (str): Plain text message
+            filePaths (list): Files to attach, copied into the spool so later changes to them do not affect the queued message
+            stateName (str): StateTable marker, if given the messages are only queued while it is older than stateValue
+            stateValue (int): Value the marker is advanced to in the same transaction as the queued messages
+
+        Returns:
+            List: MailOutboxTable id of every queued message, empty if the marker shows they were already queued
+        """
+        spoolDirectory = os.path.join(self.spoolDirectory, uuid.uuid4().hex)
+        os.makedirs(spoolDirectory)
+        attachments = []
+        for filePath in filePaths:
+            spooledPath = os.path.join(spoolDirectory, os.path.basename(filePath))
+            try:
+                os.link(filePath, spooledPath)
+
+            except OSError:
+                shutil.copyfile(filePath, spooledPath)
+
+            attachments.append(spooledPath)
+
+        now = int(time())
+        conn = ConnectionPool.get_pool().connect()
+        try:
+            if stateName is not None:
+                # Read the marker under the write lock, so two processes or a restart can never queue the same messages twice
+                conn.execute("BEGIN IMMEDIATE")
+                if PunchEvents.get_state(conn.cursor(), stateName) >= stateValue:
+                    conn.rollback()
+                    shutil.rmtree(spoolDirectory, ignore_errors=True)
+                    return []
+
+                PunchEvents.set_state(conn.cursor(), stateName, stateValue)
+
+            ids = []
+            for receiverEmail in receiverEmails:
+                cursor = conn.execute('''INSERT INTO MailOutboxTable (createdTs, sender, receiver, subject, body, attachments, spoolDirectory, state, attempts, nextAttemptTs)
+                                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0, ?)''', (now, senderEmail, receiverEmail, subject, body, json.dumps(attachments), spoolDirectory, PENDING, now))
+                ids.append(cursor.lastrowid)
+
+            conn.commit()
+
+        finally:
+            conn.close()
+
+        self.wake()
+
+        return ids
+
+
+    def wake(self):
+        """ Make the worker check the queue now instead of at its next retry time
+        """
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.wakeEvent.set)
+
+
+    def record_failure(self, conn: sqlite3.Connection, id: int, receiverEmail: str, attempts: int, error: Exception, isPermanent: bool = False):
+        """ Schedule the next attempt of a message, or mark it FAILED if the server rejected it permanently
+        """
+        if isPermanent:
+            conn.execute("UPDATE MailOutboxTable SET state = ?, attempts = ?, lastError = ? WHERE id = ?", (FAILED, attempts + 1, repr(error), id))
+        else:
+            conn.execute("UPDATE MailOutboxTable SET attempts = ?, nextAttemptTs = ?, lastError = ? WHERE id = ?", (attempts + 1, int(time() + retry_delay(attempts + 1)), repr(error), id))
+
+        # Commit before logging, a full event buffer flushes on its own connection and must not wait on this write lock
+        conn.commit()
+
+        if isPermanent:
+            eventLog.log(EventLog.ERROR, EventLog.MAIL_FAILED, detail=f'{receiverEmail}: {error!r}')
+        else:
+            eventLog.log(EventLog.WARNING, EventLog.MAIL_RETRY, detail=f'{receiverEmail}: {error!r}')
+
+
+    def send_batch(self, conn: sqlite3.Connection, messages: list):
+        """ Send due messages over one SMTP session, committing the delivery state of each message as soon as it is known
+        """
+        try:
+            server = self.mailer.connect()
+
+        except (OSError, smtplib.SMTPException) as error:
+            # Even a 5xx greeting or login reply says nothing about the messages themselves, so they are all retried
+            for id, _, receiverEmail, _, _, _, attempts in messages:
+                self.record_failure(conn, id, receiverEmail, attempts, error)
+
+            return
+
+        with server:
+            for index, (id, senderEmail, receiverEmail, subject, body, attachments, attempts) in enumerate(messages):
+                try:
+                    self.mailer.send_email(senderEmail, receiverEmail, subject, body, json.loads(attachments), server)
+
+                except (OSError, smtplib.SMTPException) as error:
+                    self.record_failure(conn, id, receiverEmail, attempts, error, is_permanent(error))
+                    # SMTPException is a subclass of OSError, only socket errors and a dropped session end the batch
+                    if isinstance(error, smtplib.SMTPServerDisconnected) or not isinstance(error, smtplib.SMTPException):
+                        # The session is gone, the rest of the batch waits for the same backoff instead of failing one by one
+                        for laterId, _, laterReceiverEmail, _, _, _, laterAttempts in messages[index + 1:]:
+                            self.record_failure(conn, laterId, laterReceiverEmail, laterAttempts, error)
+                        return
+
+                    continue
+
+                conn.execute("UPDATE MailOutboxTable SET state = ?, attempts = ?, sentTs = ?, lastError = NULL WHERE id = ?", (SENT, attempts + 1, int(time()), id))
+                conn.commit()
+
+
+    def remove_delivered_spools(self, conn: sqlite3.Connection, spoolDirectories: set):
+        """ Delete spooled attachments once no PENDING message uses them, FAILED messages keep theirs for a manual resend
+        """
+        for spoolDirectory in spoolDirectories:
+            states = {state for (state,) in conn.execute("SELECT DISTINCT state FROM MailOutboxTable WHERE spoolDirectory = ?", (spoolDirectory,))}
+            if states == {SENT}:
+                shutil.rmtree(spoolDirectory, ignore_errors=True)
+
+
+    def drain(self) -> float:
+        """ Send every message that is due, one SMTP session per batch, blocking, run it in a worker thread
+
+        Returns:
+            float: Seconds until the next PENDING message is due, None if the queue is empty
+        """
+        conn = ConnectionPool.get_pool().connect()
+        try:
+            while True:
+                messages = conn.execute('''SELECT id, sender, receiver, subject, body, attachments, attempts FROM MailOutboxTable
+                                           WHERE state = ? AND nextAttemptTs <= ? ORDER BY nextAttemptTs, id LIMIT ?''', (PENDING, int(time()), self.batchSize)).fetchall()
+                if len(messages) == 0:
+                    break
+
+                spoolDirectories = {spoolDirectory for (spoolDirectory,) in conn.execute(f"SELECT DISTINCT spoolDirectory FROM MailOutboxTable WHERE id IN ({', '.join('?' * len(messages))})", [message[0] for message in messages])}
+                self.send_batch(conn, messages)
+                self.remove_delivered_spools(conn, spoolDirectories)
+
+            nextAttemptTs = conn.execute("SELECT MIN(nextAttemptTs) FROM MailOutboxTable WHERE state = ?", (PENDING,)).fetchone()[0]
+
+        finally:
+            conn.close()
+
+        return None if nextAttemptTs is None else max(0, nextAttemptTs - time())
+
+
+    async def run(self):
+        """ Worker loop, sleeps until the next retry is due or enqueue() wakes it
+        """
+        self.loop = asyncio.get_running_loop()
+        self.wakeEvent = asyncio.Event()
+        while True:
+            self.wakeEvent.clear()
+            try:
+                delay = await asyncio.to_thread(self.drain)
+
+            except Exception:
+                print(f'MailOutbox drain failed:\n{traceback.format_exc()}')
+                delay = GC.MAIL_RETRY_MIN_TIME
+
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self.wakeEvent.wait(), delay)
+
+
+    def start(self):
+        """ Start the worker task on the running event loop, e.g. from NiceGUI app.on_startup()
+        """
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+
+    async def stop(self):
+        """ Cancel the worker task, a batch already being sent finishes on its thread and messages not sent stay PENDING
+        """
+        if self.task is not None:
+            self.task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self.task
@@ -16,41 +16,38 @@ __doc__        = "Generate a Progressive Web App GUI to log employee check-in an
 # pylint: disable=global-statement
 
 # Standard Python libraries
-from datetime import datetime, time, timedelta 	# Manipulate calendar dates & time objects https://docs.python.org/3/library/datetime.html
+import asyncio                                  # Await PunchWriter futures without blocking the NiceGUI event loop
+import json
+import queue
 
 # Internally developed modules
 import GlobalConstants as GC                    # Global constants used across MainHouse.py, HouseDatabase.py, and PageKiteAPI.py
-from Database import Database                   # Store non-Personally Identifiable Information of employee ID's and timestamps
+from Database import Database, employeeDirectory # Store non-Personally Identifiable Information of employee ID's and timestamps
+import ConnectionPool                           # Shared WAL mode connection manager for TimeReport.db
+from PunchWriter import PunchWriter             # Group commit clock IN / OUT punches on a background thread
+import LocalClock                               # Shared Marianna, FL clock and timezone service
+import PunchEvents                              # Day and week keys of the StateTable markers
+from Scheduler import Scheduler                 # Run report jobs on one background thread
+import EventLog                                 # Batch flushed structured event log
+from EventLog import eventLog
+from MailOutbox import MailOutbox               # Persistent mail queue delivered without blocking the UI loop
+from Email import configured_email              # SMTP settings from TIMETRACKER_SMTP_* environment variables
+import KioskJournal                             # Idempotent replay of punches journaled by offline kiosk browsers
 
 # Browser base GUI framework to build and display a user interface mobile, PC, and Mac # https://nicegui.io/
 from nicegui import app, ui
 from nicegui.events import MouseEventArguments
+from fastapi import HTTPException               # NiceGUI's app is a FastAPI app https://fastapi.tiangolo.com/
 
-THREE_AM = time(3, 0, 0)
-ELEVEN_PM = time(23, 0, 0)
-clock = ui.html().classes("self-center")
 
-sanitizedID = ''
-validEmployeeID = ''
-canUpdateweeklyReportTable = True
 
-
-def build_svg() -> str:
-    """ Create an 800 x 800 pixel clock in HTML / SVG
-        https://de.m.wikipedia.org/wiki/Datei:Station_Clock.svg
-
-    Args:
-        NONE
-
-    Returns:
-        str: Valid HTML to create an analog clock
-    """
-    now = db.get_date_time()
-    return f'''
+# Static 400 x 400 pixel clock dial in HTML / SVG, built once and sent once per page load
+# https://de.m.wikipedia.org/wiki/Datei:Station_Clock.svg
+CLOCK_DIAL_SVG = '''
     <svg width="400" height="400" viewBox="0 0 400 400" xmlns="http://www.w3.org/2000/svg">
     <circle cx="200" cy="200" r="180" stroke="black" stroke-width="4" fill="white" />
-    <line x1="200" y1="200" x2="200" y2="50" stroke="black" stroke-width="6" transform="rotate({now.minute / 60 * 360} 200 200)" />
-    <line x1="200" y1="200" x2="200" y2="100" stroke="black" stroke-width="6" transform="rotate({now.hour / 12 * 360} 200 200)" />
+    <line x1="200" y1="200" x2="200" y2="50" stroke="black" stroke-width="6" id="clockMinuteHand" />
+    <line x1="200" y1="200" x2="200" y2="100" stroke="black" stroke-width="6" id="clockHourHand" />
     <circle cx="200" cy="200" r="20" fill="black" />
     
     <!-- Hour marks -->
@@ -69,103 +66,436 @@ def build_svg() -> str:
     </svg>
     '''
 
+# Rotate the clock hands in the browser from the Marianna, FL wall time of the last server sync, so a ticking clock costs no websocket traffic
+CLOCK_SCRIPT = '''
+    <script>
+    let timeTrackerClockOffset = 0;
+
+    function drawTimeTrackerClock() {
+        const now = new Date(Date.now() + timeTrackerClockOffset);
+        const minuteHand = document.getElementById('clockMinuteHand');
+        const hourHand = document.getElementById('clockHourHand');
+        if (minuteHand === null || hourHand === null) return;
+        minuteHand.setAttribute('transform', `rotate(${now.getUTCMinutes() / 60 * 360} 200 200)`);
+        hourHand.setAttribute('transform', `rotate(${now.getUTCHours() / 12 * 360} 200 200)`);
+    }
+
+    function syncTimeTrackerClock(localWallTimeMs) {
+        timeTrackerClockOffset = localWallTimeMs - Date.now();
+        drawTimeTrackerClock();
+    }
+
+    setInterval(drawTimeTrackerClock, 1000);
+    </script>
+    '''
 
-async def clock_x(direction: int, sanitizedID: str):
-    """ Perform database insert
+
+# Journal every clock IN / OUT press in localStorage before it is sent, so a punch survives a Linode or pagekite outage and a page reload
+# While the websocket is down the press never reaches NiceGUI, which would replay it with the reconnect time, and is confirmed in the browser instead
+# Punches the server did not confirm are sent in sequence order, oldest first, as one batch per KIOSK_REPLAY_PATH request
+JOURNAL_SCRIPT = '''
+    <script>
+    let timeTrackerJournalConfig = null;
+    let timeTrackerReplaying = false;
+    let timeTrackerSavedTimeout = null;
+
+    function readTimeTrackerJournal() {
+        try {
+            return JSON.parse(localStorage.getItem('timeTrackerJournal') || '[]');
+        } catch (error) {
+            return [];
+        }
+    }
+
+    function writeTimeTrackerJournal(punches) {
+        localStorage.setItem('timeTrackerJournal', JSON.stringify(punches));
+    }
+
+    function timeTrackerKioskId() {
+        // A browser without a token adopts the kiosk ID the server issued in a provisioning page, keeping its sequence counter and journal
+        if (localStorage.getItem('timeTrackerKioskToken') === null && timeTrackerJournalConfig.kioskToken !== null) {
+            localStorage.setItem('timeTrackerKioskId', timeTrackerJournalConfig.kioskId);
+            localStorage.setItem('timeTrackerKioskToken', timeTrackerJournalConfig.kioskToken);
+            // Keep the provisioning key out of the address bar and the home screen shortcut
+            history.replaceState(null, '', window.location.pathname);
+        }
+        if (localStorage.getItem('timeTrackerSequence') === null) localStorage.setItem('timeTrackerSequence', '0');
+        return localStorage.getItem('timeTrackerKioskId');
+    }
+
+    function nextTimeTrackerSequence() {
+        timeTrackerKioskId();
+        const sequence = Number(localStorage.getItem('timeTrackerSequence') || '0') + 1;
+        localStorage.setItem('timeTrackerSequence', String(sequence));
+        return sequence;
+    }
+
+    function showTimeTrackerSaved(punch) {
+        const label = document.querySelector('.timetracker-saved-label');
+        if (label === null) return;
+        const clockedIn = punch.direction === timeTrackerJournalConfig.clockIn;
+        label.textContent = `${punch.employeeId} - ${clockedIn ? 'REGISTRO EN (CLOCKED IN)' : 'FINALIZADO (CLOCKED OUT)'} - GUARDADO SIN CONEXIÓN (SAVED OFFLINE)`;
+        label.style.color = clockedIn ? 'green' : 'red';
+        label.classList.remove('hidden');
+        clearTimeout(timeTrackerSavedTimeout);
+        timeTrackerSavedTimeout = setTimeout(() => label.classList.add('hidden'), timeTrackerJournalConfig.labelMs);
+    }
+
+    function journalTimeTrackerPunch(event) {
+        const button = event.target.closest('.timetracker-clock-in, .timetracker-clock-out');
+        const input = document.querySelector('.timetracker-employee-id input');
+        if (button === null || input === null) return;
+
+        const online = window.socket !== undefined && window.socket.connected;
+        const employeeId = String(parseInt(input.value, 10));
+        if (!/^[0-9]+$/.test(employeeId) || employeeId.length !== timeTrackerJournalConfig.idLength) return;
+
+        const direction = button.classList.contains('timetracker-clock-in') ? timeTrackerJournalConfig.clockIn : timeTrackerJournalConfig.clockOut;
+        const wallTime = new Date(Date.now() + timeTrackerClockOffset).toISOString().slice(0, 16) + '+00:00';
+        const punch = {sequence: nextTimeTrackerSequence(), employeeId: Number(employeeId), direction: direction, timestamp: wallTime, sentOnline: online, journaledMs: Date.now()};
+        writeTimeTrackerJournal(readTimeTrackerJournal().concat([punch]));
+
+        if (online) {
+            setTimeout(() => {
+                if (readTimeTrackerJournal().some((journaled) => journaled.sequence === punch.sequence)) showTimeTrackerSaved(punch);
+            }, timeTrackerJournalConfig.confirmMs);
+        } else {
+            event.stopImmediatePropagation();
+            input.value = '';
+            showTimeTrackerSaved(punch);
+            replayTimeTrackerJournal();
+        }
+    }
+
+    function timeTrackerJournalDone(employeeId, direction) {
+        const punches = readTimeTrackerJournal();
+        for (let index = punches.length - 1; index >= 0; index--) {
+            if (punches[index].sentOnline && punches[index].employeeId === employeeId && punches[index].direction === direction) {
+                punches.splice(index, 1);
+                writeTimeTrackerJournal(punches);
+                return;
+            }
+        }
+    }
+
+    async function replayTimeTrackerJournal() {
+        if (timeTrackerReplaying) return;
+
+        // Only the oldest punches are sent, so the server can skip a resent batch by its highest sequence number
+        const batch = [];
+        for (const punch of readTimeTrackerJournal()) {
+            if (batch.length === timeTrackerJournalConfig.batchSize || (punch.sentOnline && Date.now() - punch.journaledMs < timeTrackerJournalConfig.replayDelayMs)) break;
+            batch.push([punch.sequence, punch.employeeId, punch.direction, punch.timestamp]);
+        }
+        if (batch.length === 0) return;
+
+        // A kiosk that was never provisioned keeps its journal until a supervisor opens it with the provisioning key
+        if (localStorage.getItem('timeTrackerKioskToken') === null) return;
+
+        timeTrackerReplaying = true;
+        try {
+            const response = await fetch(window.path_prefix + timeTrackerJournalConfig.replayPath, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({kioskId: timeTrackerKioskId(), token: localStorage.getItem('timeTrackerKioskToken'), punches: batch}),
+            });
+            if (response.ok) {
+                const result = await response.json();
+                writeTimeTrackerJournal(readTimeTrackerJournal().filter((punch) => punch.sequence > result.acknowledged));
+                // Punches pressed while this batch was in flight go right away, the next call returns at once if none are due
+                setTimeout(replayTimeTrackerJournal, 0);
+            } else if (response.status === 403) {
+                // The server key changed, the kiosk has to be provisioned again
+                localStorage.removeItem('timeTrackerKioskToken');
+            }
+        } catch (error) {
+            // TimeTracker is still unreachable, the next interval or the browser online event retries
+        } finally {
+            timeTrackerReplaying = false;
+        }
+    }
+
+    function startTimeTrackerJournal(config) {
+        timeTrackerJournalConfig = config;
+        timeTrackerKioskId();
+        document.addEventListener('click', journalTimeTrackerPunch, true);
+        window.addEventListener('online', replayTimeTrackerJournal);
+        setInterval(replayTimeTrackerJournal, config.replayMs);
+        replayTimeTrackerJournal();
+    }
+    </script>
+    '''
+
+
+def journal_start_javascript(provisioningKey: str = None) -> str:
+    """ JavaScript call that starts the kiosk punch journal with the server side constants, and a freshly issued kiosk ID and token when provisioning
 
     Args:
-        direction (CONSTANT int):Define function as clock IN or clock OUT method
-        sanitizedID (str): Global sanitized number entered into Number text  box
+        provisioningKey (str): "provision" query parameter of the kiosk page, see KioskJournal.issue_kiosk()
+
+    Returns:
+        str: startTimeTrackerJournal() call
     """
+    kioskId, kioskToken = KioskJournal.issue_kiosk(provisioningKey)
+    config = {"replayPath": GC.KIOSK_REPLAY_PATH, "kioskId": kioskId, "kioskToken": kioskToken, "replayMs": GC.KIOSK_REPLAY_TIME * 1000, "replayDelayMs": GC.KIOSK_REPLAY_DELAY * 1000,
+              "confirmMs": GC.KIOSK_CONFIRM_TIME * 1000, "labelMs": GC.LABEL_UPDATE_TIME * 1000, "batchSize": GC.KIOSK_REPLAY_BATCH_SIZE,
+              "idLength": GC.VALID_EMPLOYEE_ID_LENGTH, "clockIn": GC.CLOCK_IN, "clockOut": GC.CLOCK_OUT}
+
+    return f'startTimeTrackerJournal({json.dumps(config)})'
+
+
+def clock_sync_javascript() -> str:
+    """ JavaScript call that syncs a browser clock to the server
+
+    Returns:
+        str: syncTimeTrackerClock() call with the local wall time in ms, tagged +00:00 like every stored timestamp
+    """
+    return f'syncTimeTrackerClock({int(LocalClock.now().timestamp() * 1000)})'
+
+
+class Kiosk:
+    """ GUI elements and typed employee ID of one connected kiosk, so entrance tablets punching at the same time never share state
+    """
+
+    def __init__(self):
+        """ Constructor to initialize an empty Kiosk object, call build() inside a page function to create its elements
+        """
+        self.sanitizedID = ''
+        self.validEmployeeID = ''
+        self.clock = None
+        self.invalidIdLabel = None
+        self.inputBox = None
+        self.clockedInLabel = None
+        self.clockedOutLabel = None
+        self.tryAgainLabel = None
+        self.savedLabel = None
+        self.body = None
+        self.resetHandle = None
+
+
+    def build(self, provisioningKey: str = None):
+        """ Create the clock, employee ID input box, clock IN / OUT buttons, and result labels for the current client
+
+        Args:
+            provisioningKey (str): "provision" query parameter of the kiosk page, only needed the first time a tablet opens it
+        """
+        ui.add_head_html(CLOCK_SCRIPT + f'<script>{clock_sync_javascript()}</script>' + JOURNAL_SCRIPT + f'<script>{journal_start_javascript(provisioningKey)}</script>')
+        self.clock = ui.html(CLOCK_DIAL_SVG).classes("self-center")
+
+        self.body = ui.query('body')
+        ui.timer(GC.CLOCK_SYNC_TIME, self.sync_clock)
+
+        self.invalidIdLabel = ui.label('ID DE EMPLEADO NO VÁLIDO (INVALID EMPLOYEE ID)').style("color: red; font-size: 150%; font-weight: 300").classes("self-center")
+        self.invalidIdLabel.visible = False
+
+        self.inputBox = ui.number(label='Ingrese su identificación de empleado', placeholder='Enter your Employee ID', value=None, \
+                                  format='%i', \
+                                  step='1000', \
+                                  on_change=lambda e: self.invalidIdLabel.set_text(self.sanitize_employee_id(e.value)), \
+                                  validation={'ID DE EMPLEADO NO VÁLIDO (INVALID EMPLOYEE ID)': lambda value: self.sanitizedID == '' or int(self.sanitizedID) <= 9999})
+
+        self.inputBox.classes("self-center timetracker-employee-id").style("padding: 40px 0px; width: 600px; font-size: 30px;").props('clearable')
+
+        # Invisible character https://invisibletext.com/#google_vignette
+        with ui.row().classes("self-center"):
+            with ui.button(on_click=lambda e: self.clock_x(GC.CLOCK_IN), color="green").classes("relative  h-24 w-64 timetracker-clock-in"):
+                ui.label('RELOJ EN (CLOCK IN) ㅤ').style('font-size: 90%; font-weight: 300')
+                ui.icon('login')
+
+            with ui.button(on_click=lambda e: self.clock_x(GC.CLOCK_OUT), color="red").classes("relative  h-24 w-64 timetracker-clock-out"):
+                ui.label('RELOJ DE SALIDA (CLOCK OUT) ㅤ').style("font-size: 90%; font-weight: 300")
+                ui.icon('logout')
+
+        self.clockedInLabel = ui.label(f'{self.validEmployeeID} - REGISTRO EN (CLOCKED IN)').style("color: green; font-size: 200%; font-weight: 300").classes("self-center")
+        self.clockedOutLabel = ui.label(f'{self.validEmployeeID} - FINALIZADO (CLOCKED OUT)').style("color: red; font-size: 200%; font-weight: 300").classes("self-center")
+        self.tryAgainLabel = ui.label('INTENTAR OTRA VEZ (TRY AGAIN)').style("color: red; font-size: 200%; font-weight: 300").classes("self-center")
+
+        # Only ever shown by the journal script in the browser, for punches saved while TimeTracker is unreachable
+        self.savedLabel = ui.label('').style("font-size: 200%; font-weight: 300").classes("self-center timetracker-saved-label")
+        self.savedLabel.visible = False
+
+
+    def set_background(self, color: str):
+        """ Change the page background of this kiosk, any color other than white is reset by reset_display()
+        """
+        self.body.style(f'background-color: {color}')
+        if color != 'white':
+            self.schedule_reset()
+
+
+    def schedule_reset(self):
+        """ Call reset_display() GC.LABEL_UPDATE_TIME seconds after the last GUI change, instead of polling on a timer
+        """
+        if self.resetHandle is not None:
+            self.resetHandle.cancel()
+
+        self.resetHandle = asyncio.get_running_loop().call_later(GC.LABEL_UPDATE_TIME, self.reset_display)
+
+
+    def reset_display(self):
+        """ Hide the clocked IN / OUT and try again labels and restore the white background
+        """
+        self.resetHandle = None
+        self.clockedInLabel.set_visibility(False)
+        self.clockedOutLabel.set_visibility(False)
+        self.tryAgainLabel.set_visibility(False)
+        self.set_background('white')
+
+
+    async def sync_clock(self):
+        """ Correct browser clock drift and daylight saving time changes, the only clock message sent after page load
+        """
+        await ui.run_javascript(clock_sync_javascript(), respond=False)
+
+
+    async def clock_x(self, direction: int):
+        """ Perform database insert
+
+        Args:
+            direction (CONSTANT int):Define function as clock IN or clock OUT method
+        """
+        # Copy the ID before the first await, so typing on this kiosk while the punch commits can't change who is punched
+        sanitizedID = self.sanitizedID
+
+        if self.invalidIdLabel.visible == False and len(sanitizedID) == GC.VALID_EMPLOYEE_ID_LENGTH:
+            displayName = f'{sanitizedID} {employeeDirectory.get_full_name(sanitizedID)}'.strip()
+            if direction == GC.CLOCK_IN:
+                xLabel = self.clockedInLabel
+                xLabel.set_text(f'{displayName} - REGISTRO EN (CLOCKED IN)')
+            
+            elif direction == GC.CLOCK_OUT:
+                xLabel = self.clockedOutLabel
+                xLabel.set_text(f'{displayName} - RELOJ DE SALIDA (CLOCK OUT)')
+
+            try:
+                # The insert and its commit run on the PunchWriter thread, so a burst of punches never stalls other kiosks
+                englishError, spanishError = await asyncio.wrap_future(punchWriter.submit(direction, sanitizedID))
+                if englishError != '':
+                    xLabel.set_text(f'{spanishError} ({englishError})')
+                
+                xLabel.visible = True
+                self.schedule_reset()
+                #self.set_background('grey')
+
+                # The press was answered, so the browser drops it from its journal instead of replaying it
+                await ui.run_javascript(f'timeTrackerJournalDone({int(sanitizedID)}, {direction}); getElement({self.inputBox.id}).focus()', respond=False)
 
-    if invalidIdLabel.visible == False and len(sanitizedID) == GC.VALID_EMPLOYEE_ID_LENGTH:
-        if direction == GC.CLOCK_IN:
-            clockedInLabel.set_text(f'{sanitizedID} - REGISTRO EN (CLOCKED IN)')
-            clockedInLabel.visible = True
-            db.insert_check_in_table(sanitizedID)
-            #set_background('grey')
-            await ui.run_javascript(f'getElement({inputBox.id}).focus()', respond=False)
-        
-        elif direction == GC.CLOCK_OUT:
-            clockedOutLabel.set_text(f'{sanitizedID} - RELOJ DE SALIDA (CLOCK OUT)')
-            clockedOutLabel.visible = True
-            db.insert_check_out_table(sanitizedID)
-            #set_background('grey')
-            await ui.run_javascript(f'getElement({inputBox.id}).focus()', respond=False)
+            except Exception as error:
+                # The punch stays in the browser journal and is replayed once TimeTracker can write again
+                self.tryAgainLabel.visible = True
+                self.set_background('grey')
+                eventLog.log(EventLog.ERROR, EventLog.PUNCH_FAILED, employeeId=int(sanitizedID), detail=f'Direction {direction}: {type(error).__name__}: {error}')
+                await ui.run_javascript(f'getElement({self.inputBox.id}).focus()', respond=False)
 
-    else:
-       tryAgainLabel.visible = True
-       set_background('grey')
+        else:
+            self.tryAgainLabel.visible = True
+            self.set_background('grey')
 
-    inputBox.set_value(None)                          # Clear user input box. Note set_value('') doesn't work :)
+        self.inputBox.set_value(None)                     # Clear user input box. Note set_value('') doesn't work :)
 
 
-def sanitize_employee_id(inputText: str) -> str:
-    """ Convert all bad user input to valid ouput and update GUI label visibility to control datatbase writes
+    def sanitize_employee_id(self, inputText: str) -> str:
+        """ Convert all bad user input to valid ouput and update GUI label visibility to control datatbase writes
+
+        Args:
+            inputText (str): Raw user input with possible errors
+
+        Returns:
+            str: A string with all blank spaces and non-digit characters removed
+        """
+        if inputText == None:
+            self.sanitizedID = ''
+            return self.sanitizedID
+
+        if int(inputText) > 9999 or int(inputText) < 0:
+            self.invalidIdLabel.visible = True
+            self.set_background('grey')
+            return 'ID DE EMPLEADO NO VÁLIDO (INVALID EMPLOYEE ID)'
+        else:
+            self.invalidIdLabel.visible = False
+
+        self.sanitizedID = str(int(inputText))
+
+        return self.sanitizedID
+
+
+@ui.page('/')
+def kiosk_page(provision: str = None):
+    """ Build a new Kiosk for every browser that opens the PWA
 
     Args:
-        inputText (str): Raw user input with possible errors
+        provision (str): Provisioning key from the "/?provision=..." URL a supervisor opens once per tablet
+    """
+    Kiosk().build(provision)
+
+
+@app.post(GC.KIOSK_REPLAY_PATH)
+async def replay_kiosk_journal(batch: dict) -> dict:
+    """ Apply the punches a kiosk browser journaled but never had confirmed, safe to call again with the same batch
+
+    Args:
+        batch (dict): JSON body {"kioskId": "...", "token": "...", "punches": [[sequence, employeeId, direction, timestamp], ...]} sent by replayTimeTrackerJournal()
 
     Returns:
-        str: A string with all blank spaces and non-digit characters removed
+        Dict: With the "acknowledged" sequence number the kiosk drops its journal up to
     """
-    global sanitizedID
+    try:
+        kioskId, punches = KioskJournal.parse_batch(batch)
+
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error)) from None
 
-    if int(inputText) > 9999 or int(inputText) < 0:
-        invalidIdLabel.visible = True
-        set_background('grey')
-        return 'ID DE EMPLEADO NO VÁLIDO (INVALID EMPLOYEE ID)'
-    else:
-       invalidIdLabel.visible = False
+    if not KioskJournal.is_authorized(kioskId, batch.get("token")):
+        raise HTTPException(status_code=403, detail='Unknown kiosk ID or token')
 
-    if inputText == None:
-        sanitizedID = ''
-    else:
-        sanitizedID = str(int(inputText))
+    # Replays run on the PunchWriter connection, between punch batches, so they never compete with kiosks for the write lock
+    try:
+        return await asyncio.wrap_future(punchWriter.submit_replay(kioskId, punches))
 
-    return sanitizedID
+    except queue.Full:
+        raise HTTPException(status_code=503, detail='TimeTracker is busy, the kiosk keeps its journal and retries') from None
 
 
-# TODO How do I make sure writes to insert_weekly_report_table doesnt get overwritten before report from last week is generated
 def update_weekly_report_table():
-    global canUpdateweeklyReportTable
-    
-    users = db.query_table("UsersTable")
-    for data in users:
-        employeeID = data[GC.EMPLOYEE_ID_COLUMN_NUMBER]
-        
-        currentDateObj = db.get_date_time()
-        dayOfWeek = currentDateObj.weekday()
-        currentTime = currentDateObj.time()
-        if dayOfWeek == GC.MONDAY and (ELEVEN_PM < currentTime and currentTime < THREE_AM):
-            canUpdateweeklyReportTable = False
-            
-        if canUpdateweeklyReportTable:
-            db.insert_weekly_report_table(employeeID, currentDateObj)
+    """ Snapshot last week into WeeklyReportHistoryTable once a new work week starts, punches keep WeeklyReportTable current
+
+        Runs on the Scheduler thread with its own TimeReport.db connection
+    """
+    reportDb = Database()
+    reportDb.rollover_weekly_report_table()
+    reportDb.close_database()
 
 
 def generate_report():
-    """ Generate EXCEL document every monday at 3 am
+    """ Generate last week's LaborerTimeReport, ClockInTimes, and ClockOutTimes .csv files, run once per work week by the Scheduler
         Work week starts Sunday at 12:01 am and repeats every 7 days
         Work week ends Saturday at 11:59 pm and repeats every 7 days
         Assumes 12 hour work day at 11 pm if an employee only clocks IN but forgets to clock out
         Back calculates 12 hour work day using the time an employee clocks OUT if no clocking IN exists
-
-        db (sqlite): *.db database file
+        WeeklyReportsGeneratedWeekId persists the last finished week, so a restart never generates the same week twice
     """
-    currentDateObj = db.get_date_time()
-    dayOfWeek = currentDateObj.weekday()
-    currentTime = currentDateObj.time()
+    lastSunday, lastSaturday = LocalClock.last_week_bounds()
+    weekId = PunchEvents.to_local_day(lastSunday)
+    reportDb = Database()
+    if PunchEvents.get_state(reportDb.cursor, 'WeeklyReportsGeneratedWeekId') >= weekId:
+        reportDb.close_database()
+        return
+
+    reportDb.rollover_weekly_report_table()
+    reportPaths = reportDb.export_table_to_csv(["WeeklyReportTable", "CheckInTable", "CheckOutTable"])
 
-    if dayOfWeek == GC.MONDAY and (ELEVEN_PM < currentTime and currentTime < THREE_AM):
-        canUpdateweeklyReportTable = True
-        db.export_table_to_csv(["WeeklyReportTable", "CheckInTable", "CheckOutTable"])
+    # Queued in TimeReport.db and sent to every supervisor over one SMTP session, a mail server outage only delays them
+    # WeeklyReportsMailedWeekId is advanced with the queued messages, so a second process or a crash before the week is marked generated never mails it twice
+    if len(GC.REPORT_RECIPIENTS) > 0 and len(reportPaths) > 0:
+        outbox.enqueue(GC.MAIL_SENDER, GC.REPORT_RECIPIENTS, f'TimeTracker reports {lastSunday.isoformat()} to {lastSaturday.isoformat()}',
+                       'Please see the attached LaborerTimeReport, ClockInTimes, and ClockOutTimes .csv files', reportPaths,
+                       stateName='WeeklyReportsMailedWeekId', stateValue=weekId)
+
+    PunchEvents.set_state(reportDb.cursor, 'WeeklyReportsGeneratedWeekId', weekId)
+    reportDb.commit_changes()
+    reportDb.close_database()
 
 
-def set_background(color: str) -> None:
-    ui.query('body').style(f'background-color: {color}')
- 
-   
 def sync():
     """ Force Syncthing systemd daemon restart
         https://www.youtube.com/watch?v=g-FZCIF0HJw
@@ -175,42 +505,28 @@ def sync():
 
 
 if __name__ in {"__main__", "__mp_main__"}:
+    ConnectionPool.configure(GC.DATABASE_FILENAME)
+    app.on_shutdown(ConnectionPool.get_pool().close)
     db = Database()
     db.setup_users()
+    # Threads start with the server, never in the reload supervisor process that also imports this module
+    punchWriter = PunchWriter()
+    app.on_startup(punchWriter.start)
+    app.on_shutdown(punchWriter.stop)
+    outbox = MailOutbox(configured_email())
+    app.on_startup(outbox.start)
+    app.on_shutdown(outbox.stop)
     #command = ['python3', 'pagekite.py', f'{GC.LOCAL_HOST_PORT_FOR_GUI}', 'timetracker.pagekite.me']
 
-    ui.timer(GC.LABEL_UPDATE_TIME, lambda: clockedInLabel.set_visibility(False))
-    ui.timer(GC.LABEL_UPDATE_TIME, lambda: clockedOutLabel.set_visibility(False))
-    ui.timer(GC.LABEL_UPDATE_TIME, lambda: tryAgainLabel.set_visibility(False))
-    ui.timer(GC.LABEL_UPDATE_TIME, lambda: set_background('white'))
-    ui.timer(GC.DATABASE_DAILY_REPORT_UPDATE_TIME, lambda: update_weekly_report_table())
-    ui.timer(GC.DATABASE_WEEKLY_REPORT_UPDATE_TIME, lambda: generate_report())
-    ui.timer(GC.CLOCK_UPDATE_TIME, lambda: clock.set_content(build_svg()))
-
-    invalidIdLabel = ui.label('ID DE EMPLEADO NO VÁLIDO (INVALID EMPLOYEE ID)').style("color: red; font-size: 150%; font-weight: 300").classes("self-center")
-    invalidIdLabel.visible = False
-
-    inputBox = ui.number(label='Ingrese su identificación de empleado', placeholder='Enter your Employee ID', value=None, \
-                        format='%i', \
-                        step='1000', \
-                        on_change=lambda e: invalidIdLabel.set_text(sanitize_employee_id(e.value)), \
-                        validation={'ID DE EMPLEADO NO VÁLIDO (INVALID EMPLOYEE ID)': lambda value: int(sanitizedID) <= 9999})
-
-    inputBox.classes("self-center").style("padding: 40px 0px; width: 600px; font-size: 30px;").props('clearable')
-
-    
-    # Invisible character https://invisibletext.com/#google_vignette
-    with ui.row().classes("self-center"):
-        with ui.button(on_click=lambda e: clock_x(GC.CLOCK_IN, sanitizedID), color="green").classes("relative  h-24 w-64"):
-            ui.label('RELOJ EN (CLOCK IN) ㅤ').style('font-size: 90%; font-weight: 300')
-            ui.icon('login')
-
-        with ui.button(on_click=lambda e: clock_x(GC.CLOCK_OUT, sanitizedID), color="red").classes("relative  h-24 w-64"):
-            ui.label('RELOJ DE SALIDA (CLOCK OUT) ㅤ').style("font-size: 90%; font-weight: 300")
-            ui.icon('logout')
-
-    clockedInLabel = ui.label(f'{validEmployeeID} - REGISTRO EN (CLOCKED IN)').style("color: green; font-size: 200%; font-weight: 300").classes("self-center")
-    clockedOutLabel = ui.label(f'{validEmployeeID} - FINALIZADO (CLOCKED OUT)').style("color: red; font-size: 200%; font-weight: 300").classes("self-center")
-    tryAgainLabel = ui.label('INTENTAR OTRA VEZ (TRY AGAIN)').style("color: red; font-size: 200%; font-weight: 300").classes("self-center")
+    # Label hiding is a one-shot deadline per kiosk, so the only timers left are report jobs off the event loop
+    scheduler = Scheduler()
+    scheduler.add_job(update_weekly_report_table, GC.DATABASE_DAILY_REPORT_UPDATE_TIME)
+    # Checked every 4 hours, the persisted WeeklyReportsGeneratedWeekId marker makes the first check of a work week the only one that
+    # does any work, and a failed run is retried on the next check
+    scheduler.add_job(generate_report, GC.DATABASE_WEEKLY_REPORT_UPDATE_TIME)
+    scheduler.add_job(eventLog.flush, GC.EVENT_LOG_FLUSH_TIME, jitter=0)
+    app.on_startup(scheduler.start)
+    app.on_shutdown(scheduler.stop)
+    app.on_shutdown(eventLog.flush)
 
     ui.run(native=GC.RUN_ON_NATIVE_OS, port=GC.LOCAL_HOST_PORT_FOR_GUI)
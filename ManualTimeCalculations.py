@@ -1,21 +1,17 @@
-import sqlite3                              # https://docs.python.org/3/library/sqlite3.html
-from datetime import datetime, timedelta 	# Create calendar dates & time objects https://docs.python.org/3/library/datetime.html
-
-from time import sleep                      # Import only the sleep function to pause prpgram execution 
-import pytz 					            # World Timezone Definitions  https://pypi.org/project/pytz/
-
-import csv
+import argparse                             # https://docs.python.org/3/library/argparse.html
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta 	# Create calendar dates & time objects https://docs.python.org/3/library/datetime.html
 
 import GlobalConstants as GC
+import ConnectionPool
+import LocalClock
+import PunchEvents
+import ReportEngine
+import ReportWriter
+from Database import employeeDirectory
 
-EMPLOYEE_NAMES = ["Erick Maldonado", "Dago Reyes Astello", "Cesar Rene Cabrera", "Adrian Cardenas", "Miguel Lopez Perez", "Edgar Maldonado",
-                      "German Maranto", "Juan  Antonio", "Victor Mata", "Eric  Mata Vazquez", "David Montoya", "Omar Palomo Galvan", "Nicolas Gomez Perez",
-                      "Felipe Otero", "Ulises Rodriguez", "Fidencio Santiz Lopez", "Nicolas Perez Santiz", "Rigoberto Savedra", "Jorge Velazquez",
-                      "Oscar Cruz Zaleta", "Oscar Rodriguez", "Osiel Hernandez", "Elias Castaneda", "Thomas Humphrey", "Chase Soliz", "Derrick Lohner"]
-    
-EMPLOYEE_IDS = [1000, 1001, 1002, 1003, 1004, 1005, 1006, 1007, 1008, 1009, 1010, 1011, 1012, 1013, 1014, 1015, 1016, 1017, 1018, 1019, 1020, 1021, 1022, 1023, 1024, 1025]
-
-EMPLOYEE_ID_OFFSET = 1000
 
 def get_date_time() -> datetime:
     """ Get date and time in Marianna, FL timezone, independent of location on server running code
@@ -23,18 +19,7 @@ def get_date_time() -> datetime:
     Returns:
         Datetime: 
     """
-    tz = pytz.timezone('America/Chicago')
-    zulu = pytz.timezone('UTC')
-    now = datetime.now(tz)
-    if now.dst() == timedelta(0):
-        now = datetime.now(zulu) - timedelta(hours=6)
-        #print('Standard Time')
-
-    else:
-        now = datetime.now(zulu) - timedelta(hours=5)
-        #print('Daylight Savings')   
-        
-    return now 
+    return LocalClock.now()
 
 
 def calculate_time_delta(id: int, date: datetime) -> tuple:
@@ -50,160 +35,194 @@ def calculate_time_delta(id: int, date: datetime) -> tuple:
             clockedIn = True if an employee ID clocked IN using GUI, False otherwise
             clockedOut = True if an employee ID clocked OUT using GUI, False otherwise
         """
-        clockedIn = True
-        clockedOut = True
+        # Hours are materialized in DailyHoursTable on every punch, so this is a single primary key lookup
+        localDay = PunchEvents.to_local_day(date)
+        with ConnectionPool.get_pool().reader() as conn:
+            dailyHours = PunchEvents.read_daily_hours(conn.cursor(), localDay, localDay)
         
-        conn = sqlite3.connect('TimeReport.db')
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM CheckInTable")
-        data = cursor.fetchall()
-        result = list(filter(lambda t: t[GC.EMPLOYEE_ID_COLUMN_NUMBER] == id, data))
-        dateToCalulate = date.isoformat(timespec="minutes")[0:10]
-        finalResult = list(filter(lambda t: t[GC.TIMESTAMP_COLUMN_NUMBER].startswith(dateToCalulate), result))
-        #print(finalResult)
-        try:
-            checkInIsoString = finalResult[0][GC.TIMESTAMP_COLUMN_NUMBER]
-            datetimeCheckInObject = datetime.fromisoformat(checkInIsoString)        # Convert the ISO strings to datetime objects
-            
-        except IndexError:
-            #print(f'Employee ID #{id} never clocked in on {dateToCalulate}')
-            clockedIn = False
-            datetimeCheckInObject = None
-
-        cursor.execute("SELECT * FROM CheckOutTable")
-        data = cursor.fetchall()
-        result = list(filter(lambda t: t[GC.EMPLOYEE_ID_COLUMN_NUMBER] == id, data))
-        finalResult = list(filter(lambda t: t[GC.TIMESTAMP_COLUMN_NUMBER].startswith(dateToCalulate), result))
-        #print(finalResult)
-        try:
-            checkOutIsoString = finalResult[0][GC.TIMESTAMP_COLUMN_NUMBER]
-            datetimeCheckOutObject = datetime.fromisoformat(checkOutIsoString)      # Convert the ISO strings to datetime objects
-            
-        except IndexError:
-            #print(f'Employee ID #{id} never clocked out on {dateToCalulate}')
-            clockedOut = False
-            datetimeCheckOutObject = None
-
-        elaspedHours = 0
-        if(not clockedIn and not clockedOut):
-            elaspedHours = 0.0
-        elif(not clockedIn and clockedOut):
-            elaspedHours = 12.0
-        elif(clockedIn and not clockedOut):
-            elaspedHours = 12.0
-        elif(not clockedIn and not clockedOut):
-            elaspedHours = 12.0
-        else: 
-            if datetimeCheckInObject and datetimeCheckOutObject:             
-                # Perform the absolute value subtraction (timeDeltaObject is NEVER negative)
-                timeDeltaObject = datetimeCheckOutObject - datetimeCheckInObject
-                elaspedSeconds = timeDeltaObject.seconds
-                elaspedHours = elaspedSeconds / 3600.0
+        elaspedHours, clockedIn, clockedOut = dailyHours.get((id, localDay), (0.0, False, False))
         
         return elaspedHours, clockedIn, clockedOut
 
 
 def create_dates():
-    dates = []
+    """ ISO-8601 dates of the last completed work week, Sunday to Saturday
+
+        Run on Sunday night or Monday morning this is the week that just ended, on any other day it is the week before the current one
+
+    Returns:
+        List: Of seven strings (e.g. ["2023-08-20", ..., "2023-08-26"])
+    """
+    lastSunday, _ = LocalClock.last_week_bounds()
     
-    now = get_date_time()
-
-    # Check day of week script is being run (7, 0, -1) if run on Sunday nigth and (8, 1, -1 in run Monday morning))
-    if now.weekday() == GC.SUNDAY: 
-        for dayDelta in range(7, 0, -1):
-            dates.append((get_date_time() - timedelta(days=dayDelta)).isoformat(timespec="minutes")[0:10])
-    elif now.weekday() == GC.MONDAY:
-        for dayDelta in range(8, 1, -1):   
-            dates.append((get_date_time() - timedelta(days=dayDelta)).isoformat(timespec="minutes")[0:10])
-        
-    return dates
+    return week_dates(lastSunday)
+
+
+def week_dates(sunday: date) -> list:
+    """ Seven ISO-8601 dates of the work week starting on a Sunday
+
+    Args:
+        sunday (date): First day of the work week
+
+    Returns:
+        List: Of strings from Sunday to Saturday (e.g. ["2023-08-20", ..., "2023-08-26"])
+    """
+    return [(sunday + timedelta(days=dayDelta)).isoformat() for dayDelta in range(7)]
+
+
+def week_sundays(startDate: date, endDate: date) -> list:
+    """ Sunday of every work week that overlaps a date range
+
+    Args:
+        startDate (date): First date of the range
+        endDate (date): Last date of the range (inclusive)
+
+    Returns:
+        List: Of date objects, one per work week
+    """
+    sunday, _ = LocalClock.week_bounds(startDate)
+    sundays = []
+    while sunday <= endDate:
+        sundays.append(sunday)
+        sunday += timedelta(days=7)
+
+    return sundays
+
+
+def init_backfill_worker(snapshotPath: str):
+    """ ProcessPoolExecutor initializer that points every connection in a worker process at the read-only snapshot
+    """
+    ConnectionPool.configure(snapshotPath)
+    employeeDirectory.invalidate()
+
+
+def backfill_week(sunday: date) -> list:
+    """ ProcessPoolExecutor task that writes the three .csv files of one work week
+    """
+    return weekly_reports(week_dates(sunday))
+
 
+def backfill_reports(startDate: date, endDate: date, workers: int = None) -> list:
+    """ Regenerate LaborerTimeReport, CheckInTimes and CheckOutTimes files for every week in a date range
 
-def labor_report():
-    dates = create_dates()
+        Each week is independent, so weeks are fanned out across a process pool reading a snapshot of TimeReport.db,
+        and the kiosk keeps writing to the live database while a full year is regenerated
+
+    Args:
+        startDate (date): First date of the range
+        endDate (date): Last date of the range (inclusive)
+        workers (int): Worker processes, defaults to one per CPU core
+
+    Returns:
+        List: Of every filename written
+    """
+    filenames = []
+    with tempfile.TemporaryDirectory() as snapshotDirectory:
+        snapshotPath = os.path.join(snapshotDirectory, 'TimeReport.db')
+        ConnectionPool.create_snapshot(snapshotPath)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_backfill_worker, initargs=(snapshotPath,)) as executor:
+            for weekFilenames in executor.map(backfill_week, week_sundays(startDate, endDate)):
+                filenames.extend(weekFilenames)
+
+    return filenames
+
+
+def labor_report(dates: list = None):
+    if dates is None: dates = create_dates()
+    firstDay = PunchEvents.to_local_day(datetime.fromisoformat(dates[0]))
     
-    filename = dates[0] + '_' + dates[6] + '_LaborerTimeReport.csv'
-    with open(filename, 'a', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(['Employee Name', 'Employee ID', 'Total Hours', 'Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'CheckIn Comment', 'CheckOut Comment'])
-        for id, name in zip(EMPLOYEE_IDS, EMPLOYEE_NAMES):
-            print(f'{name} has ID #{id}')
-            dailyHours = []
-            dailyCheckedIn = []
-            dailyCheckedOut = []
-            for day in dates:
-                dateToCalculate = datetime.fromisoformat(day)
-                hoursWorks, checkedIn, checkedOut = calculate_time_delta(id, dateToCalculate)
-                dailyHours.append(round(hoursWorks, 4))
-                dailyCheckedIn.append(checkedIn)
-                dailyCheckedOut.append(checkedOut)
-            
-            totalHours = sum(dailyHours)
-            inComment = 'Missed: '
-            outComment = 'Missed: '
-            dayOfWeek = ['Sun', 'Mon', 'Tues', 'Wed', 'Thurs', 'Fri', 'Sat']
-            for i in range(7):
-                if dailyCheckedIn[i] == False:
-                    inComment = inComment + dayOfWeek[i] + ' '
-                if dailyCheckedOut[i] == False:
-                    outComment = outComment + dayOfWeek[i] + ' '
-            
-            
-            if totalHours == 0:
-                data = [name, id, round(totalHours, 2), dailyHours[0], dailyHours[1], dailyHours[2], dailyHours[3], dailyHours[4], dailyHours[5], dailyHours[6], 'Missed: All Days', 'Missed: All Days']
-            else:
-                data = [name, id, round(totalHours, 2), dailyHours[0], dailyHours[1], dailyHours[2], dailyHours[3], dailyHours[4], dailyHours[5], dailyHours[6], inComment, outComment]
-            
-            writer.writerow(data)
+    # One PunchEventsAllView range query, then every (employee, day) cell is computed with NumPy
+    with ConnectionPool.get_pool().reader() as conn:
+        rows = ReportEngine.labor_report_rows(conn, employeeDirectory.get_employees(), firstDay)
+    
+    filenamePrefix = dates[0] + '_' + dates[6]
+    with ReportWriter.ReportFile(filenamePrefix + '_LaborerTimeReport.csv', ReportEngine.LABOR_REPORT_HEADER) as report:
+        report.writerows(rows)
+    
+    ReportWriter.publish_manifest(filenamePrefix, [report])
 
 
-def check_x_report(direction: int):
-    dates = create_dates()
-        
-    conn = sqlite3.connect('TimeReport.db')
-    cursor = conn.cursor()
+def check_x_report(direction: int, dates: list = None):
+    if dates is None: dates = create_dates()
+    firstDay = PunchEvents.to_local_day(datetime.fromisoformat(dates[0]))
     
+    filenamePrefix = dates[0] + '_' + dates[6]
     if direction == GC.CLOCK_IN:
-        filename = dates[0] + '_' + dates[6] + '_CheckInTimes.csv'
-        cursor.execute("SELECT * FROM CheckInTable")
-            
+        filename = filenamePrefix + '_CheckInTimes.csv'
     else:
-        filename = dates[0] + '_' + dates[6] + '_CheckOutTimes.csv'
-        cursor.execute("SELECT * FROM CheckOutTable")
+        filename = filenamePrefix + '_CheckOutTimes.csv'
     
-    data = cursor.fetchall()
-    result = list(filter(lambda t: t[GC.TIMESTAMP_COLUMN_NUMBER] >= dates[0], data))
-    #print(result)
+    # Stream the week's punches straight from the index into a buffered writer, never holding more than one batch in memory
+    with ConnectionPool.get_pool().reader() as conn, ReportWriter.ReportFile(filename, ReportEngine.CHECK_X_REPORT_HEADER) as report:
+        cursor = conn.execute(f"SELECT employeeId, {PunchEvents.ISO_TIMESTAMP_SQL} FROM PunchEventsAllView WHERE localDay BETWEEN ? AND ? AND direction = ? ORDER BY id", (firstDay, firstDay + 6, direction))
+        entries = cursor.fetchmany(GC.EXPORT_BATCH_SIZE)
+        while len(entries) > 0:
+            report.writerows([employeeDirectory.get_full_name(employeeId), employeeId, timestamp] for employeeId, timestamp in entries)
+            entries = cursor.fetchmany(GC.EXPORT_BATCH_SIZE)
     
-    with open(filename, 'a', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow(['Employee Name', 'Employee ID', 'Timestamp'])
-        for entry in result:
-            emplopyeeName = EMPLOYEE_NAMES[entry[GC.EMPLOYEE_ID_COLUMN_NUMBER] - EMPLOYEE_ID_OFFSET] 
-            employeeId = entry[GC.EMPLOYEE_ID_COLUMN_NUMBER]
-            timestamp = entry[GC.TIMESTAMP_COLUMN_NUMBER]
-            
-            data = [emplopyeeName, employeeId, timestamp]
-            writer.writerow(data)
-            
-        file.close()
+    ReportWriter.publish_manifest(filenamePrefix, [report])
+
+
+def weekly_reports(dates: list = None, directory: str = '') -> list:
+    """ Write the LaborerTimeReport, CheckInTimes and CheckOutTimes .csv files from a single scan of one week's punches
+
+        Every file is published atomically and replaces any earlier copy, then the week's manifest records their row counts and checksums
+
+    Args:
+        dates (list): Seven ISO-8601 dates from Sunday to Saturday, defaults to last week from create_dates()
+        directory (str): Directory to write the files to, defaults to the current working directory
+
+    Returns:
+        List: The three file paths written
+    """
+    if dates is None: dates = create_dates()
+    firstDay = PunchEvents.to_local_day(datetime.fromisoformat(dates[0]))
+    filenamePrefix = os.path.join(directory, dates[0] + '_' + dates[6])
+    
+    employees = employeeDirectory.get_employees()
+    grids = ReportEngine.FirstPunchGrids(sorted(employees), firstDay, 7)
+    
+    with ConnectionPool.get_pool().reader() as conn, \
+         ReportWriter.ReportFile(filenamePrefix + '_CheckInTimes.csv', ReportEngine.CHECK_X_REPORT_HEADER) as checkInReport, \
+         ReportWriter.ReportFile(filenamePrefix + '_CheckOutTimes.csv', ReportEngine.CHECK_X_REPORT_HEADER) as checkOutReport:
+        reports = {GC.CLOCK_IN: checkInReport, GC.CLOCK_OUT: checkOutReport}
+        
+        cursor = ReportEngine.select_punches(conn, firstDay, firstDay + 6, f"{ReportEngine.PUNCH_COLUMNS}, {PunchEvents.ISO_TIMESTAMP_SQL}")
+        punches = cursor.fetchmany(GC.EXPORT_BATCH_SIZE)
+        while len(punches) > 0:
+            grids.add(ReportEngine.to_punch_array([punch[0:4] for punch in punches]))
+            for employeeId, _, direction, _, timestamp in punches:
+                reports[direction].writerow([employeeDirectory.get_full_name(employeeId), employeeId, timestamp])
             
+            punches = cursor.fetchmany(GC.EXPORT_BATCH_SIZE)
+    
+    hours, clockedIn, clockedOut = grids.calculate_hours()
+    with ReportWriter.ReportFile(filenamePrefix + '_LaborerTimeReport.csv', ReportEngine.LABOR_REPORT_HEADER) as laborReport:
+        laborReport.writerows(ReportEngine.labor_report_rows_from_hours(employees, hours, clockedIn, clockedOut))
+    
+    ReportWriter.publish_manifest(filenamePrefix, [laborReport, checkInReport, checkOutReport])
+    
+    return [laborReport.path, checkInReport.path, checkOutReport.path]
+
 
 def job():
-    labor_report()
-    check_x_report(GC.CLOCK_IN)
-    check_x_report(GC.CLOCK_OUT)
+    weekly_reports()
 
 
 if __name__ == "__main__":
 
-    try:
-        job()
+    parser = argparse.ArgumentParser(description='Generate TimeTracker .csv reports for last week, or for every week between --start and --end')
+    parser.add_argument('--start', type=date.fromisoformat, help='First date to report on (e.g. 2023-08-20)')
+    parser.add_argument('--end', type=date.fromisoformat, help='Last date to report on, defaults to --start')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes, defaults to one per CPU core')
+    args = parser.parse_args()
 
-        
-    except KeyboardInterrupt:
-        # Sleep so that only a single 'Ctrl+C' is needed to exit program
-        sleep(3)                    
-        raise SystemExit
+    if args.start is None:
+        filenames = weekly_reports()
+    else:
+        filenames = backfill_reports(args.start, args.end or args.start, args.workers)
+
+    for filename in filenames:
+        print(f'Generated {filename}')
 
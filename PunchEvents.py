@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "Unified PunchEventsTable schema, week-partitioned PunchEventsArchiveTable, DailyHoursTable materialization, and one-shot, resumable migration from the legacy CheckInTable and CheckOutTable"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+
+# Standard Python libraries
+import sqlite3                                  # https://docs.python.org/3/library/sqlite3.html
+from datetime import datetime, date, timezone   # Manipulate calendar dates & time objects https://docs.python.org/3/library/datetime.html
+
+# Internal modules
+import GlobalConstants as GC
+import LocalClock                               # Imports this module too, only used inside functions
+
+SECONDS_PER_DAY = 86400
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Legacy table name, direction stored in PunchEventsTable, and name the legacy table is renamed to once migrated
+LEGACY_TABLES = [("CheckInTable", GC.CLOCK_IN, "CheckInTableLegacy"), ("CheckOutTable", GC.CLOCK_OUT, "CheckOutTableLegacy")]
+
+PUNCH_EVENT_COLUMNS = "id, employeeId, direction, epochLocal, localDay"
+
+# SQL expression that formats epochLocal like the ISO-8601 TEXT timestamps of the legacy tables (e.g. "2023-08-21T17:39+00:00")
+ISO_TIMESTAMP_SQL = "strftime('%Y-%m-%dT%H:%M+00:00', epochLocal, 'unixepoch')"
+
+# First clock IN and first clock OUT of every (employeeId, localDay) matching a WHERE clause, converted to hours worked
+# 0 hours if an employee forgets to both clock IN and clock OUT, 12 hours if only one of the two actions was performed,
+# otherwise the time between the punches wrapped into [0, 1 day) like timedelta.seconds
+DAILY_HOURS_UPSERT = f'''INSERT OR REPLACE INTO DailyHoursTable (employeeId, localDay, checkInEpoch, checkOutEpoch, hours)
+    SELECT employeeId, localDay, checkInEpoch, checkOutEpoch,
+        CASE WHEN checkInEpoch IS NULL AND checkOutEpoch IS NULL THEN 0.0
+             WHEN checkInEpoch IS NULL OR checkOutEpoch IS NULL THEN 12.0
+             ELSE (((checkOutEpoch - checkInEpoch) % {SECONDS_PER_DAY} + {SECONDS_PER_DAY}) % {SECONDS_PER_DAY}) / 3600.0 END
+    FROM (SELECT employeeId, localDay,
+                 MIN(CASE WHEN direction = {GC.CLOCK_IN} THEN epochLocal END) AS checkInEpoch,
+                 MIN(CASE WHEN direction = {GC.CLOCK_OUT} THEN epochLocal END) AS checkOutEpoch
+          FROM PunchEventsAllView WHERE {{where}} GROUP BY employeeId, localDay)'''
+
+
+def create_tables(cursor: sqlite3.Cursor):
+    """ Create PunchEventsTable, PunchEventsArchiveTable, their covering indexes, and the StateTable used to checkpoint migrations
+
+        epochLocal is Marianna, FL wall clock time counted as seconds since 1970-01-01T00:00, NOT a UTC instant. TimeTracker has
+        always recorded local time tagged "+00:00", and epochLocal keeps that convention so localDay = epochLocal // 86400 is the
+        local calendar day. The cost is daylight saving time: the hour repeated when clocks fall back maps two real instants onto
+        the same epochLocal values, and a shift spanning a change is off by one hour. Convert real instants with LocalClock.wall_time()
+        before storing them, and never compare epochLocal with time.time()
+
+        PunchEventsTable only holds the open work week, archive_closed_weeks() moves older punches into PunchEventsArchiveTable.
+        AUTOINCREMENT stops SQLite from reusing the id of an archived punch once PunchEventsTable is empty.
+        Range queries and reports read PunchEventsAllView, the UNION ALL of both tables.
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor of an open TimeReport.db connection
+    """
+    cursor.execute('''CREATE TABLE IF NOT EXISTS PunchEventsTable (id INTEGER PRIMARY KEY AUTOINCREMENT, employeeId INTEGER, direction INTEGER, epochLocal INTEGER, localDay INTEGER)''')
+    cursor.execute('''CREATE INDEX IF NOT EXISTS PunchEventsEmployeeDayIndex ON PunchEventsTable (employeeId, localDay, direction, epochLocal)''')
+    cursor.execute('''CREATE INDEX IF NOT EXISTS PunchEventsDayIndex ON PunchEventsTable (localDay, employeeId, direction, epochLocal)''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS PunchEventsArchiveTable (id INTEGER PRIMARY KEY, weekId INTEGER, employeeId INTEGER, direction INTEGER, epochLocal INTEGER, localDay INTEGER)''')
+    cursor.execute('''CREATE INDEX IF NOT EXISTS PunchEventsArchiveWeekIndex ON PunchEventsArchiveTable (weekId)''')
+    cursor.execute('''CREATE INDEX IF NOT EXISTS PunchEventsArchiveDayIndex ON PunchEventsArchiveTable (localDay, employeeId, direction, epochLocal)''')
+    cursor.execute(f'''CREATE VIEW IF NOT EXISTS PunchEventsAllView AS SELECT {PUNCH_EVENT_COLUMNS} FROM PunchEventsTable UNION ALL SELECT {PUNCH_EVENT_COLUMNS} FROM PunchEventsArchiveTable''')
+    cursor.execute('''CREATE TABLE IF NOT EXISTS StateTable (name TEXT PRIMARY KEY, value INTEGER)''')
+
+    # Hours worked per employee per day, kept current by refresh_daily_hours() on every punch
+    cursor.execute('''CREATE TABLE IF NOT EXISTS DailyHoursTable (employeeId INTEGER, localDay INTEGER, checkInEpoch INTEGER, checkOutEpoch INTEGER, hours REAL, PRIMARY KEY (employeeId, localDay))''')
+    cursor.execute('''CREATE INDEX IF NOT EXISTS DailyHoursDayIndex ON DailyHoursTable (localDay, employeeId)''')
+
+
+def to_epoch(isoString: str) -> int:
+    """ Convert a stored ISO-8601 timestamp (e.g. "2023-08-21T17:39+00:00") to integer epochLocal seconds
+
+        A naive timestamp is Marianna, FL wall clock time, never the timezone of the server running the code
+
+    Args:
+        isoString (str): Wall clock timestamp written by Database.insert_check_x_table(), see LocalClock.wall_time() for other offsets
+
+    Returns:
+        int: Wall clock seconds since 1970-01-01T00:00
+    """
+    return int(LocalClock.wall_time(datetime.fromisoformat(isoString)).timestamp())
+
+
+def to_iso_string(epochLocal: int) -> str:
+    """ Convert integer epochLocal seconds back to the ISO-8601 string format stored in the legacy tables
+
+    Args:
+        epochLocal (int): Wall clock seconds since 1970-01-01T00:00
+
+    Returns:
+        str: Timestamp (e.g. "2023-08-21T17:39+00:00")
+    """
+    return datetime.fromtimestamp(epochLocal, timezone.utc).strftime('%Y-%m-%dT%H:%M+00:00')
+
+
+def to_local_day(dateToConvert: datetime) -> int:
+    """ Convert the calendar date of a datetime or date object to a localDay integer
+
+    Args:
+        dateToConvert (datetime): Only the ISO-8601 date (e.g. "2023-08-22") is used
+
+    Returns:
+        int: Days since 1970-01-01
+    """
+    return dateToConvert.toordinal() - EPOCH_ORDINAL
+
+
+def to_week_id(localDay: int) -> int:
+    """ Identify the Sunday to Saturday work week containing a localDay
+
+    Args:
+        localDay (int): Days since 1970-01-01, which was a Thursday
+
+    Returns:
+        int: localDay of the Sunday starting the work week
+    """
+    return localDay - (localDay + 4) % 7
+
+
+def weekday_column(localDay: int) -> str:
+    """ WeeklyReportTable column holding the hours of a localDay
+
+    Args:
+        localDay (int): Days since 1970-01-01
+
+    Returns:
+        str: day0 (Monday) to day6 (Sunday), matching datetime.weekday()
+    """
+    return f'day{(localDay + 3) % 7}'
+
+
+def get_state(cursor: sqlite3.Cursor, name: str, default: int = 0) -> int:
+    """ Read an integer checkpoint or marker from StateTable
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor of an open TimeReport.db connection
+        name (str): Unique name of the value
+        default (int): Value returned if name has never been written
+
+    Returns:
+        int: Stored value
+    """
+    cursor.execute("SELECT value FROM StateTable WHERE name = ?", (name,))
+    row = cursor.fetchone()
+
+    return default if row is None else row[0]
+
+
+def set_state(cursor: sqlite3.Cursor, name: str, value: int):
+    """ Write an integer checkpoint or marker to StateTable, caller is responsible for the commit
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor of an open TimeReport.db connection
+        name (str): Unique name of the value
+        value (int): Value to store
+    """
+    cursor.execute("INSERT OR REPLACE INTO StateTable (name, value) VALUES (?, ?)", (name, value))
+
+
+def object_type(cursor: sqlite3.Cursor, name: str) -> str:
+    """ Get the type of a database object
+
+    Returns:
+        str: 'table', 'view', 'index' or None if no object called name exists
+    """
+    cursor.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,))
+    row = cursor.fetchone()
+
+    return None if row is None else row[0]
+
+
+def is_migrated(cursor: sqlite3.Cursor) -> bool:
+    """ True once both legacy tables have been replaced by read-compatibility views
+    """
+    return all(object_type(cursor, table) == 'view' for table, _, _ in LEGACY_TABLES)
+
+
+def copy_legacy_rows(cursor: sqlite3.Cursor, table: str, direction: int, batchSize: int) -> int:
+    """ Copy the next batch of not yet migrated rows from a legacy table into PunchEventsTable
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor of an open TimeReport.db connection
+        table (str): CheckInTable or CheckOutTable
+        direction (int): GC.CLOCK_IN or GC.CLOCK_OUT
+        batchSize (int): Maximum number of rows to copy
+
+    Returns:
+        int: Number of rows copied, 0 once the legacy table is fully migrated
+    """
+    checkpointName = f'{table}MigratedId'
+    lastId = get_state(cursor, checkpointName)
+
+    cursor.execute(f"SELECT id, employeeId, timestamp FROM {table} WHERE id > ? ORDER BY id LIMIT ?", (lastId, batchSize))
+    rows = cursor.fetchall()
+    if len(rows) == 0:
+        return 0
+
+    events = []
+    for row in rows:
+        epochLocal = to_epoch(row[GC.TIMESTAMP_COLUMN_NUMBER])
+        events.append((int(row[GC.EMPLOYEE_ID_COLUMN_NUMBER]), direction, epochLocal, epochLocal // SECONDS_PER_DAY))
+
+    cursor.executemany("INSERT INTO PunchEventsTable (employeeId, direction, epochLocal, localDay) VALUES (?, ?, ?, ?)", events)
+    set_state(cursor, checkpointName, rows[-1][0])
+
+    return len(rows)
+
+
+def refresh_daily_hours(cursor: sqlite3.Cursor, employeeId: int, localDay: int):
+    """ Recalculate a single DailyHoursTable row from its punches, call inside the same transaction as the punch insert
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor of an open TimeReport.db connection
+        employeeId (int): Employee ID
+        localDay (int): Days since 1970-01-01
+    """
+    cursor.execute(DAILY_HOURS_UPSERT.format(where="employeeId = ? AND localDay = ?"), (int(employeeId), localDay))
+
+
+def build_daily_hours(conn: sqlite3.Connection) -> bool:
+    """ One-shot backfill of DailyHoursTable from every punch already in PunchEventsTable
+
+    Args:
+        conn (sqlite3.Connection): Open TimeReport.db connection
+
+    Returns:
+        bool: True if the backfill ran, False if DailyHoursTable was already built
+    """
+    cursor = conn.cursor()
+    if get_state(cursor, 'DailyHoursBuilt') == 1:
+        return False
+
+    cursor.execute(DAILY_HOURS_UPSERT.format(where="1"))
+    set_state(cursor, 'DailyHoursBuilt', 1)
+    conn.commit()
+
+    return True
+
+
+def read_daily_hours(cursor: sqlite3.Cursor, firstDay: int, lastDay: int) -> dict:
+    """ Single indexed range read of every DailyHoursTable row between two days
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor of an open TimeReport.db connection
+        firstDay (int): First localDay to read
+        lastDay (int): Last localDay to read (inclusive)
+
+    Returns:
+        Dict: (employeeId, localDay) keys with (hours, clockedIn, clockedOut) values, days without punches are missing
+    """
+    cursor.execute("SELECT employeeId, localDay, hours, checkInEpoch IS NOT NULL, checkOutEpoch IS NOT NULL FROM DailyHoursTable WHERE localDay BETWEEN ? AND ?", (firstDay, lastDay))
+
+    return {(row[0], row[1]): (row[2], bool(row[3]), bool(row[4])) for row in cursor.fetchall()}
+
+
+def create_compatibility_view(cursor: sqlite3.Cursor, table: str, direction: int):
+    """ Create a view with the legacy (id, employeeId, timestamp) columns so SELECT * FROM CheckInTable keeps working
+    """
+    cursor.execute(f'''CREATE VIEW IF NOT EXISTS {table} AS SELECT id, employeeId, {ISO_TIMESTAMP_SQL} AS timestamp FROM PunchEventsAllView WHERE direction = {direction}''')
+
+
+def upgrade_for_archive(conn: sqlite3.Connection) -> bool:
+    """ One-shot upgrade of a PunchEventsTable created before weekly archiving
+
+        Rebuilds PunchEventsTable with AUTOINCREMENT ids and points the CheckInTable and CheckOutTable views at PunchEventsAllView,
+        in a single transaction. Running it on an upgraded database is a no-op.
+
+    Args:
+        conn (sqlite3.Connection): Open TimeReport.db connection, after create_tables()
+
+    Returns:
+        bool: True if the upgrade ran
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'PunchEventsTable'")
+    hasAutoincrement = 'AUTOINCREMENT' in cursor.fetchone()[0].upper()
+    views = [table for table, _, _ in LEGACY_TABLES if object_type(cursor, table) == 'view']
+    cursor.execute(f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'view' AND name IN ({', '.join('?' * len(views))}) AND sql NOT LIKE '%PunchEventsAllView%'", views)
+    if hasAutoincrement and cursor.fetchone()[0] == 0:
+        return False
+
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        for table in views:
+            cursor.execute(f"DROP VIEW {table}")
+
+        if not hasAutoincrement:
+            cursor.execute("DROP VIEW PunchEventsAllView")
+            cursor.execute("DROP INDEX PunchEventsEmployeeDayIndex")
+            cursor.execute("DROP INDEX PunchEventsDayIndex")
+            cursor.execute("ALTER TABLE PunchEventsTable RENAME TO PunchEventsTableUpgrade")
+            create_tables(cursor)
+            cursor.execute(f"INSERT INTO PunchEventsTable ({PUNCH_EVENT_COLUMNS}) SELECT {PUNCH_EVENT_COLUMNS} FROM PunchEventsTableUpgrade ORDER BY id")
+            cursor.execute("DROP TABLE PunchEventsTableUpgrade")
+
+        for table, direction, _ in LEGACY_TABLES:
+            if table in views:
+                create_compatibility_view(cursor, table, direction)
+
+        conn.commit()
+
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+    return True
+
+
+def upgrade_epoch_local(conn: sqlite3.Connection) -> bool:
+    """ One-shot rename of the epochUtc column, which always held wall clock time, to epochLocal
+
+        The views over the punch tables are dropped and recreated around the ALTER TABLE in a single transaction,
+        SQLite renames the column in the covering indexes itself. Running it on an upgraded database is a no-op.
+
+    Args:
+        conn (sqlite3.Connection): Open TimeReport.db connection, before create_tables()
+
+    Returns:
+        bool: True if the upgrade ran
+    """
+    cursor = conn.cursor()
+    tables = [table for table in ("PunchEventsTable", "PunchEventsArchiveTable")
+              if object_type(cursor, table) == 'table' and 'epochUtc' in [column[1] for column in cursor.execute(f"PRAGMA table_info({table})").fetchall()]]
+    if len(tables) == 0:
+        return False
+
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        views = [table for table, _, _ in LEGACY_TABLES if object_type(cursor, table) == 'view']
+        for view in views + ["PunchEventsAllView"]:
+            cursor.execute(f"DROP VIEW IF EXISTS {view}")
+
+        for table in tables:
+            cursor.execute(f"ALTER TABLE {table} RENAME COLUMN epochUtc TO epochLocal")
+
+        create_tables(cursor)
+        for table, direction, _ in LEGACY_TABLES:
+            if table in views:
+                create_compatibility_view(cursor, table, direction)
+
+        conn.commit()
+
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+    return True
+
+
+def archive_closed_weeks(cursor: sqlite3.Cursor, weekId: int, lastId: int = -1) -> int:
+    """ Move every punch from before a work week into PunchEventsArchiveTable, caller is responsible for the commit
+
+        Run inside the week rollover transaction, so readers of PunchEventsAllView see each punch exactly once
+
+    Args:
+        cursor (sqlite3.Cursor): Cursor of an open TimeReport.db connection
+        weekId (int): localDay of the Sunday starting the open work week
+        lastId (int): Only move punches up to this id, defaults to every punch
+
+    Returns:
+        int: Number of punches archived
+    """
+    cursor.execute(f"INSERT INTO PunchEventsArchiveTable (weekId, {PUNCH_EVENT_COLUMNS}) SELECT localDay - (localDay + 4) % 7, {PUNCH_EVENT_COLUMNS} FROM PunchEventsTable WHERE localDay < ? AND (? < 0 OR id <= ?)", (weekId, lastId, lastId))
+    cursor.execute("DELETE FROM PunchEventsTable WHERE localDay < ? AND (? < 0 OR id <= ?)", (weekId, lastId, lastId))
+
+    return cursor.rowcount
+
+
+def archive_legacy_weeks(conn: sqlite3.Connection, weekId: int, batchSize: int) -> int:
+    """ One-shot, resumable archive of the closed weeks a migrated or upgraded database still holds in PunchEventsTable
+
+        Runs at startup one batch per transaction, so the first week rollover on the PunchWriter thread only moves the week that just closed
+
+    Args:
+        conn (sqlite3.Connection): Open TimeReport.db connection
+        weekId (int): localDay of the Sunday starting the current work week, None to only archive weeks before WeeklyReportWeekId
+        batchSize (int): Punches moved per transaction
+
+    Returns:
+        int: Number of punches archived
+    """
+    cursor = conn.cursor()
+    openWeekId = get_state(cursor, 'WeeklyReportWeekId', None)
+    archiveWeekId = openWeekId if openWeekId is not None else weekId
+    if archiveWeekId is None or cursor.execute("SELECT 1 FROM PunchEventsTable WHERE localDay < ? LIMIT 1", (archiveWeekId,)).fetchone() is None:
+        return 0
+
+    totalArchived = 0
+    while True:
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            # Never archive the week WeeklyReportTable still has open, its rollover takes the history snapshot first
+            openWeekId = get_state(cursor, 'WeeklyReportWeekId', None)
+            archiveWeekId = openWeekId if openWeekId is not None else weekId
+            lastId = None
+            if archiveWeekId is not None:
+                cursor.execute("SELECT MAX(id) FROM (SELECT id FROM PunchEventsTable WHERE localDay < ? ORDER BY id LIMIT ?)", (archiveWeekId, batchSize))
+                lastId = cursor.fetchone()[0]
+
+            if lastId is None:
+                conn.rollback()
+                return totalArchived
+
+            totalArchived += archive_closed_weeks(cursor, archiveWeekId, lastId)
+            conn.commit()
+
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+        if GC.DEBUG_STATEMENTS_ON: print(f'Archived {totalArchived} punches from before week {archiveWeekId}')
+
+
+def migrate(conn: sqlite3.Connection, batchSize: int = 5000, weekId: int = None) -> int:
+    """ Migrate CheckInTable and CheckOutTable into PunchEventsTable
+
+        Each batch commits together with its checkpoint in StateTable, so an interrupted migration resumes where it stopped.
+        The final step copies any rows punched during the migration, renames the legacy tables to *Legacy, and
+        creates read-compatibility views in a single transaction. Closed weeks are then moved into PunchEventsArchiveTable.
+        Running it on a migrated and archived database is a no-op.
+
+    Args:
+        conn (sqlite3.Connection): Open TimeReport.db connection
+        batchSize (int): Rows copied or archived per transaction
+        weekId (int): localDay of the Sunday starting the current work week, punches from before it are archived
+
+    Returns:
+        int: Number of rows copied
+    """
+    cursor = conn.cursor()
+    upgrade_epoch_local(conn)
+    create_tables(cursor)
+    conn.commit()
+    upgrade_for_archive(conn)
+
+    if is_migrated(cursor):
+        archive_legacy_weeks(conn, weekId, batchSize)
+        return 0
+
+    totalCopied = 0
+    for table, direction, _ in LEGACY_TABLES:
+        if object_type(cursor, table) != 'table':
+            continue
+
+        copied = copy_legacy_rows(cursor, table, direction, batchSize)
+        while copied > 0:
+            conn.commit()
+            totalCopied += copied
+            if GC.DEBUG_STATEMENTS_ON: print(f'Migrated {totalCopied} rows into PunchEventsTable')
+            copied = copy_legacy_rows(cursor, table, direction, batchSize)
+
+    # Swap the legacy tables for views atomically, so no punch can land in a renamed table
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        for table, direction, legacyName in LEGACY_TABLES:
+            if object_type(cursor, table) == 'table':
+                copied = copy_legacy_rows(cursor, table, direction, batchSize)
+                while copied > 0:
+                    totalCopied += copied
+                    copied = copy_legacy_rows(cursor, table, direction, batchSize)
+
+                cursor.execute(f"ALTER TABLE {table} RENAME TO {legacyName}")
+
+            create_compatibility_view(cursor, table, direction)
+
+        conn.commit()
+
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+    archive_legacy_weeks(conn, weekId, batchSize)
+
+    return totalCopied
+
+
+if __name__ == "__main__":
+    print("Migrating TimeReport.db punches into PunchEventsTable")
+
+    connection = sqlite3.connect('TimeReport.db')
+    print(f'Copied {migrate(connection)} rows')
+    build_daily_hours(connection)
+    connection.close()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "Write-behind queue that group commits kiosk punches on a dedicated thread"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+# pylint: disable=broad-exception-caught
+
+# Standard Python libraries
+import queue                                    # https://docs.python.org/3/library/queue.html
+import threading
+from concurrent.futures import Future           # https://docs.python.org/3/library/concurrent.futures.html
+from time import monotonic
+
+# Internal modules
+import GlobalConstants as GC
+from Database import Database
+import KioskJournal
+
+
+class PunchWriter:
+    """ Own the only kiosk writer connection on a background thread, so Main.py never waits on an fsync
+
+        Punches arriving within GC.PUNCH_BATCH_WINDOW seconds of each other are inserted in a single
+        transaction, so a shift change burst costs one commit per batch instead of one per punch.
+        Kiosk journal replays share the queue and the connection, each in a transaction of its own
+    """
+
+    STOP = None
+    REPLAY = 'REPLAY'
+
+    def __init__(self, maxQueueSize: int = GC.PUNCH_QUEUE_SIZE, batchSize: int = GC.PUNCH_BATCH_SIZE, batchWindow: float = GC.PUNCH_BATCH_WINDOW):
+        """ Constructor to initialize a PunchWriter object
+
+        Args:
+            maxQueueSize (int): Punches that can wait to be written before submit() raises queue.Full
+            batchSize (int): Maximum punches per transaction
+            batchWindow (float): Seconds to wait for more punches after the first one of a batch arrives
+        """
+        self.punchQueue = queue.Queue(maxsize=maxQueueSize)
+        self.batchSize = batchSize
+        self.batchWindow = batchWindow
+        self.thread = threading.Thread(target=self.run, name='PunchWriter', daemon=True)
+
+
+    def start(self):
+        """ Start the writer thread
+        """
+        self.thread.start()
+
+
+    def stop(self):
+        """ Write every punch already queued, then stop the writer thread
+        """
+        self.punchQueue.put(PunchWriter.STOP)
+        self.thread.join()
+
+
+    def submit(self, direction: int, id: str) -> Future:
+        """ Queue a clock IN or clock OUT punch without blocking
+
+        Args:
+            direction (CONSTANT int): GC.CLOCK_IN or GC.CLOCK_OUT
+            id (str): Sanitized employee ID
+
+        Raises:
+            queue.Full: If GC.PUNCH_QUEUE_SIZE punches are already waiting
+
+        Returns:
+            Future: Resolves to the (englishError, spanishError) tuple from Database.insert_check_x_table() once committed
+        """
+        future = Future()
+        self.punchQueue.put_nowait((direction, id, future))
+
+        return future
+
+
+    def submit_replay(self, kioskId: str, punches: list) -> Future:
+        """ Queue a kiosk journal replay batch without blocking
+
+        Args:
+            kioskId (str): Kiosk ID from KioskJournal.parse_batch()
+            punches (list): Of (sequence, employeeId, direction, timestamp) tuples in sequence order
+
+        Raises:
+            queue.Full: If GC.PUNCH_QUEUE_SIZE punches and replays are already waiting
+
+        Returns:
+            Future: Resolves to the KioskJournal.replay() result dict once committed
+        """
+        future = Future()
+        self.punchQueue.put_nowait((PunchWriter.REPLAY, (kioskId, punches), future))
+
+        return future
+
+
+    def write_replay(self, db: Database, kioskId: str, punches: list, future: Future):
+        """ Apply one kiosk journal replay batch and resolve its future
+
+        Args:
+            db (Database): Database object owned by the writer thread
+            kioskId (str): Kiosk ID
+            punches (list): Of (sequence, employeeId, direction, timestamp) tuples
+            future (Future): Resolved with the replay result or its exception
+        """
+        try:
+            result = KioskJournal.replay(db, kioskId, punches)
+
+        except Exception as e:
+            db.conn.rollback()
+            future.set_exception(e)
+            return
+
+        future.set_result(result)
+
+
+    def next_batch(self) -> list:
+        """ Block for the first punch, then collect every punch that arrives within the batch window
+
+        Returns:
+            List: Of (direction, id, future) punches and (PunchWriter.REPLAY, (kioskId, punches), future) replays, ending with PunchWriter.STOP if stop() was called
+        """
+        batch = [self.punchQueue.get()]
+        deadline = monotonic() + self.batchWindow
+
+        while batch[-1] is not PunchWriter.STOP and len(batch) < self.batchSize:
+            remaining = deadline - monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self.punchQueue.get(timeout=remaining))
+                else:
+                    batch.append(self.punchQueue.get_nowait())
+
+            except queue.Empty:
+                break
+
+        return batch
+
+
+    def write_batch(self, db: Database, batch: list):
+        """ Insert a batch of punches in one transaction and resolve each punch future after the commit
+
+            If the group commit fails, every punch is retried in a transaction of its own, so one bad punch only fails its own kiosk
+
+        Args:
+            db (Database): Database object owned by the writer thread
+            batch (list): Of (direction, id, future) tuples
+        """
+        results = []
+        try:
+            for direction, id, future in batch:
+                if direction == GC.CLOCK_IN:
+                    results.append(db.insert_check_in_table(id, commit=False))
+                else:
+                    results.append(db.insert_check_out_table(id, commit=False))
+
+            db.commit_changes()
+
+        except Exception as e:
+            db.conn.rollback()
+            if len(batch) == 1:
+                batch[0][2].set_exception(e)
+            else:
+                for punch in batch:
+                    self.write_batch(db, [punch])
+
+            return
+
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+    def run(self):
+        """ Writer thread main loop, the Database connection is created on and only used by this thread
+        """
+        db = Database()
+
+        running = True
+        while running:
+            batch = self.next_batch()
+            if batch[-1] is PunchWriter.STOP:
+                batch.pop()
+                running = False
+
+            punches = [job for job in batch if job[0] != PunchWriter.REPLAY]
+            if len(punches) > 0:
+                self.write_batch(db, punches)
+
+            for _, (kioskId, replayPunches), future in (job for job in batch if job[0] == PunchWriter.REPLAY):
+                self.write_replay(db, kioskId, replayPunches, future)
+
+        db.close_database()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "Vectorized NumPy engine that builds LaborerTimeReport rows from batches of one PunchEventsAllView range query"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+
+# Standard Python libraries
+import sqlite3                                  # https://docs.python.org/3/library/sqlite3.html
+
+# External libraries
+import numpy as np                              # https://numpy.org/doc/stable/reference/index.html
+
+# Internal modules
+import GlobalConstants as GC
+import PunchEvents
+
+NO_PUNCH = np.iinfo(np.int64).max
+CHECK_X_REPORT_HEADER = ['Employee Name', 'Employee ID', 'Timestamp']
+DAY_ABBREVIATIONS = ['Sun', 'Mon', 'Tues', 'Wed', 'Thurs', 'Fri', 'Sat']
+LABOR_REPORT_HEADER = ['Employee Name', 'Employee ID', 'Total Hours', 'Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'CheckIn Comment', 'CheckOut Comment']
+
+# "Missed: " comment for every combination of missed days in a week, indexed by a 7 bit mask with Sunday as bit 0
+MISSED_COMMENTS = ['Missed: ' + ''.join(DAY_ABBREVIATIONS[i] + ' ' for i in range(7) if mask & (1 << i)) for mask in range(1 << 7)]
+
+PUNCH_COLUMNS = "employeeId, localDay, direction, epochLocal"
+
+
+def select_punches(conn: sqlite3.Connection, firstDay: int, lastDay: int, columns: str = PUNCH_COLUMNS) -> sqlite3.Cursor:
+    """ PunchEventsDayIndex and PunchEventsArchiveDayIndex range query of every punch between two days, in the order they were punched
+
+    Args:
+        conn (sqlite3.Connection): Open TimeReport.db connection
+        firstDay (int): First localDay to select
+        lastDay (int): Last localDay to select (inclusive)
+        columns (str): Comma separated PunchEventsAllView columns or expressions to select
+
+    Returns:
+        sqlite3.Cursor: Unfetched cursor, read it with fetchmany() to keep memory bounded
+    """
+    return conn.execute(f"SELECT {columns} FROM PunchEventsAllView WHERE localDay BETWEEN ? AND ? ORDER BY id", (firstDay, lastDay))
+
+
+def to_punch_array(rows: list) -> np.ndarray:
+    """ Convert fetched (employeeId, localDay, direction, epochLocal) rows to a NumPy array
+
+    Returns:
+        np.ndarray: int64 array with one row per punch
+    """
+    return np.array(rows, dtype=np.int64).reshape(-1, 4)
+
+
+class FirstPunchGrids:
+    """ First clock IN and first clock OUT epoch for every (employee, day) cell, filled one batch of punches at a time
+    """
+
+    def __init__(self, employeeIds: list, firstDay: int, numberOfDays: int):
+        """ Constructor to initialize empty grids
+
+        Args:
+            employeeIds (list): Sorted employee IDs, one grid row each, punches from other IDs are ignored
+            firstDay (int): localDay of grid column 0
+            numberOfDays (int): Number of grid columns
+        """
+        self.employeeIds = np.asarray(employeeIds, dtype=np.int64)
+        self.firstDay = firstDay
+        self.numberOfDays = numberOfDays
+        self.checkIn = np.full((len(employeeIds), numberOfDays), NO_PUNCH, dtype=np.int64)
+        self.checkOut = np.full((len(employeeIds), numberOfDays), NO_PUNCH, dtype=np.int64)
+
+
+    def add(self, punches: np.ndarray):
+        """ Fold a batch of punches into the grids with np.minimum.at
+
+        Args:
+            punches (np.ndarray): Output of to_punch_array()
+        """
+        if len(self.employeeIds) == 0 or len(punches) == 0:
+            return
+
+        rows = np.minimum(np.searchsorted(self.employeeIds, punches[:, 0]), len(self.employeeIds) - 1)
+        columns = punches[:, 1] - self.firstDay
+        known = (self.employeeIds[rows] == punches[:, 0]) & (columns >= 0) & (columns < self.numberOfDays)
+
+        for grid, direction in ((self.checkIn, GC.CLOCK_IN), (self.checkOut, GC.CLOCK_OUT)):
+            selected = known & (punches[:, 2] == direction)
+            np.minimum.at(grid, (rows[selected], columns[selected]), punches[selected, 3])
+
+
+    def calculate_hours(self) -> tuple:
+        """ Hours worked in every cell, using the same rules as calculate_time_delta()
+
+            0 hours if an employee forgets to both clock IN and clock OUT, 12 hours if only one of the two actions was performed,
+            otherwise the time between the first clock IN and first clock OUT wrapped into [0, 1 day)
+
+        Returns:
+            Tuple (hours, clockedIn, clockedOut): (len(employeeIds), numberOfDays) float64 and bool grids
+        """
+        clockedIn = self.checkIn != NO_PUNCH
+        clockedOut = self.checkOut != NO_PUNCH
+
+        elaspedSeconds = np.where(clockedIn & clockedOut, self.checkOut - self.checkIn, 0) % PunchEvents.SECONDS_PER_DAY
+        hours = np.where(clockedIn & clockedOut, elaspedSeconds / 3600.0, np.where(clockedIn | clockedOut, 12.0, 0.0))
+
+        return hours, clockedIn, clockedOut
+
+
+def calculate_hours(conn: sqlite3.Connection, employeeIds: list, firstDay: int, numberOfDays: int, batchSize: int = GC.EXPORT_BATCH_SIZE) -> tuple:
+    """ Hours worked by every employee on every day of a range
+
+    Args:
+        conn (sqlite3.Connection): Open TimeReport.db connection
+        employeeIds (list): Sorted employee IDs
+        firstDay (int): First localDay of the range
+        numberOfDays (int): Number of days in the range
+        batchSize (int): Punches fetched from SQLite per NumPy batch
+
+    Returns:
+        Tuple (hours, clockedIn, clockedOut): (len(employeeIds), numberOfDays) float64 and bool grids
+    """
+    grids = FirstPunchGrids(employeeIds, firstDay, numberOfDays)
+    cursor = select_punches(conn, firstDay, firstDay + numberOfDays - 1)
+    rows = cursor.fetchmany(batchSize)
+    while len(rows) > 0:
+        grids.add(to_punch_array(rows))
+        rows = cursor.fetchmany(batchSize)
+
+    return grids.calculate_hours()
+
+
+def labor_report_rows_from_hours(employees: dict, hours: np.ndarray, clockedIn: np.ndarray, clockedOut: np.ndarray) -> list:
+    """ Build one LaborerTimeReport.csv row per employee from 7 day (Sunday to Saturday) grids
+
+    Args:
+        employees (dict): Employee ID keys with (firstName, lastName) values
+        hours (np.ndarray): Output of FirstPunchGrids.calculate_hours() with rows in sorted employee ID order
+        clockedIn (np.ndarray): Output of FirstPunchGrids.calculate_hours()
+        clockedOut (np.ndarray): Output of FirstPunchGrids.calculate_hours()
+
+    Returns:
+        List: Of rows matching LABOR_REPORT_HEADER, ordered by employee ID
+    """
+    employeeIds = sorted(employees)
+
+    dailyHours = np.round(hours, 4)
+    totalHours = dailyHours.sum(axis=1)
+    dayBits = 1 << np.arange(7)
+    missedIn = (~clockedIn).astype(np.int64) @ dayBits
+    missedOut = (~clockedOut).astype(np.int64) @ dayBits
+
+    rows = []
+    for id, daily, total, inMask, outMask in zip(employeeIds, dailyHours.tolist(), np.round(totalHours, 2).tolist(), missedIn.tolist(), missedOut.tolist()):
+        name = employees[id][0] + " " + employees[id][1]
+        if total == 0:
+            rows.append([name, id, total] + daily + ['Missed: All Days', 'Missed: All Days'])
+        else:
+            rows.append([name, id, total] + daily + [MISSED_COMMENTS[inMask], MISSED_COMMENTS[outMask]])
+
+    return rows
+
+
+def labor_report_rows(conn: sqlite3.Connection, employees: dict, firstDay: int) -> list:
+    """ Build one LaborerTimeReport.csv row per employee for the 7 day week starting on a Sunday
+
+    Args:
+        conn (sqlite3.Connection): Open TimeReport.db connection
+        employees (dict): Employee ID keys with (firstName, lastName) values
+        firstDay (int): localDay of the Sunday starting the week
+
+    Returns:
+        List: Of rows matching LABOR_REPORT_HEADER, ordered by employee ID
+    """
+    hours, clockedIn, clockedOut = calculate_hours(conn, sorted(employees), firstDay, 7)
+
+    return labor_report_rows_from_hours(employees, hours, clockedIn, clockedOut)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "Atomic, fsync safe .csv report files and the per week manifest that lists their row counts and checksums"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+
+# Standard Python libraries
+import csv                                      # https://docs.python.org/3/library/csv.html
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+# POSIX only advisory file locks, Windows kiosks publish from a single process
+try:
+    import fcntl                                # https://docs.python.org/3/library/fcntl.html
+except ImportError:
+    fcntl = None
+
+# Internal modules
+import GlobalConstants as GC
+import LocalClock
+
+MANIFEST_SUFFIX = '_Manifest.json'
+MANIFEST_LOCK_SUFFIX = '.lock'
+REPORT_FILE_MODE = 0o644              # tempfile.mkstemp() creates owner only files, reports are read by Syncthing and Email
+
+
+def fsync_directory(directory: str):
+    """ Flush a directory entry to disk, so a file renamed into it survives a power cut
+
+    Args:
+        directory (str): Directory that was renamed into, a no-op on platforms that can not open directories (Windows)
+    """
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+
+    finally:
+        os.close(fd)
+
+
+def write_atomically(path: str, data: bytes):
+    """ Replace a small file in one step, readers see either the old or the new contents and never a partial file
+
+    Args:
+        path (str): File to create or replace
+        data (bytes): New contents
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporaryPath = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.chmod(temporaryPath, REPORT_FILE_MODE)
+        os.replace(temporaryPath, path)
+
+    except BaseException:
+        os.unlink(temporaryPath)
+        raise
+
+    fsync_directory(directory)
+
+
+class ReportFile:
+    """ .csv writer that builds the report in a hidden temporary file next to its destination
+
+        On a clean exit from the with block the file is flushed, fsync'd and os.replace()'d over the destination,
+        on an exception it is deleted, so Syncthing and Email only ever see complete reports and a rerun replaces the
+        previous file instead of appending to it
+    """
+
+    def __init__(self, path: str, header: list):
+        """ Constructor to initialize a ReportFile object, nothing is created on disk until the with block is entered
+
+        Args:
+            path (str): Destination .csv file
+            header (list): Column names written as the first row, not counted in rows
+        """
+        self.path = path
+        self.header = header
+        self.rows = 0
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.file = None
+        self.temporaryPath = None
+        self.writer = None
+
+
+    def __enter__(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, self.temporaryPath = tempfile.mkstemp(prefix='.' + os.path.basename(self.path) + '.', suffix='.tmp', dir=directory)
+        self.file = os.fdopen(fd, 'wb', buffering=GC.EXPORT_BUFFER_SIZE)
+
+        # csv.writer() calls self.write() once per row, so the checksum is computed in the same pass as the file is written
+        self.writer = csv.writer(self)
+        self.writer.writerow(self.header)
+
+        return self
+
+
+    def __exit__(self, exceptionType, exceptionValue, exceptionTraceback):
+        if exceptionType is not None:
+            self.file.close()
+            os.unlink(self.temporaryPath)
+            return False
+
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.chmod(self.temporaryPath, REPORT_FILE_MODE)
+        os.replace(self.temporaryPath, self.path)
+        fsync_directory(os.path.dirname(os.path.abspath(self.path)))
+
+        return False
+
+
+    def write(self, text: str):
+        """ File like write() used by csv.writer(), not called directly
+        """
+        data = text.encode('utf-8')
+        self.digest.update(data)
+        self.size += len(data)
+        self.file.write(data)
+
+
+    def writerow(self, row):
+        """ Write one data row
+
+        Args:
+            row (iterable): Cell values
+        """
+        self.writer.writerow(row)
+        self.rows += 1
+
+
+    def writerows(self, rows):
+        """ Write many data rows
+
+        Args:
+            rows (iterable): Of iterables of cell values
+        """
+        for row in rows:
+            self.writer.writerow(row)
+            self.rows += 1
+
+
+    def manifest_entry(self) -> dict:
+        """ Row count, size and SHA-256 checksum of the published file
+
+        Returns:
+            Dict: With "rows", "bytes" and "sha256" keys
+        """
+        return {"rows": self.rows, "bytes": self.size, "sha256": self.digest.hexdigest()}
+
+
+def manifest_path(filenamePrefix: str) -> str:
+    """ Manifest file shared by every report of one work week
+
+    Args:
+        filenamePrefix (str): Directory and week part of the report filenames (e.g. "TimeCardReports/2023-08-20_2023-08-26")
+
+    Returns:
+        str: Path of the .json manifest
+    """
+    return filenamePrefix + MANIFEST_SUFFIX
+
+
+@contextmanager
+def manifest_lock(path: str):
+    """ Hold an exclusive lock on a manifest's sidecar .lock file, so concurrent publishers never drop each other's entries
+
+    Args:
+        path (str): Path of the manifest
+    """
+    with open(path + MANIFEST_LOCK_SUFFIX, 'a') as lockFile:
+        if fcntl is not None:
+            fcntl.flock(lockFile.fileno(), fcntl.LOCK_EX)
+
+        try:
+            yield
+
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lockFile.fileno(), fcntl.LOCK_UN)
+
+
+def publish_manifest(filenamePrefix: str, reportFiles: list) -> str:
+    """ Record the row count and checksum of freshly published reports in their week's manifest
+
+        Entries for other files already in the manifest are kept, so weekly_reports() and Database.export_table_to_csv()
+        can both publish into the same week, and the manifest is replaced atomically after the reports it describes.
+        The read, merge, and write run under manifest_lock(), so two processes publishing at once keep both sets of entries
+
+    Args:
+        filenamePrefix (str): Directory and week part of the report filenames
+        reportFiles (list): ReportFile objects whose with blocks have exited cleanly
+
+    Returns:
+        str: Path of the manifest
+    """
+    path = manifest_path(filenamePrefix)
+    with manifest_lock(path):
+        manifest = {"files": {}}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                manifest = json.load(file)
+
+        for reportFile in reportFiles:
+            manifest["files"][os.path.basename(reportFile.path)] = reportFile.manifest_entry()
+
+        manifest["generated"] = LocalClock.now().isoformat(timespec='seconds')
+        write_atomically(path, (json.dumps(manifest, indent=4, sort_keys=True) + '\n').encode('utf-8'))
+
+    return path
+
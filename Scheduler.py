@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "Single background thread that runs periodic report jobs with jitter and at most once per window"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+# pylint: disable=broad-exception-caught
+
+# Standard Python libraries
+import heapq                                    # https://docs.python.org/3/library/heapq.html
+import itertools
+import random
+import threading
+import traceback
+from time import time
+
+# Internal modules
+import GlobalConstants as GC
+
+
+class ScheduledJob:
+    """ A function, how often to check it, and the window it last ran in
+    """
+
+    def __init__(self, function, interval: float, jitter: float = 0.0, windowKey=None, name: str = None):
+        """ Constructor to initialize a ScheduledJob object
+
+        Args:
+            function (callable): Function taking no arguments, run on the Scheduler thread
+            interval (float): Seconds between checks
+            jitter (float): Maximum random seconds added to every check, so jobs on many servers do not fire together
+            windowKey (callable): Maps time() to a window, the job runs at most once per window, defaults to interval sized windows
+            name (str): Name used in log messages, defaults to the function name
+        """
+        self.function = function
+        self.interval = interval
+        self.jitter = jitter
+        self.windowKey = windowKey if windowKey is not None else lambda now: int(now // interval)
+        self.name = name if name is not None else function.__name__
+        self.lastWindow = None
+
+
+    def next_run_time(self, now: float) -> float:
+        """ Start of the next interval sized window plus a random jitter
+
+        Args:
+            now (float): Seconds since 1970-01-01 (time.time())
+
+        Returns:
+            float: time() to check the job again
+        """
+        return (now // self.interval + 1) * self.interval + random.uniform(0, self.jitter)
+
+
+    def run_if_due(self, now: float) -> bool:
+        """ Run the job unless it already ran in the current window, an exception is logged and the window is still marked as run
+
+        Args:
+            now (float): Seconds since 1970-01-01 (time.time())
+
+        Returns:
+            bool: True if the function was called
+        """
+        window = self.windowKey(now)
+        if window == self.lastWindow:
+            return False
+
+        self.lastWindow = window
+        try:
+            self.function()
+
+        except Exception:
+            print(f'Scheduled job {self.name} failed:\n{traceback.format_exc()}')
+
+        return True
+
+
+class Scheduler:
+    """ Run every periodic job on one daemon thread, so report generation never competes with the NiceGUI event loop
+    """
+
+    def __init__(self, name: str = 'Scheduler'):
+        """ Constructor to initialize a Scheduler object with no jobs
+
+        Args:
+            name (str): Thread name
+        """
+        self.jobs = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+
+
+    def add_job(self, function, interval: float, jitter: float = GC.SCHEDULER_JITTER, windowKey=None, name: str = None) -> ScheduledJob:
+        """ Schedule a function, it is first checked within jitter seconds of start()
+
+        Args:
+            function (callable): Function taking no arguments
+            interval (float): Seconds between checks
+            jitter (float): Maximum random seconds added to every check
+            windowKey (callable): Maps time() to a window, the job runs at most once per window
+            name (str): Name used in log messages
+
+        Returns:
+            ScheduledJob: The scheduled job
+        """
+        job = ScheduledJob(function, interval, jitter, windowKey, name)
+        with self.condition:
+            heapq.heappush(self.jobs, (time() + random.uniform(0, jitter), next(self.sequence), job))
+            self.condition.notify()
+
+        return job
+
+
+    def start(self):
+        """ Start the scheduler thread
+        """
+        self.running = True
+        self.thread.start()
+
+
+    def stop(self):
+        """ Stop the scheduler thread after the job running now (if any) returns
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+        self.thread.join()
+
+
+    def run(self):
+        """ Scheduler thread main loop, sleeps until the earliest check is due
+        """
+        while True:
+            with self.condition:
+                while self.running and (len(self.jobs) == 0 or self.jobs[0][0] > time()):
+                    self.condition.wait(None if len(self.jobs) == 0 else self.jobs[0][0] - time())
+
+                if not self.running:
+                    return
+
+                _, _, job = heapq.heappop(self.jobs)
+
+            now = time()
+            job.run_if_due(now)
+
+            with self.condition:
+                heapq.heappush(self.jobs, (job.next_run_time(now), next(self.sequence), job))
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "Shared unittest fixture, a fresh TimeReport.db in a temporary directory read on a fixed LocalClock"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+
+# Standard Python libraries
+import os
+import tempfile
+import unittest                                 # https://docs.python.org/3/library/unittest.html
+from datetime import datetime, timezone
+
+# Internal modules
+import ConnectionPool
+import LocalClock
+from Database import Database, employeeDirectory
+from EventLog import eventLog
+
+
+class TimeReportTestCase(unittest.TestCase):
+    """ Base class for tests that need a TimeReport.db with the default UsersTable
+
+        self.now is the UTC instant LocalClock returns, assign to it to move the clock during a test
+    """
+
+    # Wednesday 1 PM in Marianna, FL
+    NOW = datetime(2023, 10, 25, 18, 0, tzinfo=timezone.utc)
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.now = self.NOW
+        LocalClock.set_clock(lambda: self.now)
+        ConnectionPool.configure(self.path('TimeReport.db'))
+        employeeDirectory.invalidate()
+
+        self.db = Database()
+        self.db.setup_users()
+
+
+    def tearDown(self):
+        # Rejected punches and failures are logged, write them before the database is deleted
+        eventLog.flush()
+        self.db.close_database()
+        ConnectionPool.get_pool().close()
+        employeeDirectory.invalidate()
+        LocalClock.set_clock()
+        self.directory.cleanup()
+
+
+    def path(self, filename: str) -> str:
+        """ Path of a file inside the temporary directory
+        """
+        return os.path.join(self.directory.name, filename)
+
+
+    def query(self, sql: str, parameters: tuple = ()) -> list:
+        """ All rows of a SELECT on the test database
+        """
+        return self.db.cursor.execute(sql, parameters).fetchall()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "Kiosk clock IN / OUT duplicate check, one clock IN and one clock OUT per employee ID per Marianna, FL day"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+
+# Standard Python libraries
+import os
+import time
+import unittest                                 # https://docs.python.org/3/library/unittest.html
+from datetime import datetime, timedelta, timezone
+
+# Internal modules
+import PunchEvents
+from Tests.TimeReportTestCase import TimeReportTestCase
+
+
+class DuplicatePunchTest(TimeReportTestCase):
+    """ insert_check_in_table() and insert_check_out_table() only reject a second punch of the same employee ID on the same day
+    """
+
+    def test_second_clock_in_same_day_is_rejected(self):
+        self.assertEqual(self.db.insert_check_in_table(1000), ('', ''))
+
+        self.now += timedelta(hours=2)
+        self.assertEqual(self.db.insert_check_in_table(1000), ('Erick Maldonado you already clocked in today', 'Erick Maldonado ya has fichado hoy'))
+        self.assertEqual(len(self.db.search_check_in_table(1000, self.db.get_date_time())), 1)
+
+
+    def test_other_employee_same_day_is_inserted(self):
+        self.assertEqual(self.db.insert_check_in_table(1000), ('', ''))
+        self.assertEqual(self.db.insert_check_in_table(1001), ('', ''))
+
+        today = self.db.get_date_time()
+        self.assertEqual(len(self.db.search_check_in_table(1000, today)), 1)
+        self.assertEqual(len(self.db.search_check_in_table(1001, today)), 1)
+
+
+    def test_same_employee_next_day_is_inserted(self):
+        self.assertEqual(self.db.insert_check_in_table(1000), ('', ''))
+        firstDay = self.db.get_date_time()
+
+        self.now += timedelta(days=1)
+        self.assertEqual(self.db.insert_check_in_table(1000), ('', ''))
+        self.assertEqual(len(self.db.search_check_in_table(1000, firstDay)), 1)
+        self.assertEqual(len(self.db.search_check_in_table(1000, self.db.get_date_time())), 1)
+
+
+    def test_day_follows_marianna_midnight(self):
+        # 04:30 UTC on Thursday is still 11:30 PM Wednesday in Marianna, FL
+        self.now = self.NOW.replace(hour=4, minute=30) + timedelta(days=1)
+        self.assertEqual(self.db.insert_check_in_table(1000), ('', ''))
+
+        self.now = self.NOW
+        self.assertEqual(self.db.insert_check_in_table(1000)[0], 'Erick Maldonado you already clocked in today')
+
+
+    def test_clock_out_is_checked_separately(self):
+        self.assertEqual(self.db.insert_check_in_table(1000), ('', ''))
+        self.assertEqual(self.db.insert_check_out_table(1000), ('', ''))
+
+        self.now += timedelta(hours=1)
+        self.assertEqual(self.db.insert_check_out_table(1000), ('Erick Maldonado  you already clocked out today', 'Erick Maldonado  ya saliste hoy'))
+        self.assertEqual(len(self.db.search_check_out_table(1000, self.db.get_date_time())), 1)
+
+
+class ToEpochTest(unittest.TestCase):
+    """ PunchEvents.to_epoch() reads naive timestamps as Marianna, FL wall clock time whatever the server timezone is
+    """
+
+    def setUp(self):
+        self.serverTimeZone = os.environ.get('TZ')
+        os.environ['TZ'] = 'Asia/Tokyo'
+        time.tzset()
+
+
+    def tearDown(self):
+        if self.serverTimeZone is None:
+            del os.environ['TZ']
+        else:
+            os.environ['TZ'] = self.serverTimeZone
+        time.tzset()
+
+
+    def test_naive_timestamp_is_wall_clock_time(self):
+        wallClock = int(datetime(2023, 10, 16, 7, 0, tzinfo=timezone.utc).timestamp())
+
+        self.assertEqual(PunchEvents.to_epoch('2023-10-16T07:00'), wallClock)
+        self.assertEqual(PunchEvents.to_epoch('2023-10-16T07:00+00:00'), wallClock)
+
+
+    def test_other_offset_is_converted_to_marianna(self):
+        # 07:00 in Marianna, FL is 12:00 UTC during daylight saving time
+        self.assertEqual(PunchEvents.to_epoch('2023-10-16T08:00-04:00'), PunchEvents.to_epoch('2023-10-16T07:00'))
+
+
+if __name__ == "__main__":
+    unittest.main()
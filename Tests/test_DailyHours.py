@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "DailyHoursTable rows kept up to date on every punch follow the 0 hour, 12 hour and night shift rules of a full rebuild"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+
+# Standard Python libraries
+import unittest                                 # https://docs.python.org/3/library/unittest.html
+from datetime import datetime
+
+# Internal modules
+import GlobalConstants as GC
+import PunchEvents
+from Tests.TimeReportTestCase import TimeReportTestCase
+
+MONDAY = datetime(2023, 10, 23)
+TUESDAY = datetime(2023, 10, 24)
+
+
+class DailyHoursTest(TimeReportTestCase):
+    """ insert_punch_events_table() against search_daily_hours_table() and build_daily_hours()
+    """
+
+    def punch(self, id: int, direction: int, isoString: str):
+        self.db.insert_punch_events_table(id, direction, isoString)
+        self.db.commit_changes()
+
+
+    def test_clock_in_and_clock_out(self):
+        self.punch(1000, GC.CLOCK_IN, '2023-10-23T07:00+00:00')
+        self.punch(1000, GC.CLOCK_OUT, '2023-10-23T15:30+00:00')
+
+        self.assertEqual(self.db.search_daily_hours_table(1000, MONDAY), (8.5, True, True))
+
+
+    def test_single_punch_counts_12_hours(self):
+        self.punch(1000, GC.CLOCK_IN, '2023-10-23T07:00+00:00')
+        self.punch(1001, GC.CLOCK_OUT, '2023-10-23T17:00+00:00')
+
+        self.assertEqual(self.db.search_daily_hours_table(1000, MONDAY), (12.0, True, False))
+        self.assertEqual(self.db.search_daily_hours_table(1001, MONDAY), (12.0, False, True))
+
+
+    def test_no_punch_counts_0_hours(self):
+        self.punch(1000, GC.CLOCK_IN, '2023-10-23T07:00+00:00')
+
+        self.assertEqual(self.db.search_daily_hours_table(1000, TUESDAY), (0.0, False, False))
+        self.assertEqual(self.query("SELECT COUNT(*) FROM DailyHoursTable WHERE employeeId = 1000"), [(1,)])
+
+
+    def test_night_shift_wraps_around_midnight(self):
+        # Both punches are filed under the day they happened, the clock OUT before the clock IN
+        self.punch(1003, GC.CLOCK_OUT, '2023-10-23T06:00+00:00')
+        self.punch(1003, GC.CLOCK_IN, '2023-10-23T22:00+00:00')
+
+        self.assertEqual(self.db.search_daily_hours_table(1003, MONDAY), (8.0, True, True))
+
+
+    def test_first_punch_of_the_day_wins(self):
+        self.punch(1000, GC.CLOCK_IN, '2023-10-23T07:00+00:00')
+        self.punch(1000, GC.CLOCK_OUT, '2023-10-23T15:00+00:00')
+        self.punch(1000, GC.CLOCK_IN, '2023-10-23T09:00+00:00')
+        self.punch(1000, GC.CLOCK_OUT, '2023-10-23T17:00+00:00')
+
+        self.assertEqual(self.db.search_daily_hours_table(1000, MONDAY), (8.0, True, True))
+
+
+    def test_incremental_rows_match_full_rebuild(self):
+        self.punch(1000, GC.CLOCK_IN, '2023-10-23T07:00+00:00')
+        self.punch(1000, GC.CLOCK_OUT, '2023-10-23T15:30+00:00')
+        self.punch(1000, GC.CLOCK_IN, '2023-10-24T07:15+00:00')
+        self.punch(1001, GC.CLOCK_OUT, '2023-10-24T16:45+00:00')
+        self.punch(1003, GC.CLOCK_IN, '2023-10-24T22:00+00:00')
+        self.punch(1003, GC.CLOCK_OUT, '2023-10-24T06:00+00:00')
+        incremental = self.query("SELECT * FROM DailyHoursTable ORDER BY employeeId, localDay")
+
+        self.db.cursor.execute("DELETE FROM DailyHoursTable")
+        PunchEvents.set_state(self.db.cursor, 'DailyHoursBuilt', 0)
+        self.assertTrue(PunchEvents.build_daily_hours(self.db.conn))
+
+        self.assertEqual(self.query("SELECT * FROM DailyHoursTable ORDER BY employeeId, localDay"), incremental)
+        self.assertEqual(len(incremental), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "A full backup followed by its incremental backups restores the exact TimeReport.db that was shipped last"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+
+# Standard Python libraries
+import os
+import shutil
+import sqlite3                                  # https://docs.python.org/3/library/sqlite3.html
+import unittest                                 # https://docs.python.org/3/library/unittest.html
+
+# Internal modules
+import DatabaseBackup
+from Tests.TimeReportTestCase import TimeReportTestCase
+
+
+class CopyingMailer:
+    """ Stand-in for Email that keeps a copy of every attachment, ship_backup() deletes its own once sent
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.sent = []
+        self.failNextSend = False
+
+
+    def send_email(self, senderEmail: str, receiverEmail: str, subject: str, body: str, attachments: list):
+        if self.failNextSend:
+            self.failNextSend = False
+            raise OSError('Mail server unavailable')
+
+        for attachment in attachments:
+            self.sent.append(shutil.copy(attachment, self.directory))
+
+
+class DatabaseBackupTest(TimeReportTestCase):
+    """ ship_backup() and restore() round trip
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.backupDirectory = self.path('Backups')
+        os.makedirs(self.path('Mailbox'))
+        self.mailer = CopyingMailer(self.path('Mailbox'))
+
+
+    def ship(self) -> str:
+        return DatabaseBackup.ship_backup(self.mailer, 'sender@mfc.us', 'receiver@mfc.us', self.backupDirectory)
+
+
+    def punch(self, punches: list):
+        self.db.import_punches(punches)
+
+
+    def assert_restores_live_database(self, backupPaths: list):
+        restoredPath = self.path('Restored.db')
+        if os.path.exists(restoredPath):
+            os.unlink(restoredPath)
+
+        DatabaseBackup.restore(backupPaths, restoredPath)
+        with sqlite3.connect(restoredPath) as restored:
+            self.assertEqual(restored.execute("PRAGMA integrity_check").fetchone(), ('ok',))
+            for table in ('UsersTable', 'PunchEventsAllView', 'DailyHoursTable', 'WeeklyReportTable'):
+                self.assertEqual(restored.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall(), self.query(f"SELECT * FROM {table} ORDER BY 1, 2"))
+        restored.close()
+
+
+    def test_full_and_incremental_round_trip(self):
+        self.punch([(1000, 'IN', '2023-10-23T07:00'), (1001, 'IN', '2023-10-23T07:05')])
+        self.assertEqual(self.ship(), 'TimeReport-000001.db.gz')
+
+        self.punch([(1000, 'OUT', '2023-10-23T15:30'), (1001, 'OUT', '2023-10-23T15:35')])
+        self.assertEqual(self.ship(), 'TimeReport-000002.delta.gz')
+
+        self.punch([(1002, 'IN', '2023-10-24T06:45')])
+        self.assertEqual(self.ship(), 'TimeReport-000003.delta.gz')
+
+        self.assert_restores_live_database(self.mailer.sent)
+
+
+    def test_failed_send_is_retried_from_the_same_base(self):
+        self.ship()
+        self.punch([(1000, 'IN', '2023-10-23T07:00')])
+
+        self.mailer.failNextSend = True
+        with self.assertRaises(OSError):
+            self.ship()
+
+        self.assertEqual(DatabaseBackup.read_state(self.backupDirectory)["sequence"], 1)
+        self.assertEqual(self.ship(), 'TimeReport-000002.delta.gz')
+        self.assert_restores_live_database(self.mailer.sent)
+
+
+    def test_delta_out_of_order_is_rejected(self):
+        self.ship()
+        self.punch([(1000, 'IN', '2023-10-23T07:00')])
+        self.ship()
+        self.punch([(1000, 'OUT', '2023-10-23T15:30')])
+        self.ship()
+
+        with self.assertRaises(ValueError):
+            DatabaseBackup.restore([self.mailer.sent[0], self.mailer.sent[2]], self.path('Restored.db'))
+
+
+if __name__ == "__main__":
+    unittest.main()
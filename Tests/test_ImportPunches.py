@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "import_punches() de-duplicates with the kiosk rule, reports invalid punches, and keeps closed week reports current"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+
+# Standard Python libraries
+import unittest                                 # https://docs.python.org/3/library/unittest.html
+from datetime import date
+
+# Internal modules
+import GlobalConstants as GC
+import PunchEvents
+from Tests.TimeReportTestCase import TimeReportTestCase
+
+LAST_WEEK_ID = PunchEvents.to_local_day(date(2023, 10, 15))
+
+
+class ImportPunchesTest(TimeReportTestCase):
+    """ import_punches() and import_punches_csv() against a fresh TimeReport.db
+    """
+
+    def punches(self) -> list:
+        return self.query(f"SELECT employeeId, direction, {PunchEvents.ISO_TIMESTAMP_SQL} FROM PunchEventsAllView ORDER BY employeeId, epochLocal")
+
+
+    def test_first_punch_of_the_day_wins(self):
+        # Out of order on purpose, the 07:00 clock IN is the first of the day even though it is listed second
+        inserted = self.db.import_punches([(1000, 'IN', '2023-10-23T08:00'), (1000, 'IN', '2023-10-23T07:00'), (1000, 'OUT', '2023-10-23T15:30'), (1001, 'in', '2023-10-23T07:00')])
+
+        self.assertEqual(inserted, (3, 1, []))
+        self.assertEqual(self.punches(), [(1000, GC.CLOCK_IN, '2023-10-23T07:00+00:00'), (1000, GC.CLOCK_OUT, '2023-10-23T15:30+00:00'), (1001, GC.CLOCK_IN, '2023-10-23T07:00+00:00')])
+
+
+    def test_reimport_only_counts_duplicates(self):
+        punches = [(1000, 'IN', '2023-10-23T07:00'), (1000, 'OUT', '2023-10-23T15:30')]
+        self.assertEqual(self.db.import_punches(punches), (2, 0, []))
+        self.assertEqual(self.db.import_punches(punches), (0, 2, []))
+
+        # A kiosk punch already stored that day is a duplicate too
+        self.now = self.NOW.replace(hour=12)
+        self.assertEqual(self.db.insert_check_in_table(1002), ('', ''))
+        self.assertEqual(self.db.import_punches([(1002, GC.CLOCK_IN, '2023-10-25T06:00')]), (0, 1, []))
+        self.assertEqual(len(self.punches()), 3)
+
+
+    def test_invalid_punches_are_reported_by_number(self):
+        inserted, duplicates, errors = self.db.import_punches([(1000, 'IN', '2023-10-23T07:00'), ('abc', 'IN', '2023-10-23T07:00'), (9999, 'IN', '2023-10-23T07:00'),
+                                                               (1001, 'LUNCH', '2023-10-23T07:00'), (1001, 'IN', 'yesterday'), (1001, 'IN', '2023-10-26T07:00'), (1001, 'IN')])
+
+        self.assertEqual((inserted, duplicates), (1, 0))
+        self.assertEqual([punchNumber for punchNumber, _ in errors], [2, 3, 4, 5, 6, 7])
+        self.assertIn('in the future', errors[4][1])
+
+
+    def test_max_age_rejects_old_punches(self):
+        # TimeReportTestCase.NOW is 2023-10-25T13:00 in Marianna, FL
+        inserted, duplicates, errors = self.db.import_punches([(1000, 'IN', '2023-10-22T12:00'), (1001, 'IN', '2023-10-22T14:00')], maxAge=72 * GC.ONE_HOUR)
+
+        self.assertEqual((inserted, duplicates), (1, 0))
+        self.assertEqual(errors, [(1, 'Timestamp 2023-10-22T12:00+00:00 is older than 2023-10-22T13:00+00:00')])
+        self.assertEqual(self.db.import_punches([(1000, 'IN', '2023-10-22T12:00')]), (1, 0, []))
+
+
+    def test_closed_week_history_is_recomputed(self):
+        self.db.rollover_weekly_report_table(LAST_WEEK_ID)
+        self.db.import_punches([(1000, 'IN', '2023-10-16T07:00')])
+        self.db.rollover_weekly_report_table()
+        self.assertEqual(self.query("SELECT totalHours, day0 FROM WeeklyReportHistoryTable WHERE weekId = ? AND employeeId = 1000", (LAST_WEEK_ID,)), [(12.0, 12.0)])
+
+        # The paper time card with the missing clock OUT arrives after the rollover
+        self.assertEqual(self.db.import_punches([(1000, 'OUT', '2023-10-16T15:30')]), (1, 0, []))
+        self.assertEqual(self.query("SELECT totalHours, day0, outComments FROM WeeklyReportHistoryTable WHERE weekId = ? AND employeeId = 1000", (LAST_WEEK_ID,)),
+                         [(8.5, 8.5, 'Missed: Sun Tues Wed Thurs Fri Sat ')])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM PunchEventsTable"), [(0,)])
+
+
+    def test_csv_with_header_row(self):
+        csvPath = self.path('Punches.csv')
+        with open(csvPath, 'w', encoding='utf-8') as file:
+            file.write('Employee ID,Direction,Timestamp\n1000,IN,2023-10-23T07:00\n\n1000,OUT,2023-10-23T15:30\n1000,OUT,2023-10-23T16:00\n')
+
+        self.assertEqual(self.db.import_punches_csv(csvPath), (2, 1, []))
+
+
+if __name__ == "__main__":
+    unittest.main()
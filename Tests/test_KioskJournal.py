@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "KioskJournal.replay() applies every journaled punch exactly once, however often and in whatever batches a kiosk resends it"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+
+# Standard Python libraries
+import os
+import unittest                                 # https://docs.python.org/3/library/unittest.html
+
+# Internal modules
+import GlobalConstants as GC
+import KioskJournal
+from PunchWriter import PunchWriter
+from Tests.TimeReportTestCase import TimeReportTestCase
+
+BATCH = [(1, 1000, 0, '2023-10-24T07:00+00:00'), (2, 1000, 1, '2023-10-24T15:30+00:00'), (3, 1001, 'IN', '2023-10-25T06:45+00:00')]
+
+
+class KioskJournalReplayTest(TimeReportTestCase):
+    """ replay() against a fresh TimeReport.db
+    """
+
+    def punch_count(self) -> int:
+        return self.query("SELECT COUNT(*) FROM PunchEventsAllView")[0][0]
+
+
+    def last_sequence(self, kioskId: str) -> int:
+        return self.query("SELECT lastSequence FROM KioskJournalTable WHERE kioskId = ?", (kioskId,))[0][0]
+
+
+    def test_resent_batch_is_skipped(self):
+        self.assertEqual(KioskJournal.replay(self.db, 'kiosk', BATCH), {"acknowledged": 3, "inserted": 3, "duplicates": 0, "rejected": 0})
+        self.assertEqual(KioskJournal.replay(self.db, 'kiosk', BATCH), {"acknowledged": 3, "inserted": 0, "duplicates": 0, "rejected": 0})
+
+        self.assertEqual(self.punch_count(), 3)
+        self.assertEqual(self.last_sequence('kiosk'), 3)
+        self.assertFalse(self.db.conn.in_transaction)
+
+
+    def test_older_batch_never_moves_the_high_water_mark_back(self):
+        KioskJournal.replay(self.db, 'kiosk', BATCH)
+        self.assertEqual(KioskJournal.replay(self.db, 'kiosk', BATCH[:1]), {"acknowledged": 3, "inserted": 0, "duplicates": 0, "rejected": 0})
+
+        self.assertEqual(self.last_sequence('kiosk'), 3)
+
+
+    def test_punch_already_sent_online_is_a_duplicate(self):
+        self.db.insert_check_in_table('1001')
+        self.assertEqual(KioskJournal.replay(self.db, 'kiosk', BATCH[2:]), {"acknowledged": 3, "inserted": 0, "duplicates": 1, "rejected": 0})
+
+        self.assertEqual(self.punch_count(), 1)
+
+
+    def test_other_kiosks_keep_their_own_sequence(self):
+        KioskJournal.replay(self.db, 'kiosk', BATCH[:2])
+        self.assertEqual(KioskJournal.replay(self.db, 'other', [(1,) + BATCH[2][1:]]), {"acknowledged": 1, "inserted": 1, "duplicates": 0, "rejected": 0})
+
+        self.assertEqual(self.punch_count(), 3)
+
+
+    def test_invalid_and_stale_punches_are_acknowledged(self):
+        batch = [(1, 9999, 'IN', '2023-10-24T07:00+00:00'), (2, 1000, 'IN', '2023-10-01T07:00+00:00'), (3, 1000, 'IN', '2023-10-24T07:00+00:00')]
+        self.assertEqual(KioskJournal.replay(self.db, 'kiosk', batch), {"acknowledged": 3, "inserted": 1, "duplicates": 0, "rejected": 2})
+
+        self.assertEqual(self.punch_count(), 1)
+
+
+class KioskProvisioningTest(TimeReportTestCase):
+    """ issue_kiosk() only hands out tokens to pages opened with $TIMETRACKER_KIOSK_PROVISIONING_KEY
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(setattr, KioskJournal, 'serverSecret', None)
+        self.addCleanup(os.environ.pop, KioskJournal.PROVISIONING_ENVIRONMENT_VARIABLE, None)
+        os.environ[KioskJournal.PROVISIONING_ENVIRONMENT_VARIABLE] = 'supervisor-key'
+        KioskJournal.serverSecret = None
+
+
+    def test_token_needs_the_provisioning_key(self):
+        self.assertEqual(KioskJournal.issue_kiosk(None), (None, None))
+        self.assertEqual(KioskJournal.issue_kiosk('wrong-key'), (None, None))
+
+        kioskId, token = KioskJournal.issue_kiosk('supervisor-key')
+        self.assertEqual(len(kioskId), 32)
+        self.assertTrue(KioskJournal.is_authorized(kioskId, token))
+
+
+    def test_no_kiosk_is_provisioned_without_the_environment_variable(self):
+        del os.environ[KioskJournal.PROVISIONING_ENVIRONMENT_VARIABLE]
+
+        self.assertEqual(KioskJournal.issue_kiosk(''), (None, None))
+        self.assertEqual(KioskJournal.issue_kiosk('supervisor-key'), (None, None))
+
+
+    def test_token_is_bound_to_its_kiosk_id(self):
+        kioskId, token = KioskJournal.issue_kiosk('supervisor-key')
+        otherKioskId, _ = KioskJournal.issue_kiosk('supervisor-key')
+
+        self.assertFalse(KioskJournal.is_authorized(otherKioskId, token))
+        self.assertFalse(KioskJournal.is_authorized(kioskId, None))
+        self.assertFalse(KioskJournal.is_authorized(kioskId, token[:-1] + ('0' if token[-1] != '0' else '1')))
+
+
+class PunchWriterReplayTest(TimeReportTestCase):
+    """ Replays queued on the PunchWriter thread behind kiosk punches
+    """
+
+    def test_replay_after_online_punch(self):
+        punchWriter = PunchWriter()
+        punchWriter.start()
+        try:
+            punch = punchWriter.submit(GC.CLOCK_IN, '1001')
+            replay = punchWriter.submit_replay('kiosk', BATCH)
+
+            self.assertEqual(punch.result(timeout=10), ('', ''))
+            self.assertEqual(replay.result(timeout=10), {"acknowledged": 3, "inserted": 2, "duplicates": 1, "rejected": 0})
+
+        finally:
+            punchWriter.stop()
+
+        self.assertEqual(self.query("SELECT COUNT(*) FROM PunchEventsAllView"), [(3,)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "MailOutbox keeps a message PENDING with backoff until a server accepts it, and marks a permanent rejection FAILED"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+
+# Standard Python libraries
+import os
+import smtplib                                  # https://docs.python.org/3/library/smtplib.html
+import unittest                                 # https://docs.python.org/3/library/unittest.html
+from contextlib import nullcontext
+from time import time
+
+# Internal modules
+import GlobalConstants as GC
+import MailOutbox
+import PunchEvents
+from Tests.TimeReportTestCase import TimeReportTestCase
+
+
+class ScriptedMailer:
+    """ Stand-in for Email, send_email() raises the next queued error or records the message
+    """
+
+    def __init__(self):
+        self.errors = []
+        self.connectError = None
+        self.sent = []
+
+
+    def connect(self):
+        if self.connectError is not None:
+            raise self.connectError
+
+        return nullcontext()
+
+
+    def send_email(self, senderEmail: str, receiverEmail: str, subject: str, body: str, attachments: list, server=None):
+        if len(self.errors) > 0:
+            raise self.errors.pop(0)
+
+        self.sent.append((receiverEmail, subject, [os.path.basename(attachment) for attachment in attachments]))
+
+
+class MailOutboxTest(TimeReportTestCase):
+    """ enqueue() and drain() against MailOutboxTable in a fresh TimeReport.db
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.mailer = ScriptedMailer()
+        self.outbox = MailOutbox.MailOutbox(self.mailer, self.path('Spool'))
+        self.reportPath = self.path('Report.csv')
+        with open(self.reportPath, 'w', encoding='utf-8') as file:
+            file.write('Full Name,Employee ID\n')
+
+
+    def enqueue(self, receiverEmails: list = ('supervisor@mfc.us',), **marker) -> list:
+        return self.outbox.enqueue(GC.MAIL_SENDER, list(receiverEmails), 'TimeTracker reports', 'See attached', [self.reportPath], **marker)
+
+
+    def message(self, id: int) -> tuple:
+        return self.query("SELECT state, attempts, nextAttemptTs, lastError FROM MailOutboxTable WHERE id = ?", (id,))[0]
+
+
+    def test_delivered_message_is_sent_and_its_spool_removed(self):
+        ids = self.enqueue()
+        self.assertIsNone(self.outbox.drain())
+
+        self.assertEqual(self.mailer.sent, [('supervisor@mfc.us', 'TimeTracker reports', ['Report.csv'])])
+        self.assertEqual(self.message(ids[0])[:2], (MailOutbox.SENT, 1))
+        self.assertEqual(os.listdir(self.path('Spool')), [])
+
+
+    def test_temporary_failure_is_retried_with_backoff(self):
+        ids = self.enqueue()
+        self.mailer.errors.append(smtplib.SMTPResponseException(451, b'Try again later'))
+        before = int(time())
+        delay = self.outbox.drain()
+
+        state, attempts, nextAttemptTs, lastError = self.message(ids[0])
+        self.assertEqual((state, attempts), (MailOutbox.PENDING, 1))
+        self.assertGreaterEqual(nextAttemptTs, before + int(GC.MAIL_RETRY_MIN_TIME * 0.75) - 1)
+        self.assertLessEqual(nextAttemptTs, int(time() + GC.MAIL_RETRY_MIN_TIME))
+        self.assertIn('451', lastError)
+        self.assertGreater(delay, 0)
+
+        # Not due yet, so a drain does nothing, then the retry goes out once it is
+        self.outbox.drain()
+        self.assertEqual(self.mailer.sent, [])
+        self.db.cursor.execute("UPDATE MailOutboxTable SET nextAttemptTs = 0")
+        self.db.commit_changes()
+        self.outbox.drain()
+        self.assertEqual(self.message(ids[0])[:2], (MailOutbox.SENT, 2))
+
+
+    def test_connection_failure_retries_every_message(self):
+        ids = self.enqueue(['first@mfc.us', 'second@mfc.us'])
+        self.mailer.connectError = smtplib.SMTPAuthenticationError(535, b'Bad password')
+        self.outbox.drain()
+
+        self.assertEqual([self.message(id)[:2] for id in ids], [(MailOutbox.PENDING, 1)] * 2)
+
+
+    def test_permanent_failure_is_marked_failed(self):
+        ids = self.enqueue(['unknown@mfc.us', 'supervisor@mfc.us'])
+        self.mailer.errors.append(smtplib.SMTPRecipientsRefused({'unknown@mfc.us': (550, b'No such user')}))
+        self.assertIsNone(self.outbox.drain())
+
+        self.assertEqual(self.message(ids[0])[:2], (MailOutbox.FAILED, 1))
+        self.assertEqual(self.message(ids[1])[:2], (MailOutbox.SENT, 1))
+
+        # A FAILED message keeps its attachments for a manual resend
+        self.assertEqual(len(os.listdir(self.path('Spool'))), 1)
+
+
+    def test_state_marker_queues_messages_once(self):
+        self.assertEqual(len(self.enqueue(stateName='WeeklyReportsMailedWeekId', stateValue=19645)), 1)
+        self.assertEqual(self.enqueue(stateName='WeeklyReportsMailedWeekId', stateValue=19645), [])
+
+        self.assertEqual(self.query("SELECT COUNT(*) FROM MailOutboxTable"), [(1,)])
+        self.assertEqual(PunchEvents.get_state(self.db.cursor, 'WeeklyReportsMailedWeekId'), 19645)
+        self.assertEqual(len(os.listdir(self.path('Spool'))), 1)
+
+        # The next week is queued again
+        self.assertEqual(len(self.enqueue(stateName='WeeklyReportsMailedWeekId', stateValue=19652)), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "PunchEventsTable only keeps the open work week, closed weeks move into PunchEventsArchiveTable at startup or on rollover"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+
+# Standard Python libraries
+import sqlite3                                  # https://docs.python.org/3/library/sqlite3.html
+import unittest                                 # https://docs.python.org/3/library/unittest.html
+from datetime import date
+
+# Internal modules
+import ConnectionPool
+import PunchEvents
+from Database import Database
+from Tests.TimeReportTestCase import TimeReportTestCase
+
+LAST_WEEK_ID = PunchEvents.to_local_day(date(2023, 10, 15))
+THIS_WEEK_ID = LAST_WEEK_ID + 7
+
+# Three weeks of legacy clock IN rows, ending in the week of TimeReportTestCase.NOW
+LEGACY_CHECK_INS = [(1000, '2023-10-09T07:00+00:00'), (1001, '2023-10-10T07:00+00:00'), (1000, '2023-10-16T07:00+00:00'), (1000, '2023-10-23T07:00+00:00')]
+
+
+class PunchArchiveTest(TimeReportTestCase):
+    """ archive_legacy_weeks() at startup and archive_closed_weeks() on rollover
+    """
+
+    def weeks(self, table: str) -> list:
+        return [PunchEvents.to_week_id(localDay) for (localDay,) in self.query(f"SELECT localDay FROM {table} ORDER BY localDay")]
+
+
+    def open_legacy_database(self, batchSize: int):
+        """ Replace the fixture database with a pre PunchEventsTable TimeReport.db and migrate it like Main.py would at startup
+        """
+        self.db.close_database()
+        legacyPath = self.path('Legacy.db')
+        with sqlite3.connect(legacyPath) as conn:
+            conn.execute("CREATE TABLE CheckInTable (id INTEGER PRIMARY KEY, employeeId INTEGER, timestamp TEXT)")
+            conn.execute("CREATE TABLE CheckOutTable (id INTEGER PRIMARY KEY, employeeId INTEGER, timestamp TEXT)")
+            conn.executemany("INSERT INTO CheckInTable (employeeId, timestamp) VALUES (?, ?)", LEGACY_CHECK_INS)
+        conn.close()
+
+        ConnectionPool.configure(legacyPath)
+        self.db = Database()
+        if batchSize is not None:
+            PunchEvents.migrate(self.db.conn, batchSize, THIS_WEEK_ID)
+
+
+    def test_legacy_closed_weeks_are_archived_at_startup(self):
+        self.open_legacy_database(None)
+
+        self.assertEqual(self.weeks('PunchEventsTable'), [THIS_WEEK_ID])
+        self.assertEqual(self.weeks('PunchEventsArchiveTable'), [LAST_WEEK_ID - 7, LAST_WEEK_ID - 7, LAST_WEEK_ID])
+        self.assertEqual(self.query("SELECT employeeId, timestamp FROM CheckInTable ORDER BY id"), LEGACY_CHECK_INS)
+
+
+    def test_startup_archive_is_a_no_op_once_done(self):
+        self.open_legacy_database(1)
+
+        self.assertEqual(PunchEvents.archive_legacy_weeks(self.db.conn, THIS_WEEK_ID, 1), 0)
+        self.assertEqual(len(self.weeks('PunchEventsArchiveTable')), 3)
+
+
+    def test_rollover_only_moves_the_week_that_closed(self):
+        self.db.rollover_weekly_report_table(LAST_WEEK_ID)
+        self.db.import_punches([(1000, 'IN', '2023-10-16T07:00'), (1001, 'OUT', '2023-10-20T16:00')])
+        self.assertEqual(self.weeks('PunchEventsTable'), [LAST_WEEK_ID, LAST_WEEK_ID])
+
+        self.assertTrue(self.db.rollover_weekly_report_table())
+        self.assertEqual(self.weeks('PunchEventsTable'), [])
+        self.assertEqual(self.query("SELECT weekId, COUNT(*) FROM PunchEventsArchiveTable GROUP BY weekId"), [(LAST_WEEK_ID, 2)])
+
+        self.assertEqual(self.db.insert_check_in_table(1000), ('', ''))
+        self.assertEqual(self.weeks('PunchEventsTable'), [THIS_WEEK_ID])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM PunchEventsAllView"), [(3,)])
+
+
+if __name__ == "__main__":
+    unittest.main()
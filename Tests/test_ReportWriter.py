@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "Reports are published atomically with a checksummed manifest, and publishing a week again replaces its files"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+
+# Standard Python libraries
+import hashlib                                  # https://docs.python.org/3/library/hashlib.html
+import json
+import os
+import unittest                                 # https://docs.python.org/3/library/unittest.html
+from datetime import date, timedelta
+
+# Internal modules
+import CronJobScript
+import ManualTimeCalculations
+import PunchEvents
+import ReportEngine
+import ReportWriter
+from Tests.TimeReportTestCase import TimeReportTestCase
+
+LAST_SUNDAY = date(2023, 10, 15)
+FILENAME_PREFIX = '2023-10-15_2023-10-21'
+
+PUNCHES = [(1000, 'IN', '2023-10-16T07:00'), (1000, 'OUT', '2023-10-16T15:30'), (1001, 'IN', '2023-10-18T06:45')]
+
+
+class ReportWriterTest(TimeReportTestCase):
+    """ ReportFile and publish_manifest() through weekly_reports() and CronJobScript.job()
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.db.import_punches(PUNCHES)
+        self.reportDirectory = self.path('Reports')
+
+
+    def publish(self) -> dict:
+        """ Publish last week's reports and read back their manifest
+        """
+        ManualTimeCalculations.weekly_reports(ManualTimeCalculations.week_dates(LAST_SUNDAY), self.reportDirectory)
+        with open(os.path.join(self.reportDirectory, FILENAME_PREFIX + ReportWriter.MANIFEST_SUFFIX), encoding='utf-8') as file:
+            return json.load(file)
+
+
+    def assert_manifest_matches_files(self, manifest: dict):
+        for filename, entry in manifest["files"].items():
+            with open(os.path.join(self.reportDirectory, filename), 'rb') as file:
+                data = file.read()
+
+            self.assertEqual(entry, {"rows": data.count(b'\n') - 1, "bytes": len(data), "sha256": hashlib.sha256(data).hexdigest()})
+
+
+    def test_publish_leaves_only_complete_files(self):
+        manifest = self.publish()
+
+        self.assertEqual(sorted(manifest["files"]), [FILENAME_PREFIX + suffix for suffix in ('_CheckInTimes.csv', '_CheckOutTimes.csv', '_LaborerTimeReport.csv')])
+        self.assert_manifest_matches_files(manifest)
+        self.assertEqual([name for name in os.listdir(self.reportDirectory) if name.endswith('.tmp')], [])
+
+
+    def test_failed_report_keeps_the_previous_file(self):
+        path = os.path.join(self.reportDirectory, 'Report.csv')
+        with ReportWriter.ReportFile(path, ['A']) as report:
+            report.writerow(['first'])
+
+        with self.assertRaises(RuntimeError):
+            with ReportWriter.ReportFile(path, ['A']) as report:
+                report.writerow(['second'])
+                raise RuntimeError('export failed')
+
+        with open(path, encoding='utf-8') as file:
+            self.assertEqual(file.read().splitlines(), ['A', 'first'])
+        self.assertEqual(os.listdir(self.reportDirectory), ['Report.csv'])
+
+
+    def test_rerun_replaces_files_and_manifest_entries(self):
+        first = self.publish()
+        self.db.import_punches([(1002, 'OUT', '2023-10-19T17:00')])
+        second = self.publish()
+
+        self.assertEqual(sorted(second["files"]), sorted(first["files"]))
+        self.assertEqual(second["files"][FILENAME_PREFIX + '_CheckOutTimes.csv']["rows"], first["files"][FILENAME_PREFIX + '_CheckOutTimes.csv']["rows"] + 1)
+        self.assert_manifest_matches_files(second)
+
+        # Employees are one row each in the labor report however often it is published
+        self.assertEqual(second["files"][FILENAME_PREFIX + '_LaborerTimeReport.csv']["rows"], first["files"][FILENAME_PREFIX + '_LaborerTimeReport.csv']["rows"])
+
+
+    def test_cron_job_publishes_each_week_once(self):
+        self.addCleanup(setattr, CronJobScript, 'REPORT_DIRECTORY', CronJobScript.REPORT_DIRECTORY)
+        CronJobScript.REPORT_DIRECTORY = self.reportDirectory
+        CronJobScript.job()
+        manifestPath = os.path.join(self.reportDirectory, FILENAME_PREFIX + ReportWriter.MANIFEST_SUFFIX)
+        modified = os.stat(manifestPath).st_mtime_ns
+
+        self.assertEqual(CronJobScript.last_reported_week(), PunchEvents.to_local_day(LAST_SUNDAY))
+        self.now += timedelta(hours=1)
+        CronJobScript.job()
+        self.assertEqual(os.stat(manifestPath).st_mtime_ns, modified)
+
+        with open(os.path.join(self.reportDirectory, FILENAME_PREFIX + '_LaborerTimeReport.csv'), encoding='utf-8') as file:
+            self.assertEqual(file.readline().rstrip('\r\n').split(','), ReportEngine.LABOR_REPORT_HEADER)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "LaborerTimeReport, CheckInTimes and CheckOutTimes rows written by ManualTimeCalculations.weekly_reports() for a known week of punches"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+
+# Standard Python libraries
+import csv                                      # https://docs.python.org/3/library/csv.html
+import unittest                                 # https://docs.python.org/3/library/unittest.html
+from datetime import date
+
+# Internal modules
+import ManualTimeCalculations
+import ReportEngine
+from Database import employeeDirectory
+from Tests.TimeReportTestCase import TimeReportTestCase
+
+# Reported week of 2023-10-15 to 2023-10-21, the Sunday before TimeReportTestCase.NOW
+PUNCHES = [(1000, 'IN', '2023-10-16T07:00'), (1000, 'OUT', '2023-10-16T15:30'), (1000, 'IN', '2023-10-16T08:00'),
+           (1000, 'IN', '2023-10-17T07:00'), (1000, 'OUT', '2023-10-17T16:00'),
+           (1001, 'IN', '2023-10-18T06:45'),
+           (1002, 'OUT', '2023-10-19T17:00'),
+           (1003, 'IN', '2023-10-20T22:00'), (1003, 'OUT', '2023-10-20T06:00')]
+
+# Second clock IN on a day is ignored, a single punch counts 12 hours, a clock OUT before the clock IN wraps around midnight
+EXPECTED_LABOR_ROWS = [
+    ['Erick Maldonado', '1000', '17.5', '0.0', '8.5', '9.0', '0.0', '0.0', '0.0', '0.0', 'Missed: Sun Wed Thurs Fri Sat ', 'Missed: Sun Wed Thurs Fri Sat '],
+    ['Dago Reyes Astello', '1001', '12.0', '0.0', '0.0', '0.0', '12.0', '0.0', '0.0', '0.0', 'Missed: Sun Mon Tues Thurs Fri Sat ', 'Missed: Sun Mon Tues Wed Thurs Fri Sat '],
+    ['Cesar Rene Cabrera', '1002', '12.0', '0.0', '0.0', '0.0', '0.0', '12.0', '0.0', '0.0', 'Missed: Sun Mon Tues Wed Thurs Fri Sat ', 'Missed: Sun Mon Tues Wed Fri Sat '],
+    ['Adrian Cardenas', '1003', '8.0', '0.0', '0.0', '0.0', '0.0', '0.0', '8.0', '0.0', 'Missed: Sun Mon Tues Wed Thurs Sat ', 'Missed: Sun Mon Tues Wed Thurs Sat '],
+]
+
+EXPECTED_CHECK_IN_ROWS = [['Erick Maldonado', '1000', '2023-10-16T07:00+00:00'], ['Erick Maldonado', '1000', '2023-10-17T07:00+00:00'],
+                          ['Dago Reyes Astello', '1001', '2023-10-18T06:45+00:00'], ['Adrian Cardenas', '1003', '2023-10-20T22:00+00:00']]
+
+EXPECTED_CHECK_OUT_ROWS = [['Erick Maldonado', '1000', '2023-10-16T15:30+00:00'], ['Erick Maldonado', '1000', '2023-10-17T16:00+00:00'],
+                           ['Cesar Rene Cabrera', '1002', '2023-10-19T17:00+00:00'], ['Adrian Cardenas', '1003', '2023-10-20T06:00+00:00']]
+
+
+def read_csv(path: str) -> tuple:
+    """ Header and data rows of a report file
+    """
+    with open(path, newline='', encoding='utf-8') as file:
+        rows = list(csv.reader(file))
+
+    return rows[0], rows[1:]
+
+
+class WeeklyReportsTest(TimeReportTestCase):
+    """ weekly_reports() against a fresh TimeReport.db holding one week of hand checked punches
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.assertEqual(self.db.import_punches(PUNCHES), (8, 1, []))
+
+
+    def test_laborer_time_report(self):
+        laborPath, _, _ = ManualTimeCalculations.weekly_reports(ManualTimeCalculations.week_dates(date(2023, 10, 15)), self.directory.name)
+        self.assertTrue(laborPath.endswith('2023-10-15_2023-10-21_LaborerTimeReport.csv'))
+
+        header, rows = read_csv(laborPath)
+        self.assertEqual(header, ReportEngine.LABOR_REPORT_HEADER)
+        self.assertEqual(rows[:len(EXPECTED_LABOR_ROWS)], EXPECTED_LABOR_ROWS)
+
+        # Every other employee in UsersTable gets a zero hour row
+        self.assertEqual(len(rows), len(employeeDirectory.get_employees()))
+        for row in rows[len(EXPECTED_LABOR_ROWS):]:
+            self.assertEqual(row[2:], ['0.0'] * 8 + ['Missed: All Days', 'Missed: All Days'])
+
+
+    def test_check_x_reports(self):
+        _, checkInPath, checkOutPath = ManualTimeCalculations.weekly_reports(ManualTimeCalculations.week_dates(date(2023, 10, 15)), self.directory.name)
+
+        self.assertEqual(read_csv(checkInPath), (ReportEngine.CHECK_X_REPORT_HEADER, EXPECTED_CHECK_IN_ROWS))
+        self.assertEqual(read_csv(checkOutPath), (ReportEngine.CHECK_X_REPORT_HEADER, EXPECTED_CHECK_OUT_ROWS))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+__authors__    = ["Blaze Sanders"]
+__contact__    = "blazes@mfc.us"
+__copyright__  = "Copyright 2023"
+__license__    = "MIT License"
+__status__     = "Development
+__deprecated__ = False
+__version__    = "0.1.0"
+__doc__        = "rollover_weekly_report_table() snapshots a finished week into WeeklyReportHistoryTable exactly once"
+"""
+
+# Disable PyLint linting messages
+# https://pypi.org/project/pylint/
+# pylint: disable=line-too-long
+# pylint: disable=invalid-name
+
+# Standard Python libraries
+import sqlite3                                  # https://docs.python.org/3/library/sqlite3.html
+import threading
+import unittest                                 # https://docs.python.org/3/library/unittest.html
+from datetime import date
+
+# Internal modules
+import PunchEvents
+from Database import Database, employeeDirectory
+from Tests.TimeReportTestCase import TimeReportTestCase
+
+LAST_WEEK_ID = PunchEvents.to_local_day(date(2023, 10, 15))
+THIS_WEEK_ID = LAST_WEEK_ID + 7
+
+PUNCHES = [(1000, 'IN', '2023-10-16T07:00'), (1000, 'OUT', '2023-10-16T15:30'), (1001, 'IN', '2023-10-18T06:45')]
+
+
+class WeeklyRolloverTest(TimeReportTestCase):
+    """ Rollover from the week of 2023-10-15 into the week of 2023-10-22
+    """
+
+    def setUp(self):
+        super().setUp()
+
+        # Database in use since before last week, so only the week of 2023-10-15 is open
+        self.db.rollover_weekly_report_table(LAST_WEEK_ID)
+        self.db.import_punches(PUNCHES)
+
+
+    def history(self) -> list:
+        return self.query("SELECT weekId, employeeId, totalHours, day0, day2, inComments, outComments FROM WeeklyReportHistoryTable WHERE weekId = ? ORDER BY employeeId", (LAST_WEEK_ID,))
+
+
+    def test_snapshot_of_last_week(self):
+        self.assertTrue(self.db.rollover_weekly_report_table())
+
+        history = self.history()
+        self.assertEqual(len(history), len(employeeDirectory.get_employees()))
+        self.assertEqual(history[0], (LAST_WEEK_ID, 1000, 8.5, 8.5, 0, 'Missed: Sun Tues Wed Thurs Fri Sat ', 'Missed: Sun Tues Wed Thurs Fri Sat '))
+        self.assertEqual(history[1], (LAST_WEEK_ID, 1001, 12.0, 0, 12.0, 'Missed: Sun Mon Tues Thurs Fri Sat ', 'Missed: Sun Mon Tues Wed Thurs Fri Sat '))
+        self.assertEqual(history[2][5:], ('Missed: All Days', 'Missed: All Days'))
+
+        # The new week starts empty
+        self.assertEqual(PunchEvents.get_state(self.db.cursor, 'WeeklyReportWeekId'), THIS_WEEK_ID)
+        self.assertEqual(self.query("SELECT SUM(totalHours) FROM WeeklyReportTable"), [(0,)])
+
+
+    def test_second_rollover_is_a_no_op(self):
+        self.assertTrue(self.db.rollover_weekly_report_table())
+        history = self.history()
+
+        self.assertFalse(self.db.rollover_weekly_report_table())
+        self.assertFalse(self.db.rollover_weekly_report_table(LAST_WEEK_ID))
+        self.assertEqual(self.history(), history)
+
+
+    def test_two_connections_write_one_snapshot(self):
+        barrier = threading.Barrier(2)
+        results = []
+
+        def rollover():
+            db = Database()
+            barrier.wait()
+            results.append(db.rollover_weekly_report_table())
+            db.close_database()
+
+        threads = [threading.Thread(target=rollover) for _ in range(2)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+
+        self.assertEqual(sorted(results), [False, True])
+        self.assertEqual(self.query("SELECT COUNT(*), COUNT(DISTINCT employeeId) FROM WeeklyReportHistoryTable WHERE weekId = ?", (LAST_WEEK_ID,)), [(len(employeeDirectory.get_employees()),) * 2])
+
+
+    def test_history_is_unique_per_week_and_employee(self):
+        self.db.rollover_weekly_report_table()
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db.cursor.execute("INSERT INTO WeeklyReportHistoryTable (weekId, fullname, employeeId, totalHours) VALUES (?, 'Erick Maldonado', 1000, 0)", (LAST_WEEK_ID,))
+
+
+if __name__ == "__main__":
+    unittest.main()